@@ -1,28 +1,32 @@
-import numpy as np
-import pandas as pd
+import os
+import sys
+
 import joblib
-regression_model = joblib.load("models/LightGBM_recovery_time.joblib")
-scaler = joblib.load("models/recovery_scaler_realistic.joblib")
+
+# Run from anywhere: the repo root holds the shared `healthe` package and models/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from healthe.features import RECOVERY
+from healthe.tree_predictor import TreeEnsemblePredictor
+
+regression_model = joblib.load(os.path.join(ROOT, "models", "LightGBM_recovery_time.joblib"))
+scaler = joblib.load(os.path.join(ROOT, "models", "recovery_scaler_realistic.joblib"))
+
+# recovery_scaler is applied inside the predictor (it was fitted on every column)
+predictor = TreeEnsemblePredictor.from_model(regression_model, scaler)
 
 example_input_recovery = {
         "age": 28,
-        "gender": 1,
+        "gender": "Male",
         "bmi": 24.5,
-        'condition_type': 3,
+        'condition_type': "Flu",
         'severity_score': 5,
         'rest_hours_per_day': 7,
         'medication_adherence': 0.5,
         'hospital_visits': 2,
-        'smoking_status': 0
+        'smoking_status': "Non-Smoker"
     }
-df = pd.DataFrame([example_input_recovery])
-cols_to_scale = [
-'age',"gender", 'bmi', 'condition_type','severity_score',
-'rest_hours_per_day', 'medication_adherence', 'hospital_visits','smoking_status'
-]
-# Scale only selected columns
-df_scaled = df.copy()
-df_scaled[cols_to_scale] = scaler.transform(df[cols_to_scale])
-#print(df_scaled)
-prediction = regression_model.predict(df_scaled)[0]
+X = RECOVERY.encode_record(example_input_recovery)
+prediction = predictor.predict(X)[0]
 print(str(prediction.round(2)) +" days")
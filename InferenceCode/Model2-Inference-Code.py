@@ -1,41 +1,43 @@
-import numpy as np
-import pandas as pd
+import os
+import sys
+
 import joblib
 
-classification_model = joblib.load("new_lr_model_final.joblib")
-scaler = joblib.load("new_diet_scaler_final.joblib")
+# Run from anywhere: the repo root holds the shared `healthe` package and models/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from healthe.features import DIET, DIET_PLAN_LABELS
+from healthe.linear_predictor import FusedLogisticPredictor
 
-# Columns used for scaling
-cols_to_scale = [
-    "age", "bmi", "daily_calories", "protein_intake",
-    "carb_intake", "fat_intake", "sleep_hours",
-    "daily_steps", "water_intake_liters"
-]
+classification_model = joblib.load(os.path.join(ROOT, "models", "new_lr_model_final.joblib"))
+scaler = joblib.load(os.path.join(ROOT, "models", "new_diet_scaler_final.joblib"))
+
+# The scaler (fitted on DIET.scaled_columns) is folded into the model weights
+predictor = FusedLogisticPredictor.from_model(
+    classification_model, scaler, DIET.columns, DIET.scaled_columns
+)
 
 def predict_diet_plan(input_dict):
     """
     Predict diet plan using Logistic Regression classification model.
     """
 
-    df = pd.DataFrame([input_dict])
-
-    # Scale only selected columns
-    df_scaled = df.copy()
-    df_scaled[cols_to_scale] = scaler.transform(df[cols_to_scale])
+    X = DIET.encode_record(input_dict)
 
-    # Predict diet class
-    pred_class = classification_model.predict(df_scaled)[0]
-    #pred_proba = classification_model.predict_proba(df_scaled)[0]
+    # Predict diet class and class probabilities in one pass
+    pred_class, pred_proba = predictor.predict_with_proba(X)
 
     return {
-        "predicted_class": pred_class
+        "predicted_class": int(pred_class[0]),
+        "probability": float(pred_proba[0].max()),
     }
 
 
 example_input_diet = {
         "age": 28,
-        "gender": 0,
-        "conditions": 1,
+        "gender": "Female",
+        "conditions": "Cough",
         "bmi": 24.49,
         "daily_calories": 2500,
         "protein_intake": 119,
@@ -48,6 +50,5 @@ example_input_diet = {
 
 
 diet_class = predict_diet_plan(example_input_diet)
-pred_label = {0: 'Balanced Diet',1: 'High-Protein Diet',2: 'Keto Diet',3: 'Low-Carb Diet',4: 'Low-Fat Diet',5: 'Vegan Diet'}
-label = pred_label.get(diet_class["predicted_class"],"Unk")
-print("Diet Plan Prediction: "+ label)
\ No newline at end of file
+label = DIET_PLAN_LABELS[diet_class["predicted_class"]]
+print("Diet Plan Prediction: "+ label)
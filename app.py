@@ -1,9 +1,14 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import joblib
 import os
-import requests
+
+from healthe import whatif
+from healthe.batching import VersionBatchers
+from healthe.cache import PredictionCache, version_key
+from healthe.features import DIET, DIET_PLAN_LABELS, RECOVERY
+from healthe.log_client import PredictionLogClient
+from healthe.metrics import REGISTRY, timed
+from healthe.registry import ModelRegistry
 
 # ========= Page Config =========
 st.set_page_config(
@@ -15,17 +20,83 @@ st.set_page_config(
 
 # ========= Backend URL (for logging & history) =========
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+# How long the sidebar reuses its last /history result before revalidating
+HISTORY_TTL_SECONDS = int(os.getenv("HISTORY_TTL_SECONDS", "5"))
+# Time every model call and show the latency in the sidebar
+INFERENCE_TIMING = os.getenv("INFERENCE_TIMING", "0").lower() in ("1", "true", "yes")
+# Score concurrent sessions' predictions together in micro-batches
+INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "0").lower() in ("1", "true", "yes")
+
+APP_INFERENCE_SECONDS = REGISTRY.histogram(
+    "healthe_app_inference_seconds", "Model predict latency in the Streamlit app", ("prediction_type",)
+)
+
+
+@st.cache_resource
+def get_model_registry():
+    """
+    Versioned models under models/ (healthe/registry.py), shared by every
+    session. A watcher thread swaps in newly published versions after warming
+    them up, so a retrained model goes live without restarting the app.
+    """
+    return ModelRegistry.from_env("models", mmap_mode=None)
+
+
+def current_version(prediction_type):
+    return get_model_registry().current(prediction_type)
+
+
+def _predictor_call(version, method):
+    predict_fn = getattr(version.predictor, method)
+    if INFERENCE_TIMING:
+        predict_fn = timed(predict_fn, APP_INFERENCE_SECONDS.labels(version.prediction_type))
+    return predict_fn
+
 
-# ========= Load Models =========
 @st.cache_resource
+def get_batchers():
+    """One micro-batcher per model version and method, shared by every session; closed when swapped out."""
+    batchers = VersionBatchers()
+    get_model_registry().on_swap(lambda prediction_type, old, new: old and batchers.retire(old))
+    return batchers
+
+
+def model_call(version, method):
+    """
+    `method` of `version`'s predictor, timed when INFERENCE_TIMING is on and
+    batched with other sessions' calls when INFERENCE_BATCHING is on.
+    """
+    if INFERENCE_BATCHING:
+        return get_batchers().predict_fn(version, method, _predictor_call(version, method))
+    return _predictor_call(version, method)
+
+# ========= Load Models =========
+# pandas, joblib, scikit-learn and LightGBM are imported on first use, so the
+# page is painted before any of them is loaded.
 def load_models():
-    recovery_model = joblib.load("models/LightGBM_recovery_time.joblib")
-    diet_model = joblib.load("models/new_lr_model_final.joblib")
-    recovery_scaler = joblib.load("models/recovery_scaler_realistic.joblib")
-    diet_scaler = joblib.load("models/new_diet_scaler_final.joblib")
-    return recovery_model, diet_model, recovery_scaler, diet_scaler
+    """The active versions' (recovery_model, diet_model, recovery_scaler, diet_scaler)."""
+    registry = get_model_registry()
+    recovery, diet = registry.current(RECOVERY.name), registry.current(DIET.name)
+    return recovery.model, diet.model, recovery.scaler, diet.scaler
+
+
+@st.cache_resource
+def get_prediction_cache():
+    """Prediction results shared by every session, keyed by model version; dropped when it is swapped out."""
+    cache = PredictionCache.from_env()
+
+    def on_swap(prediction_type, old, new):
+        # Predictions are cached together with their explanations
+        key = f"{prediction_type}:explain"
+        cache.register(version_key(key, new.version), list(new.paths.values()))
+        if old is not None:
+            cache.forget(version_key(key, old.version))
 
-recovery_model, diet_model, recovery_scaler, diet_scaler = load_models()
+    registry = get_model_registry()
+    for prediction_type in (RECOVERY.name, DIET.name):
+        on_swap(prediction_type, None, registry.current(prediction_type))
+    registry.on_swap(on_swap)
+    return cache
 
 
 def _to_builtin(val):
@@ -35,28 +106,146 @@ def _to_builtin(val):
     return val
 
 
-def send_log_to_backend(prediction_type, inputs, output):
+@st.cache_resource
+def get_log_client():
+    """One logging client per process, shared by every session and rerun."""
+    return PredictionLogClient(BACKEND_URL)
+
+
+@st.cache_resource
+def get_http_session():
+    """Keep-alive HTTP session for reads from the backend."""
+    import requests
+
+    return requests.Session()
+
+
+@st.cache_resource
+def _history_validator_cache():
+    """Last /history response per limit, kept across sessions: {limit: (etag, df)}."""
+    return {}
+
+
+@st.cache_data(ttl=HISTORY_TTL_SECONDS, show_spinner=False)
+def fetch_recent_history(limit=10):
+    """
+    Recent predictions as a DataFrame (None if the backend answered with an error).
+    Within the TTL, reruns reuse the cached frame; after it, the request carries
+    the previous ETag and a 304 reuses the previous frame as well.
+    """
+    cache = _history_validator_cache()
+    etag, df_prev = cache.get(limit, (None, None))
+    headers = {"If-None-Match": etag} if etag else {}
+
+    resp = get_http_session().get(
+        f"{BACKEND_URL}/history", params={"limit": limit}, headers=headers, timeout=2
+    )
+    if resp.status_code == 304 and df_prev is not None:
+        return df_prev
+    if resp.status_code != 200:
+        return None
+
+    import pandas as pd
+
+    rows = []
+    for r in resp.json():
+        rows.append({
+            "type": r["prediction_type"],
+            "created_at": r["created_at"],
+            "output": r["output"],
+        })
+    df_hist = pd.DataFrame(rows)
+    if resp.headers.get("ETag"):
+        cache[limit] = (resp.headers["ETag"], df_hist)
+    return df_hist
+
+
+def send_log_to_backend(prediction_type, inputs, output, model_version=None):
     """
     Fire-and-forget logging of a prediction to the backend.
-    Does NOT break the UI if backend is down.
+    Only queues the entry; a background thread batches and sends it, so a
+    slow or down backend never blocks the UI.
     """
     clean_inputs = {k: _to_builtin(v) for k, v in inputs.items()}
     clean_output = {k: _to_builtin(v) for k, v in output.items()}
+    get_log_client().log(prediction_type, clean_inputs, clean_output, model_version)
+
+
+def show_contributions(schema, contributions, label):
+    """Bar chart of one row's per-feature contributions (base value excluded), largest first."""
+    import pandas as pd
+
+    terms = pd.Series(contributions[:-1], index=list(schema.columns), name=label)
+    terms = terms.reindex(terms.abs().sort_values(ascending=False).index)
+    st.bar_chart(terms, horizontal=True, sort=False, x_label=label)
+    return terms
+
+
+# ========= What-if sweeps =========
+# Ranges of the input widgets below; None sweeps every category
+RECOVERY_SWEEP_RANGES = {
+    "rest_hours_per_day": (0.0, 12.0),
+    "medication_adherence": (0.0, 1.0),
+    "severity_score": (1.0, 10.0),
+    "bmi": (12.0, 45.0),
+    "age": (1, 100),
+    "hospital_visits": (0, 7),
+    "smoking_status": None,
+    "condition_type": None,
+}
+DIET_SWEEP_RANGES = {
+    "daily_calories": (1000, 4500),
+    "protein_intake": (20, 250),
+    "carb_intake": (50, 450),
+    "fat_intake": (10, 150),
+    "sleep_hours": (0.0, 12.0),
+    "daily_steps": (1000, 18000),
+    "water_intake_liters": (1, 5),
+    "bmi": (12.0, 45.0),
+    "conditions": None,
+}
 
-    payload = {
-        "prediction_type": prediction_type,
-        "inputs": clean_inputs,
-        "output": clean_output,
-    }
-    try:
-        requests.post(
-            f"{BACKEND_URL}/log_prediction",
-            json=payload,
-            timeout=2,
-        )
-    except Exception:
-        # ignore logging errors to keep UX smooth
-        pass
+
+def what_if_panel(schema, ranges, run, key):
+    """
+    Widgets to vary one or two inputs; returns `run(axes)` (a sweep result
+    from `healthe.whatif`) once the button is pressed, else None.
+    """
+    columns = st.multiselect("Inputs to vary (up to 2)", list(ranges), max_selections=2, key=f"{key}_columns")
+    steps = st.slider("Steps per input", 5, 100, 50, key=f"{key}_steps")
+    if not columns or not st.button("Run what-if", key=f"{key}_run"):
+        return None
+    axes = [
+        whatif.axis(schema, c) if ranges[c] is None
+        else whatif.axis(schema, c, start=ranges[c][0], stop=ranges[c][1], steps=steps)
+        for c in columns
+    ]
+    return run(axes)
+
+
+def show_sweep(result, values, label):
+    """Line chart of `values` over one axis, or a heatmap over two."""
+    import pandas as pd
+
+    axes = result["axes"]
+    if len(axes) == 1:
+        df = pd.DataFrame(values, index=pd.Index(axes[0]["values"], name=axes[0]["column"]))
+        st.line_chart(df, y_label=label)
+        return
+
+    import altair as alt
+
+    (a, b) = axes
+    grid_a, grid_b = np.meshgrid(a["values"], b["values"], indexing="ij")
+    df = pd.DataFrame({a["column"]: grid_a.ravel(), b["column"]: grid_b.ravel(), label: np.ravel(values)})
+    color = alt.Color(f"{label}:N") if df[label].dtype == object else alt.Color(f"{label}:Q")
+    chart = alt.Chart(df).mark_rect().encode(
+        x=alt.X(f"{b['column']}:O", axis=alt.Axis(labelOverlap=True, format=".3~g")),
+        y=alt.Y(f"{a['column']}:O", sort="descending", axis=alt.Axis(labelOverlap=True, format=".3~g")),
+        color=color,
+        tooltip=[a["column"], b["column"], label],
+    )
+    st.altair_chart(chart, width="stretch")
 
 
 # ========= Custom CSS =========
@@ -92,26 +281,38 @@ sidebar_choice = st.sidebar.radio(
 # ========= Sidebar: recent history from backend DB =========
 with st.sidebar.expander("📊 Recent Predictions (from DB)"):
     try:
-        resp = requests.get(f"{BACKEND_URL}/history", params={"limit": 10}, timeout=2)
-        if resp.status_code == 200:
-            records = resp.json()
-            if not records:
-                st.write("No predictions logged yet.")
-            else:
-                rows = []
-                for r in records:
-                    rows.append({
-                        "type": r["prediction_type"],
-                        "created_at": r["created_at"],
-                        "output": r["output"],
-                    })
-                df_hist = pd.DataFrame(rows)
-                st.dataframe(df_hist, use_container_width=True)
-        else:
+        df_hist = fetch_recent_history(10)
+        if df_hist is None:
             st.write("Could not load history.")
+        elif df_hist.empty:
+            st.write("No predictions logged yet.")
+        else:
+            st.dataframe(df_hist, use_container_width=True)
     except Exception:
         st.write("Backend not reachable.")
 
+with st.sidebar.expander("⚙️ Prediction cache"):
+    st.json(get_prediction_cache().stats())
+
+with st.sidebar.expander("🗂️ Model versions"):
+    st.json(get_model_registry().versions())
+
+if INFERENCE_TIMING:
+    with st.sidebar.expander("⏱️ Inference timing"):
+        for name in (RECOVERY.name, DIET.name):
+            child = APP_INFERENCE_SECONDS.labels(name)
+            if child.count:
+                st.write(
+                    f"{name}: {child.count} calls, "
+                    f"p50 {child.quantile(0.5) * 1000:.2f} ms, p99 {child.quantile(0.99) * 1000:.2f} ms"
+                )
+            else:
+                st.write(f"{name}: no calls yet")
+
+# Loaded after the header and sidebar are on screen; cached for later reruns
+with st.spinner("Loading models..."):
+    recovery_model, diet_model, recovery_scaler, diet_scaler = load_models()
+
 # -------------------------------------------------------------
 # 📌 MODEL 1 — RECOVERY RATE PREDICTION
 # -------------------------------------------------------------
@@ -155,37 +356,58 @@ if sidebar_choice == "🔧 Predict Recovery Days":
     hospital_visits = st.slider("Hospital Visits", 0, 7, 0)
     smoking_status = st.selectbox("Smoking Status", ["Non-Smoker", "Occasional", "Regular"])
 
-    # Convert categorical → numeric
-    condition_map = {"Allergy": 0, "Cough": 1, "Fever": 2, "Flu": 3, "Infection": 4, "Injury": 5}
-    gender_map = {"Male": 1, "Female": 0, "Other": 2}
-    smoking_status_map = {"Non-Smoker": 0, "Occasional": 1, "Regular": 2}
-
-    X = pd.DataFrame({
-        "age": [age],
-        "gender": [gender_map[gender]],
-        "bmi": [bmi],
-        "condition_type": [condition_map[condition_type]],
-        "severity_score": [severity_score],
-        "rest_hours_per_day": [rest_hours_per_day],
-        "medication_adherence": [medication_adherence],
-        "hospital_visits": [hospital_visits],
-        "smoking_status": [smoking_status_map[smoking_status]]
-    })
-
-    # Scale only numeric columns used during training
-    X_scaled = recovery_scaler.transform(X)
+    recovery_inputs = {
+        "age": age,
+        "gender": gender,
+        "bmi": bmi,
+        "condition_type": condition_type,
+        "severity_score": severity_score,
+        "rest_hours_per_day": rest_hours_per_day,
+        "medication_adherence": medication_adherence,
+        "hospital_visits": hospital_visits,
+        "smoking_status": smoking_status,
+    }
+    # Categorical labels → codes, in the model's column order
+    X = RECOVERY.encode_record(recovery_inputs)
 
     if st.button("Predict Recovery Days"):
-        pred = recovery_model.predict(X_scaled)[0]
-        pred_rounded = round(float(pred), 2)
+        # The fast predictor applies recovery_scaler itself, so pass raw values.
+        # The same tree walk yields each input's contribution.
+        version = current_version(RECOVERY.name)
+        model_version = version.version
+        preds, contrib = get_prediction_cache().predict(
+            version_key(f"{RECOVERY.name}:explain", model_version), X,
+            model_call(version, "predict_with_contributions"),
+        )
+        pred_rounded = round(float(preds[0]), 2)
         st.success(f"🩺 **Predicted Recovery Days: {pred_rounded} days**")
 
+        st.markdown("##### Why this prediction?")
+        st.caption(
+            f"Starting from the average of {contrib[0, -1]:.1f} days, each bar shows how many days "
+            "an input adds (positive) or removes (negative)."
+        )
+        show_contributions(RECOVERY, contrib[0], "days")
+
         # Log to backend (non-blocking)
         send_log_to_backend(
             "recovery_days",
-            inputs=X.iloc[0].to_dict(),
+            inputs=RECOVERY.records(X)[0],
             output={"recovery_days": pred_rounded},
+            model_version=model_version,
+        )
+
+    with st.expander("🔬 What-if: how would my recovery change?"):
+        sweep = what_if_panel(
+            RECOVERY, RECOVERY_SWEEP_RANGES, key="recovery_whatif",
+            run=lambda axes: whatif.recovery_days_sweep(
+                recovery_inputs, axes, model_call(current_version(RECOVERY.name), "predict")
+            ),
         )
+        if sweep is not None:
+            st.caption(f"Your current prediction: {sweep['baseline']['recovery_days']} days")
+            show_sweep(sweep, {"recovery_days": sweep["recovery_days"]} if len(sweep["axes"]) == 1
+                       else sweep["recovery_days"], "recovery_days")
 
 # -------------------------------------------------------------
 # 📌 MODEL 2 — DIET PLAN PREDICTION
@@ -232,57 +454,68 @@ if sidebar_choice == "🍎 Predict Diet Plan":
     daily_steps = st.slider("Daily Steps", 1000, 18000, 1500)
     water_intake_liters = st.slider("Water Intake (Litres)", 1, 5, 3)
 
-    conditions_map = {"Allergy": 0, "Cough": 1, "Fever": 2, "Flu": 3, "Infection": 4, "Injury": 5, "No": 6}
-    gender_map = {"Male": 1, "Female": 0}
-
-    X = pd.DataFrame({
-        "age": [age],
-        "gender": [gender_map[gender]],
-        "conditions": [conditions_map[conditions]],
-        "bmi": [bmi],
-        "daily_calories": [calories],
-        "protein_intake": [protein],
-        "carb_intake": [carbs],
-        "fat_intake": [fats],
-        "sleep_hours": [sleep_hours],
-        "daily_steps": [daily_steps],
-        "water_intake_liters": [water_intake_liters]
-    })
-
-    cols_to_scale = [
-        "age", "bmi", "daily_calories", "protein_intake",
-        "carb_intake", "fat_intake", "sleep_hours",
-        "daily_steps", "water_intake_liters"
-    ]
-
-    X_scaled = X.copy()
-    X_scaled[cols_to_scale] = diet_scaler.transform(X[cols_to_scale])
+    diet_inputs = {
+        "age": age,
+        "gender": gender,
+        "conditions": conditions,
+        "bmi": bmi,
+        "daily_calories": calories,
+        "protein_intake": protein,
+        "carb_intake": carbs,
+        "fat_intake": fats,
+        "sleep_hours": sleep_hours,
+        "daily_steps": daily_steps,
+        "water_intake_liters": water_intake_liters,
+    }
+    X = DIET.encode_record(diet_inputs)
 
     if st.button("Recommend Diet Plan"):
-        pred_class = int(diet_model.predict(X_scaled)[0])
-        pred_label = {
-            0: 'Balanced Diet',
-            1: 'High-Protein Diet',
-            2: 'Keto Diet',
-            3: 'Low-Carb Diet',
-            4: 'Low-Fat Diet',
-            5: 'Vegan Diet'
-        }
-        label = pred_label.get(pred_class, "Unknown")
+        # diet_scaler is folded into the model weights: one matmul on raw values,
+        # which also gives each input's share of the chosen plan's score
+        version = current_version(DIET.name)
+        model_version = version.version
+        classes, proba, contrib = get_prediction_cache().predict(
+            version_key(f"{DIET.name}:explain", model_version), X,
+            model_call(version, "predict_with_contributions"),
+        )
+        pred_class = int(classes[0])
+        label = DIET_PLAN_LABELS[pred_class] if pred_class < len(DIET_PLAN_LABELS) else "Unknown"
         st.success(f"🍏 **Recommended Diet Plan: {label}**")
+        st.caption(f"Model confidence: {proba[0].max():.0%}")
 
         # Log to backend (non-blocking)
         send_log_to_backend(
             "diet_plan",
-            inputs=X.iloc[0].to_dict(),
+            inputs=DIET.records(X)[0],
             output={"diet_plan_class": pred_class, "diet_plan_label": label},
+            model_version=model_version,
         )
 
-        st.info("""
-### Plan Explanation
-This recommendation is based on your calorie intake, BMI, health condition,
-and macronutrient balance. A detailed report can be generated in the next update.
-""")
+        st.markdown("##### Plan Explanation")
+        terms = show_contributions(DIET, contrib[0], "score")
+        favour = ", ".join(c.replace("_", " ") for c in terms[terms > 0].index[:3]) or "none"
+        against = ", ".join(c.replace("_", " ") for c in terms[terms < 0].index[:3]) or "none"
+        st.info(
+            f"Inputs that point most towards **{label}**: {favour}. "
+            f"Inputs that point away from it: {against}. "
+            "Use the what-if panel below to see how changing your intake or habits would change it."
+        )
+
+    with st.expander("🔬 What-if: which plan would I get if...?"):
+        sweep = what_if_panel(
+            DIET, DIET_SWEEP_RANGES, key="diet_whatif",
+            run=lambda axes: whatif.diet_plan_sweep(
+                diet_inputs, axes, model_call(current_version(DIET.name), "predict_with_proba")
+            ),
+        )
+        if sweep is not None:
+            st.caption(f"Your current plan: {sweep['baseline']['diet_plan_label']}")
+            if len(sweep["axes"]) == 1:
+                show_sweep(sweep, sweep["probabilities"], "probability")
+            else:
+                labels = np.array(DIET_PLAN_LABELS + ("Unknown",))
+                classes = np.minimum(np.array(sweep["diet_plan_class"]), len(DIET_PLAN_LABELS))
+                show_sweep(sweep, labels[classes], "diet_plan")
 
 # -------------------------------------------------------------
 # FOOTER
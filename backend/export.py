@@ -0,0 +1,102 @@
+"""
+Streaming encoders for `/export`.
+
+Each encoder takes an iterator of row batches -- (id, prediction_type,
+inputs_json, output_json, created_at, model_version) tuples, as fetched from a server-side
+cursor -- and yields the encoded bytes of one batch at a time, so memory stays
+at about one batch however many rows are exported. The stored JSON text is
+written out as-is (spliced into NDJSON, as text columns in CSV and Parquet),
+never parsed.
+"""
+
+import csv
+import io
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+from backend.recent import serialize_prediction
+
+Row = Tuple[int, str, str, str, object, Optional[str]]
+COLUMNS = ("id", "prediction_type", "inputs", "output", "created_at", "model_version")
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def ndjson_chunks(batches: Iterable[Sequence[Row]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield b"".join(serialize_prediction(*row) + b"\n" for row in batch)
+
+
+def csv_chunks(batches: Iterable[Sequence[Row]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for batch in batches:
+        writer.writerows(
+            (row_id, prediction_type, inputs_json, output_json, created_at.isoformat(), model_version or "")
+            for row_id, prediction_type, inputs_json, output_json, created_at, model_version in batch
+        )
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    # Header only, when there were no rows
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands written bytes back through drain()."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parquet_chunks(batches: Iterable[Sequence[Row]]) -> Iterator[bytes]:
+    """One Parquet row group per batch, sent as soon as it is written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("prediction_type", pa.string()),
+        ("inputs", pa.string()),
+        ("output", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("model_version", pa.string()),
+    ])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            columns = list(zip(*batch)) if batch else [[] for _ in COLUMNS]
+            arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
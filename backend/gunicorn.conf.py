@@ -0,0 +1,44 @@
+"""
+Gunicorn settings for running the backend with several preloaded workers.
+
+    DB_URL=... gunicorn -c backend/gunicorn.conf.py backend.main:app
+
+`preload_app` imports backend.main once in the master process; with
+MODEL_LOADING=preload (the default here) that import loads the models, so the
+forked workers share those pages copy-on-write instead of each loading its
+own copy. Database engines are created per worker, after the fork.
+
+Each worker writes its metrics under METRICS_MULTIPROC_DIR so that /metrics
+merges all of them; the directory is emptied when gunicorn starts and a
+worker's file is removed when it exits.
+"""
+
+import glob
+import multiprocessing
+import os
+import tempfile
+
+os.environ.setdefault("MODEL_LOADING", "preload")
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "healthe-metrics"))
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+# Read by backend.main, which takes history validators from the database
+# when other workers may be writing
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+
+
+def on_starting(server):
+    directory = os.environ["METRICS_MULTIPROC_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    from healthe.metrics import remove
+
+    remove(os.environ["METRICS_MULTIPROC_DIR"], worker.pid)
@@ -0,0 +1,126 @@
+"""
+Write-behind buffering for prediction logs.
+
+Requests put rows on a bounded in-process queue and return immediately; a
+background thread hands them to `flush_fn` in batches whenever `max_batch`
+rows are waiting or `flush_interval` seconds have passed since the first one.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+Row = Dict[str, Any]
+
+
+class PredictionBuffer:
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Row]], None],
+        max_batch: int = 500,
+        flush_interval: float = 0.5,
+        max_pending: int = 10000,
+        block_seconds: float = 0.05,
+        max_retries: int = 3,
+    ):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.block_seconds = block_seconds
+        self.max_retries = max_retries
+
+        self._queue: "queue.Queue[Row]" = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Stop accepting work, flush everything still queued and join the flusher."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, row: Row, block: bool = True) -> bool:
+        """
+        Queue one row. When the queue is full, wait up to `block_seconds` for
+        room and return False if there still is none (the caller should shed load).
+        With `block=False` a full queue returns False at once, without counting
+        a rejection, so the caller can retry with waiting somewhere else.
+        """
+        if self._stop.is_set():
+            return False
+        try:
+            if block and self.block_seconds > 0:
+                self._queue.put(row, timeout=self.block_seconds)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            if block:
+                self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    # ---- flusher thread ----
+
+    def _next_batch(self) -> List[Row]:
+        try:
+            # Short poll so stop() is noticed quickly even with a long flush_interval.
+            first = self._queue.get(timeout=min(self.flush_interval, 0.1))
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                # Past the deadline (or shutting down): only take what is already queued.
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.1)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _flush(self, batch: List[Row]):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self.flush_fn(batch)
+                self.flushed += len(batch)
+                return
+            except Exception:
+                logger.exception("Flushing %d predictions failed (attempt %d)", len(batch), attempt)
+                time.sleep(min(0.1 * 2 ** attempt, 2.0))
+        self.dropped += len(batch)
+        logger.error("Dropped %d predictions after %d attempts", len(batch), self.max_retries)
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
@@ -1,19 +1,56 @@
 import os
+import re
 import json
-from datetime import datetime
-from typing import Dict, Any, List
+import time
+import logging
+import operator
+import uuid
+import zlib
+import base64
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Dict, Any, List, Optional, Union
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import anyio
+from fastapi import FastAPI, HTTPException, Body, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from sqlalchemy import (
     create_engine,
+    delete,
+    exists,
+    inspect,
+    insert,
+    or_,
+    select,
+    text,
+    tuple_,
     Column,
+    Float,
+    ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     DateTime,
 )
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+
+from backend import export
+from backend.ingest import PredictionBuffer
+from backend.recent import RecentPredictions
+from backend.stats import TOTAL, PredictionStats, Rollup
+from healthe import drift, whatif
+from healthe.drift import DriftReference
+from healthe.features import DIET, DIET_PLAN_LABELS, RECOVERY, FeatureError
+from healthe.metrics import CONTENT_TYPE, REGISTRY, MultiProcessCollector, RequestMetricsMiddleware
+from healthe.procinfo import memory_usage
+
+logger = logging.getLogger(__name__)
 
 # ======== Config ========
 
@@ -26,11 +63,137 @@ DB_URL = os.getenv("DB_URL")
 if not DB_URL:
     raise RuntimeError("DB_URL environment variable is not set")
 
+# Write-behind logging: when enabled, /log_prediction queues rows and a
+# background thread bulk-inserts them instead of committing once per request.
+LOG_BUFFERED = os.getenv("LOG_BUFFERED", "0").lower() in ("1", "true", "yes")
+LOG_BUFFER_MAX_BATCH = int(os.getenv("LOG_BUFFER_MAX_BATCH", "500"))
+LOG_BUFFER_FLUSH_SECONDS = float(os.getenv("LOG_BUFFER_FLUSH_SECONDS", "0.5"))
+LOG_BUFFER_MAX_PENDING = int(os.getenv("LOG_BUFFER_MAX_PENDING", "10000"))
+# How long a request may wait for room in a full queue before getting a 503.
+LOG_BUFFER_BLOCK_SECONDS = float(os.getenv("LOG_BUFFER_BLOCK_SECONDS", "0.05"))
+
+# Most recent predictions kept in memory to answer small /history pages
+# without touching the database. Off by default (0): the buffer is per
+# process, so it is only correct when a single worker serves and logs.
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "0"))
+# Worker processes serving this backend (exported by backend/gunicorn.conf.py).
+# With more than one, other workers' inserts are only visible in the database.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# /stats rollups: bucket width, how many buckets are kept in memory (the
+# longest window /stats can answer) and how often new counts are written to
+# the prediction_stats table.
+STATS_BUCKET_SECONDS = int(os.getenv("STATS_BUCKET_SECONDS", "3600"))
+STATS_RETENTION_BUCKETS = int(os.getenv("STATS_RETENTION_BUCKETS", "168"))
+STATS_FLUSH_SECONDS = float(os.getenv("STATS_FLUSH_SECONDS", "2.0"))
+
+# Request-path queries (/log_prediction, /log_predictions, /history) run on
+# an asyncio engine when DB_ASYNC=1, so a request waiting on the database
+# holds no thread. DB_ASYNC_URL defaults to DB_URL with its async driver
+# (sqlite -> aiosqlite, postgresql -> asyncpg). Startup, migrations and the
+# background writers keep using the sync engine.
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+# Connection pool of each engine (SQLAlchemy's defaults). With sync endpoints
+# every in-flight query also holds one of THREADPOOL_SIZE worker threads.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0").lower() in ("1", "true", "yes")
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+
+# Schema changes only run when asked for: `python -m backend.migrate`, or
+# DB_AUTO_MIGRATE=1 to run them in the startup hook.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "0").lower() in ("1", "true", "yes")
+
+# When the models are loaded:
+#   lazy    - on the first /predict request (default)
+#   startup - in each worker's startup hook, before it takes traffic
+#   preload - when this module is imported, i.e. in the master process of a
+#             preloading server (see backend/gunicorn.conf.py) so the forked
+#             workers share one copy of them
+MODEL_LOADING = os.getenv("MODEL_LOADING", "lazy").lower()
+if MODEL_LOADING not in ("lazy", "startup", "preload"):
+    raise RuntimeError("MODEL_LOADING must be one of: lazy, startup, preload")
+
+# With several workers, a directory where each writes its metrics so /metrics
+# can merge them (backend/gunicorn.conf.py sets it); unset, /metrics shows
+# the answering process only.
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+METRICS_WRITE_SECONDS = float(os.getenv("METRICS_WRITE_SECONDS", "1.0"))
 
-engine = create_engine(DB_URL, echo=False, future=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+# Bound to the engines by get_engine() / get_async_engine(), which the
+# startup hook calls.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = None
+engine = None
+async_engine = None
+
+
+def pool_options(url: str) -> Dict[str, Any]:
+    """
+    Pool arguments for an engine on `url`. Sizing only applies to queue pools;
+    e.g. in-memory SQLite gets a pool per thread (or one static connection)
+    that rejects them.
+    """
+    options: Dict[str, Any] = {"pool_recycle": DB_POOL_RECYCLE, "pool_pre_ping": DB_POOL_PRE_PING}
+    parsed = make_url(url)
+    if issubclass(parsed.get_dialect().get_pool_class(parsed), QueuePool):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+
+def get_engine():
+    """The process's engine, created on first use (after any fork)."""
+    global engine
+    if engine is None:
+        engine = create_engine(DB_URL, echo=False, future=True, **pool_options(DB_URL))
+        SessionLocal.configure(bind=engine)
+    return engine
+
+
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_db_url(url: str) -> str:
+    """`url` with the asyncio driver of its database."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver known for {backend}; set DB_ASYNC_URL")
+    return parsed.set(drivername=f"{backend}+{_ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    """The process's asyncio engine (DB_ASYNC mode), created on first use."""
+    global async_engine, AsyncSessionLocal
+    if async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = os.getenv("DB_ASYNC_URL") or async_db_url(DB_URL)
+        async_engine = create_async_engine(url, **pool_options(url))
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return async_engine
+
+
+async def run_db(fn, *args):
+    """
+    `fn(session, *args)` in a new session: on the asyncio engine in DB_ASYNC
+    mode (the event loop serves other requests while it waits on the
+    database), otherwise on a worker thread, like a sync endpoint.
+    """
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as session:
+            return await session.run_sync(fn, *args)
+
+    def call():
+        with SessionLocal() as session:
+            return fn(session, *args)
+    return await run_in_threadpool(call)
+
 
 # ======== DB Model ========
 
@@ -41,11 +204,150 @@ class Prediction(Base):
     prediction_type = Column(String(50), nullable=False)
     inputs_json = Column(Text, nullable=False)
     output_json = Column(Text, nullable=False)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    # Registry version of the model that made the prediction, when the client sent it
+    model_version = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        # Serves per-type history pages and time-window filters.
+        Index("ix_predictions_type_created_at", "prediction_type", "created_at"),
+    )
+
+
+# Typed copies of the two models' predictions: one real column per model
+# input and output, so filters and aggregates over inputs run in the
+# database. Rows share the id of their `predictions` row.
+
+class RecoveryPrediction(Base):
+    __tablename__ = "recovery_predictions"
 
+    prediction_id = Column(Integer, ForeignKey("predictions.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, nullable=False, index=True)
+    age = Column(Integer, nullable=False)
+    gender = Column(Integer, nullable=False)
+    bmi = Column(Float, nullable=False)
+    condition_type = Column(Integer, nullable=False)
+    severity_score = Column(Float, nullable=False)
+    rest_hours_per_day = Column(Float, nullable=False)
+    medication_adherence = Column(Float, nullable=False)
+    hospital_visits = Column(Integer, nullable=False)
+    smoking_status = Column(Integer, nullable=False)
+    recovery_days = Column(Float, nullable=False)
 
-# Create tables at startup
-Base.metadata.create_all(bind=engine)
+    __table_args__ = (
+        Index("ix_recovery_predictions_condition_created_at", "condition_type", "created_at"),
+    )
+
+
+class DietPrediction(Base):
+    __tablename__ = "diet_predictions"
+
+    prediction_id = Column(Integer, ForeignKey("predictions.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, nullable=False, index=True)
+    age = Column(Integer, nullable=False)
+    gender = Column(Integer, nullable=False)
+    conditions = Column(Integer, nullable=False)
+    bmi = Column(Float, nullable=False)
+    daily_calories = Column(Float, nullable=False)
+    protein_intake = Column(Float, nullable=False)
+    carb_intake = Column(Float, nullable=False)
+    fat_intake = Column(Float, nullable=False)
+    sleep_hours = Column(Float, nullable=False)
+    daily_steps = Column(Float, nullable=False)
+    water_intake_liters = Column(Float, nullable=False)
+    diet_plan_class = Column(Integer, nullable=False)
+    diet_plan_label = Column(String(32), nullable=False, index=True)
+
+
+# prediction_type -> (feature schema, typed table)
+TYPED_TABLES = {
+    RECOVERY.name: (RECOVERY, RecoveryPrediction),
+    DIET.name: (DIET, DietPrediction),
+}
+
+
+class PredictionStatsRow(Base):
+    """Persisted rollup (see backend/stats.py) of one time bucket, or the all-time total."""
+    __tablename__ = "prediction_stats"
+
+    # "total", or the bucket's start as an ISO timestamp
+    bucket = Column(String(32), primary_key=True)
+    bucket_start = Column(DateTime, nullable=True, index=True)
+    data = Column(Text, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+def missing_columns(bind) -> Dict[str, List[str]]:
+    """Columns of existing tables that the database does not have yet, per table."""
+    inspector = inspect(bind)
+    missing = {}
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        have = {c["name"] for c in inspector.get_columns(table.name)}
+        names = [c.name for c in table.columns if c.name not in have]
+        if names:
+            missing[table.name] = names
+    return missing
+
+
+def migrate() -> Dict[str, int]:
+    """
+    Create missing tables, plus any (nullable) columns and indexes older
+    tables are missing (create_all skips tables that already exist), then
+    backfill the typed tables. Returns the number of rows backfilled per
+    prediction type.
+    """
+    bind = get_engine()
+    Base.metadata.create_all(bind=bind)
+    quote = bind.dialect.identifier_preparer.quote
+    for table_name, names in missing_columns(bind).items():
+        with bind.begin() as conn:
+            for name in names:
+                column = Base.metadata.tables[table_name].columns[name]
+                conn.execute(text(
+                    f"ALTER TABLE {quote(table_name)} ADD COLUMN {quote(name)} {column.type.compile(bind.dialect)}"
+                ))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    return backfill_typed_predictions()
+
+
+def _inference():
+    # Imported on first use: pandas, joblib and the model code are only
+    # needed once something is predicted.
+    from healthe import inference
+    return inference
+
+
+# ======== Metrics ========
+
+DB_SECONDS = REGISTRY.histogram(
+    "healthe_db_seconds", "Database time by endpoint and step (acquire, query, commit)", ("endpoint", "operation")
+)
+JSON_SECONDS = REGISTRY.histogram(
+    "healthe_json_seconds", "JSON encode/decode time by endpoint", ("endpoint", "operation")
+)
+
+_LOG_ACQUIRE = DB_SECONDS.labels("log_prediction", "acquire")
+_LOG_QUERY = DB_SECONDS.labels("log_prediction", "query")
+_LOG_COMMIT = DB_SECONDS.labels("log_prediction", "commit")
+_BULK_ACQUIRE = DB_SECONDS.labels("bulk_insert", "acquire")
+_BULK_QUERY = DB_SECONDS.labels("bulk_insert", "query")
+_BULK_COMMIT = DB_SECONDS.labels("bulk_insert", "commit")
+_HISTORY_ACQUIRE = DB_SECONDS.labels("history", "acquire")
+_HISTORY_QUERY = DB_SECONDS.labels("history", "query")
+_LOG_ENCODE = JSON_SECONDS.labels("log_prediction", "encode")
+_HISTORY_DECODE = JSON_SECONDS.labels("history", "decode")
+_RECENT_ENCODE = JSON_SECONDS.labels("recent_buffer", "encode")
+_STATS_DECODE = JSON_SECONDS.labels("stats", "decode")
+
+_TYPED_SKIPPED = REGISTRY.counter(
+    "healthe_typed_rows_skipped_total",
+    "Logged predictions kept only as JSON because their values did not fit the typed table",
+    ("prediction_type",),
+)
 
 
 # ======== Schemas ========
@@ -54,6 +356,10 @@ class LogPredictionRequest(BaseModel):
     prediction_type: str
     inputs: Dict[str, Any]
     output: Dict[str, Any]
+    # Optional idempotency/correlation key echoed back in the acknowledgement.
+    client_id: Optional[str] = None
+    # Version of the model that made the prediction (see healthe/registry.py)
+    model_version: Optional[str] = None
 
 
 class PredictionItem(BaseModel):
@@ -62,11 +368,451 @@ class PredictionItem(BaseModel):
     inputs: Dict[str, Any]
     output: Dict[str, Any]
     created_at: datetime
+    model_version: Optional[str] = None
+
+
+# A batch is either a JSON array of row objects or a column-oriented object
+# mapping each feature name to an equal-length list of values.
+BatchPayload = Union[List[Dict[str, Any]], Dict[str, List[Any]]]
+
+
+class RecoveryBatchResponse(BaseModel):
+    recovery_days: List[float]
+
+
+class DietBatchResponse(BaseModel):
+    diet_plan_class: List[int]
+    diet_plan_label: List[str]
+
+
+# Largest /whatif grid; no single axis may be longer either
+WHATIF_MAX_POINTS = int(os.getenv("WHATIF_MAX_POINTS", "40000"))
+
+
+class SweepAxis(BaseModel):
+    column: str
+    # Either explicit values (labels or codes for categories) or a range
+    values: Optional[List[Any]] = Field(None, max_length=WHATIF_MAX_POINTS)
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    steps: int = Field(50, ge=1, le=WHATIF_MAX_POINTS)
+
+
+class WhatIfRequest(BaseModel):
+    inputs: Dict[str, Any]
+    vary: List[SweepAxis] = Field(min_length=1, max_length=whatif.MAX_AXES)
+
+
+class RecoveryExplainResponse(BaseModel):
+    recovery_days: List[float]
+    features: List[str]
+    # One row per input, in `features` order; each row plus its base_value
+    # sums to the prediction
+    contributions: List[List[float]]
+    base_value: List[float]
+
+
+class DietExplainResponse(BaseModel):
+    diet_plan_class: List[int]
+    diet_plan_label: List[str]
+    probability: List[float]
+    features: List[str]
+    # Terms of the predicted class's logit; each row plus its base_value
+    # (the class intercept) sums to that logit
+    contributions: List[List[float]]
+    base_value: List[float]
+
+
+# ======== Write path ========
+
+def typed_values(prediction_type: str, inputs: Dict[str, Any], output: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Column values for the prediction's typed table, or None when it has no
+    typed table or the logged values do not fit it (the JSON row is still
+    stored). Inputs may hold category labels or codes.
+    """
+    entry = TYPED_TABLES.get(prediction_type)
+    if entry is None:
+        return None
+    schema, _ = entry
+    try:
+        values = schema.records(schema.encode_record(inputs))[0]
+        # An Integer column would round e.g. age 30.7, and the typed row
+        # would then disagree with the JSON one
+        if any(isinstance(values[c], float) for c in schema.columns if schema.dtypes[c].startswith("int")):
+            raise ValueError("Non-integral value in an integer column")
+        if prediction_type == RECOVERY.name:
+            values["recovery_days"] = float(output["recovery_days"])
+        else:
+            cls = int(output["diet_plan_class"])
+            values["diet_plan_class"] = cls
+            values["diet_plan_label"] = str(output.get("diet_plan_label") or DIET_PLAN_LABELS[cls])
+    except (FeatureError, KeyError, IndexError, TypeError, ValueError):
+        _TYPED_SKIPPED.labels(prediction_type).inc()
+        return None
+    return values
+
+
+# Columns of `predictions`; rows built below also carry their typed values
+_PREDICTION_COLUMNS = ("prediction_type", "inputs_json", "output_json", "created_at", "model_version")
+
+
+def _prediction_row(req: LogPredictionRequest) -> Dict[str, Any]:
+    with _LOG_ENCODE.time():
+        inputs_json = json.dumps(req.inputs)
+        output_json = json.dumps(req.output)
+    return {
+        "prediction_type": req.prediction_type,
+        "inputs_json": inputs_json,
+        "output_json": output_json,
+        "created_at": datetime.utcnow(),
+        "model_version": req.model_version,
+        # Taken from the request's dicts, not re-parsed from the JSON text
+        "typed": typed_values(req.prediction_type, req.inputs, req.output),
+    }
+
+
+def _insert_typed(session, ids: List[int], rows: List[Dict[str, Any]]):
+    """Insert the typed rows of freshly inserted predictions, one executemany per table."""
+    by_table: Dict[str, List[Dict[str, Any]]] = {}
+    for row_id, row in zip(ids, rows):
+        if row["typed"] is not None:
+            by_table.setdefault(row["prediction_type"], []).append(
+                {**row["typed"], "prediction_id": row_id, "created_at": row["created_at"]}
+            )
+    for prediction_type, params in by_table.items():
+        session.execute(insert(TYPED_TABLES[prediction_type][1]), params)
+
+
+recent = RecentPredictions(HISTORY_CACHE_SIZE) if HISTORY_CACHE_SIZE > 0 else None
+# Training distributions for /drift, loaded at startup (see healthe/drift.py)
+drift_reference: Optional[DriftReference] = None
+
+
+def _input_bins(prediction_type: str, inputs: Dict[str, Any]):
+    if drift_reference is None:
+        return None
+    return drift_reference.observation(prediction_type, inputs)
+
+
+stats = PredictionStats(STATS_BUCKET_SECONDS, STATS_RETENTION_BUCKETS, input_bins=_input_bins)
+
+
+def _remember(row_id: int, row: Dict[str, Any]):
+    """Add a committed row to the recent-history buffer and the /stats and /drift rollups."""
+    if recent is not None:
+        with _RECENT_ENCODE.time():
+            recent.add(
+                row_id, row["prediction_type"], row["inputs_json"], row["output_json"],
+                row["created_at"], row["model_version"],
+            )
+    output: Dict[str, Any] = {}
+    if row["prediction_type"] in ("recovery_days", "diet_plan"):
+        # Parsed once here, so /stats never has to read output_json
+        with _STATS_DECODE.time():
+            output = json.loads(row["output_json"])
+    # The typed values are the already encoded inputs (plus outputs)
+    stats.observe(row["prediction_type"], output, row["created_at"], row["typed"])
+
+
+def _insert_predictions(session, rows: List[Dict[str, Any]], timers=(_BULK_ACQUIRE, _BULK_QUERY, _BULK_COMMIT)) -> List[int]:
+    """Insert prediction rows and their typed rows in one transaction; returns the new ids."""
+    acquire, query, commit = timers
+    with acquire.time():
+        session.connection()
+    with query.time():
+        ids = session.execute(
+            insert(Prediction).returning(Prediction.id, sort_by_parameter_order=True),
+            [{c: row[c] for c in _PREDICTION_COLUMNS} for row in rows],
+        ).scalars().all()
+        _insert_typed(session, ids, rows)
+    with commit.time():
+        session.commit()
+    return ids
+
+
+_LOG_TIMERS = (_LOG_ACQUIRE, _LOG_QUERY, _LOG_COMMIT)
+
+
+def bulk_insert_predictions(rows: List[Dict[str, Any]]):
+    """Insert many prediction rows in one executemany and one commit."""
+    with SessionLocal() as session:
+        ids = _insert_predictions(session, rows)
+    for row_id, row in zip(ids, rows):
+        _remember(row_id, row)
+
+
+def backfill_typed_predictions(batch_size: int = 5000) -> Dict[str, int]:
+    """
+    Typed rows for logged predictions that have none yet (e.g. rows logged
+    before the typed tables existed), in id-ordered batches with one commit
+    each. Returns the number of rows added per prediction type.
+    """
+    counts: Dict[str, int] = {}
+    with SessionLocal() as session:
+        for prediction_type, (_, model) in TYPED_TABLES.items():
+            added, after = 0, 0
+            while True:
+                batch = session.execute(
+                    select(Prediction.id, Prediction.inputs_json, Prediction.output_json, Prediction.created_at)
+                    .where(
+                        Prediction.prediction_type == prediction_type,
+                        Prediction.id > after,
+                        ~exists().where(model.prediction_id == Prediction.id),
+                    )
+                    .order_by(Prediction.id)
+                    .limit(batch_size)
+                ).all()
+                if not batch:
+                    break
+                after = batch[-1].id
+                params = []
+                for row_id, inputs_json, output_json, created_at in batch:
+                    values = typed_values(prediction_type, json.loads(inputs_json), json.loads(output_json))
+                    if values is not None:
+                        params.append({**values, "prediction_id": row_id, "created_at": created_at})
+                if params:
+                    session.execute(insert(model), params)
+                session.commit()
+                added += len(params)
+            counts[prediction_type] = added
+    return counts
+
+
+def warm_recent():
+    """Load the newest rows into the in-memory history buffer."""
+    if recent is None:
+        return
+    with SessionLocal() as session:
+        rows = session.execute(
+            select(
+                Prediction.id,
+                Prediction.prediction_type,
+                Prediction.inputs_json,
+                Prediction.output_json,
+                Prediction.created_at,
+                Prediction.model_version,
+            )
+            .order_by(Prediction.created_at.desc(), Prediction.id.desc())
+            .limit(recent.capacity)
+        ).all()
+    recent.warm(tuple(r) for r in rows)
+
+
+def load_stats(since: Optional[datetime] = None, replace: bool = False):
+    """Load rollups from prediction_stats: the total plus buckets starting at or after `since`."""
+    q = select(PredictionStatsRow.bucket, PredictionStatsRow.data)
+    if since is not None:
+        q = q.where(or_(PredictionStatsRow.bucket == TOTAL, PredictionStatsRow.bucket_start >= since))
+    with SessionLocal() as session:
+        rows = session.execute(q).all()
+    stats.load((tuple(r) for r in rows), replace=replace)
+
+
+def warm_stats():
+    """Load every bucket the in-memory rollups keep."""
+    since = stats.bucket_start(datetime.utcnow()) - timedelta(seconds=STATS_BUCKET_SECONDS * STATS_RETENTION_BUCKETS)
+    load_stats(since, replace=True)
+
+
+def flush_stats():
+    """
+    Add the pending rollup deltas to their prediction_stats rows, then reload
+    the rows that can still change (the total, the current and the previous
+    bucket), picking up what other workers have written.
+    """
+    pending = stats.take_pending()
+    if pending:
+        try:
+            with SessionLocal() as session:
+                existing = {
+                    r.bucket: r
+                    for r in session.execute(
+                        select(PredictionStatsRow).where(PredictionStatsRow.bucket.in_(list(pending))).with_for_update()
+                    ).scalars()
+                }
+                now = datetime.utcnow()
+                for key, delta in pending.items():
+                    row = existing.get(key)
+                    if row is None:
+                        session.add(PredictionStatsRow(
+                            bucket=key,
+                            bucket_start=None if key == TOTAL else datetime.fromisoformat(key),
+                            data=delta.to_json(),
+                            updated_at=now,
+                        ))
+                    else:
+                        row.data = Rollup.from_json(row.data).merge(delta).to_json()
+                        row.updated_at = now
+                session.commit()
+        except Exception:
+            stats.restore_pending(pending)
+            raise
+    load_stats(stats.bucket_start(datetime.utcnow()) - timedelta(seconds=STATS_BUCKET_SECONDS))
+
+
+def _stats_rows(session):
+    """
+    (prediction_type, inputs, output, created_at) of every prediction, read
+    from the typed tables where a row has a typed copy and decoded from the
+    JSON log otherwise.
+    """
+    for prediction_type, (schema, model) in TYPED_TABLES.items():
+        outputs = [c for c in model.__table__.columns.keys() if c not in ("prediction_id", "created_at", *schema.columns)]
+        n = len(schema.columns)
+        result = session.execute(
+            select(model.created_at, *(getattr(model, c) for c in (*schema.columns, *outputs)))
+            .execution_options(yield_per=10_000)
+        )
+        for row in result:
+            yield prediction_type, dict(zip(schema.columns, row[1:n + 1])), dict(zip(outputs, row[n + 1:])), row[0]
+
+    result = session.execute(
+        select(Prediction.prediction_type, Prediction.inputs_json, Prediction.output_json, Prediction.created_at)
+        .where(*(~exists().where(model.prediction_id == Prediction.id) for _, model in TYPED_TABLES.values()))
+        .execution_options(yield_per=10_000)
+    )
+    for prediction_type, inputs_json, output_json, created_at in result:
+        # Only the models' predictions are summarized beyond their count
+        if prediction_type in TYPED_TABLES:
+            yield prediction_type, json.loads(inputs_json), json.loads(output_json), created_at
+        else:
+            yield prediction_type, None, {}, created_at
+
+
+def rebuild_stats() -> Dict[str, Any]:
+    """
+    Recompute every rollup from the typed tables (and the JSON log for other
+    rows) and replace the prediction_stats rows. Rows logged while the scan
+    runs may be counted twice (by the scan and as a pending delta) until the
+    next rebuild.
+    """
+    started = time.perf_counter()
+    # Everything observed so far is committed, so the scan counts it
+    stats.discard_pending()
+    with SessionLocal() as session:
+        rollups = stats.rollups_from_rows(_stats_rows(session))
+        now = datetime.utcnow()
+        session.execute(delete(PredictionStatsRow))
+        session.add_all(
+            PredictionStatsRow(
+                bucket=key,
+                bucket_start=None if key == TOTAL else datetime.fromisoformat(key),
+                data=rollup.to_json(),
+                updated_at=now,
+            )
+            for key, rollup in rollups.items()
+        )
+        session.commit()
+    warm_stats()
+    return {
+        "rows": sum(rollups[TOTAL].counts.values()),
+        "buckets": len(rollups) - 1,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+log_buffer: Optional[PredictionBuffer] = None
+metrics_collector = (
+    MultiProcessCollector(METRICS_MULTIPROC_DIR, interval=METRICS_WRITE_SECONDS)
+    if METRICS_MULTIPROC_DIR else None
+)
+
+# Where startup time went, reported by /startup.
+startup_report: Dict[str, Any] = {"pid": os.getpid(), "model_loading": MODEL_LOADING}
+
+
+def _timed(name: str, fn):
+    t0 = time.perf_counter()
+    result = fn()
+    startup_report[f"{name}_seconds"] = round(time.perf_counter() - t0, 4)
+    return result
+
+
+if MODEL_LOADING == "preload":
+    # Runs in the master before workers are forked; see inference.preload().
+    _timed("preload_models", lambda: _inference().preload())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global log_buffer, drift_reference
+    started = time.perf_counter()
+    startup_report["pid"] = os.getpid()
+    _timed("engine", get_engine)
+    if DB_ASYNC:
+        _timed("async_engine", get_async_engine)
+    # Threads for sync endpoints and for run_db() outside DB_ASYNC mode
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    if DB_AUTO_MIGRATE:
+        _timed("migrate", migrate)
+    inspector = inspect(engine)
+    missing = [t.name for t in Base.metadata.sorted_tables if not inspector.has_table(t.name)]
+    if missing:
+        raise RuntimeError(
+            f"Missing tables {missing}; run `python -m backend.migrate` "
+            "or start with DB_AUTO_MIGRATE=1"
+        )
+    missing = missing_columns(engine)
+    if missing:
+        raise RuntimeError(
+            f"Missing columns {missing}; run `python -m backend.migrate` "
+            "or start with DB_AUTO_MIGRATE=1"
+        )
+    # Before any row is observed, so every row counts towards /drift
+    try:
+        drift_reference = _timed("drift_reference", DriftReference.load)
+    except OSError:
+        # No stored reference and no training data: /drift answers 503
+        logger.exception("Could not load the drift reference; /drift is disabled")
+    _timed("warm_history", warm_recent)
+    _timed("warm_stats", warm_stats)
+    if MODEL_LOADING == "startup":
+        _timed("load_models", lambda: _inference().load_fast_predictors())
+    if MODEL_LOADING != "lazy":
+        # Watch for new model versions; with lazy loading the first load starts it
+        _inference().MODELS.start()
+    startup_report["startup_seconds"] = round(time.perf_counter() - started, 4)
+    if LOG_BUFFERED:
+        log_buffer = PredictionBuffer(
+            bulk_insert_predictions,
+            max_batch=LOG_BUFFER_MAX_BATCH,
+            flush_interval=LOG_BUFFER_FLUSH_SECONDS,
+            max_pending=LOG_BUFFER_MAX_PENDING,
+            block_seconds=LOG_BUFFER_BLOCK_SECONDS,
+        )
+        log_buffer.start()
+    stats.start(flush_stats, STATS_FLUSH_SECONDS)
+    if metrics_collector is not None:
+        metrics_collector.start()
+    try:
+        yield
+    finally:
+        if metrics_collector is not None:
+            metrics_collector.stop()
+        if log_buffer is not None:
+            # Drain whatever is still queued before the process exits.
+            log_buffer.stop()
+            log_buffer = None
+        # Writes the last pending deltas
+        stats.stop()
+        if async_engine is not None:
+            # Its connections belong to this event loop
+            await async_engine.dispose()
 
 
 # ======== App ========
 
-app = FastAPI(title="HealthE Backend", version="1.0.0")
+app = FastAPI(title="HealthE Backend", version="1.0.0", lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
+
+REGISTRY.gauge("healthe_log_buffer_pending", "Prediction logs queued for the write-behind flusher").set_function(
+    lambda: log_buffer.pending if log_buffer is not None else 0
+)
+for _stat in ("flushed", "dropped", "rejected"):
+    REGISTRY.counter(f"healthe_log_buffer_{_stat}_total", f"Prediction logs {_stat} by the write-behind buffer").labels().set_function(
+        lambda _stat=_stat: getattr(log_buffer, _stat) if log_buffer is not None else 0
+    )
 
 
 @app.get("/health")
@@ -74,39 +820,245 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics():
+    """
+    Counters and latency histograms in Prometheus text format: of every
+    worker when METRICS_MULTIPROC_DIR is set, otherwise of this process.
+    """
+    text = metrics_collector.render() if metrics_collector is not None else REGISTRY.render()
+    return Response(text, media_type=CONTENT_TYPE)
+
+
+@app.get("/startup")
+def startup_stats():
+    """Import and startup-hook timings of this worker, and its current memory."""
+    return {**startup_report, **memory_usage()}
+
+
+async def _buffer_submit(row: Dict[str, Any]) -> bool:
+    # Only a full queue makes submit() wait; that wait happens off the event loop
+    return log_buffer.submit(row, block=False) or await run_in_threadpool(log_buffer.submit, row)
+
+
 @app.post("/log_prediction")
-def log_prediction(req: LogPredictionRequest):
-    try:
-        session = SessionLocal()
-        db_obj = Prediction(
-            prediction_type=req.prediction_type,
-            inputs_json=json.dumps(req.inputs),
-            output_json=json.dumps(req.output),
-            created_at=datetime.utcnow(),
+async def log_prediction(req: LogPredictionRequest):
+    row = _prediction_row(req)
+
+    if log_buffer is not None:
+        if not await _buffer_submit(row):
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Prediction log queue is full, retry later"},
+                headers={"Retry-After": "1"},
+            )
+        return JSONResponse(
+            status_code=202,
+            content={"status": "queued", "client_id": req.client_id or uuid.uuid4().hex},
         )
-        session.add(db_obj)
-        session.commit()
-        session.refresh(db_obj)
-        return {"id": db_obj.id}
+
+    try:
+        [new_id] = await run_db(_insert_predictions, [row], _LOG_TIMERS)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        session.close()
+    _remember(new_id, row)
+    if req.client_id is not None:
+        return {"id": new_id, "client_id": req.client_id}
+    return {"id": new_id}
+
+
+@app.post("/log_predictions")
+async def log_predictions(reqs: List[LogPredictionRequest]):
+    """Log several predictions in one call (used by the frontend's batching client)."""
+    rows = [_prediction_row(r) for r in reqs]
+
+    if log_buffer is not None:
+        for accepted, row in enumerate(rows):
+            if not await _buffer_submit(row):
+                # Rows are taken in order, so the client can resend rows[accepted:].
+                return JSONResponse(
+                    status_code=503,
+                    content={"detail": "Prediction log queue is full, retry later", "accepted": accepted},
+                    headers={"Retry-After": "1"},
+                )
+        return JSONResponse(status_code=202, content={"status": "queued", "accepted": len(rows)})
+
+    if rows:
+        try:
+            ids = await run_db(_insert_predictions, rows)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        for row_id, row in zip(ids, rows):
+            _remember(row_id, row)
+    return {"logged": len(rows)}
+
+
+HISTORY_MAX_LIMIT = 1000
+
+
+def _encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _newest_key(session):
+    row = session.execute(
+        select(Prediction.created_at, Prediction.id).order_by(Prediction.id.desc()).limit(1)
+    ).first()
+    return tuple(row) if row else None
+
+
+async def _latest_prediction_key():
+    """
+    (created_at, id) of the prediction with the highest id. Only a single
+    worker sees every insert, so only then may it answer from its buffer.
+    """
+    if recent is not None and WEB_CONCURRENCY <= 1:
+        return recent.newest()
+    return await run_db(_newest_key)
+
+
+async def _history_validators(request: Request) -> Dict[str, str]:
+    """
+    ETag / Last-Modified for a /history request. Rows are append-only, so the
+    newest id (plus the query itself) identifies the response.
+    """
+    latest = await _latest_prediction_key()
+    latest_id = latest[1] if latest else 0
+    query_hash = zlib.crc32(request.url.query.encode())
+    headers = {"ETag": f'W/"{latest_id}-{query_hash:08x}"'}
+    if latest:
+        headers["Last-Modified"] = format_datetime(latest[0].replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+_WHERE = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$")
+_WHERE_OPS = {"=": operator.eq, "!=": operator.ne, ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+def typed_filters(prediction_type: Optional[str], where: List[str]):
+    """
+    (typed table, conditions) for `where` terms such as `age>=60`,
+    `condition_type=Diabetes` or `recovery_days<5` on the columns of the
+    prediction type's typed table, so they are evaluated by the database.
+    Categories may be given as labels or codes. Raises ValueError otherwise.
+    """
+    entry = TYPED_TABLES.get(prediction_type)
+    if entry is None:
+        raise ValueError(f"Input filters need prediction_type to be one of {sorted(TYPED_TABLES)}")
+    schema, model = entry
+    conditions = []
+    for term in where:
+        match = _WHERE.match(term)
+        if match is None:
+            raise ValueError(f"Filter {term!r} is not of the form <column><op><value>")
+        name, op, raw = match.groups()
+        if name in ("prediction_id", "created_at") or name not in model.__table__.columns:
+            raise ValueError(f"Filter {term!r} names no input or output of {prediction_type}")
+        column = getattr(model, name)
+        if isinstance(column.type, String):
+            value = raw
+        elif raw in schema.categories.get(name, ()):
+            value = list(schema.categories[name]).index(raw)
+        else:
+            try:
+                value = float(raw)
+            except ValueError:
+                raise ValueError(f"Filter {term!r} needs a number or a category of {name}")
+        conditions.append(_WHERE_OPS[op](column, value))
+    return model, conditions
+
+
+def _filtered(stmt, prediction_type, since, until, filters):
+    if prediction_type is not None:
+        stmt = stmt.where(Prediction.prediction_type == prediction_type)
+    if since is not None:
+        stmt = stmt.where(Prediction.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(Prediction.created_at < until)
+    if filters is not None:
+        model, conditions = filters
+        stmt = stmt.join(model, model.prediction_id == Prediction.id).where(*conditions)
+    return stmt
+
+
+def _history_page(session, limit, prediction_type, since, until, after, filters=None):
+    """Rows (id, type, inputs_json, output_json, created_at, model_version) of one /history page."""
+    with _HISTORY_ACQUIRE.time():
+        session.connection()
+    stmt = _filtered(select(
+        Prediction.id, Prediction.prediction_type, Prediction.inputs_json,
+        Prediction.output_json, Prediction.created_at, Prediction.model_version,
+    ), prediction_type, since, until, filters)
+    if after is not None:
+        stmt = stmt.where(tuple_(Prediction.created_at, Prediction.id) < tuple_(*after))
+
+    with _HISTORY_QUERY.time():
+        return session.execute(
+            stmt.order_by(Prediction.created_at.desc(), Prediction.id.desc()).limit(limit)
+        ).all()
 
 
 @app.get("/history", response_model=List[PredictionItem])
-def get_history(limit: int = 10):
-    session = SessionLocal()
+async def get_history(
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=HISTORY_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    prediction_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    where: List[str] = Query([]),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Newest-first page of predictions, optionally filtered by type, a
+    `[since, until)` window on `created_at` and `where` terms on the typed
+    inputs and outputs of `prediction_type` (see `typed_filters`).
+
+    Pagination is keyset-based: when more rows may follow, the response carries
+    an `X-Next-Cursor` header to pass back as `cursor`. Each page is an index
+    range scan of `limit` rows, however deep it is. Unfiltered first pages are
+    served from the in-memory buffer of recent predictions when it can.
+
+    Responses carry an ETag; a request whose `If-None-Match` still matches gets
+    an empty 304 without any rows being read.
+    """
     try:
-        q = (
-            session.query(Prediction)
-            .order_by(Prediction.id.desc())
-            .limit(limit)
-            .all()
-        )
+        filters = typed_filters(prediction_type, where) if where else None
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    validators = await _history_validators(request)
+    if if_none_match is not None and validators["ETag"] in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=validators)
+
+    if recent is not None and cursor is None and prediction_type is None and since is None and until is None:
+        cached = recent.latest(limit)
+        if cached is not None:
+            body, last_key = cached
+            if last_key:
+                validators["X-Next-Cursor"] = _encode_cursor(*last_key)
+            return Response(content=body, media_type="application/json", headers=validators)
+
+    response.headers.update(validators)
+    after = _decode_cursor(cursor) if cursor is not None else None
+    rows = await run_db(_history_page, limit, prediction_type, since, until, after, filters)
 
-        result: List[PredictionItem] = []
-        for row in q:
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    result: List[PredictionItem] = []
+    with _HISTORY_DECODE.time():
+        for row in rows:
             result.append(
                 PredictionItem(
                     id=row.id,
@@ -114,8 +1066,225 @@ def get_history(limit: int = 10):
                     inputs=json.loads(row.inputs_json),
                     output=json.loads(row.output_json),
                     created_at=row.created_at,
+                    model_version=row.model_version,
                 )
             )
-        return result
-    finally:
-        session.close()
+    return result
+
+
+STATS_MAX_HOURS = max(1, STATS_BUCKET_SECONDS * STATS_RETENTION_BUCKETS // 3600)
+
+
+@app.get("/stats")
+def get_stats(hours: int = Query(24, ge=1, le=STATS_MAX_HOURS)):
+    """
+    Prediction counts per type, mean and quantiles of recovery_days and the
+    distribution of diet_plan_label: all-time, over the last `hours`, and per
+    time bucket within that window. Served from in-memory rollups; quantiles
+    are within 1% of a true value.
+    """
+    window = max(1, -(-hours * 3600 // STATS_BUCKET_SECONDS))
+    return stats.snapshot(window)
+
+
+@app.post("/stats/rebuild")
+def post_stats_rebuild():
+    """Recompute the /stats rollups from the predictions table."""
+    return rebuild_stats()
+
+
+@app.get("/drift")
+def get_drift(
+    hours: int = Query(24, ge=1, le=STATS_MAX_HOURS),
+    min_count: int = Query(drift.MIN_COUNT, ge=1),
+):
+    """
+    Input drift per prediction type: for every model input, the PSI and KL
+    divergence of the logged inputs against the training data, over the last
+    `hours` and all-time. Served from the binned counts kept with the /stats
+    rollups, so it costs the same however many predictions were logged.
+    """
+    if drift_reference is None:
+        raise HTTPException(status_code=503, detail="Drift reference not loaded")
+    window = max(1, -(-hours * 3600 // STATS_BUCKET_SECONDS))
+    return {
+        "hours": hours,
+        "thresholds": {"warn": drift.PSI_WARN, "alert": drift.PSI_ALERT, "min_count": min_count},
+        "reference": drift_reference.sources,
+        "window": drift_reference.report(stats.input_counts(window), min_count),
+        "total": drift_reference.report(stats.input_counts(), min_count),
+    }
+
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+_EXPORT_ROWS = REGISTRY.counter("healthe_export_rows_total", "Predictions streamed by /export", ("format",))
+
+
+def _export_batches(stmt, rows_counter):
+    """
+    Row batches of `stmt` read through a server-side cursor, EXPORT_BATCH_SIZE
+    rows at a time. The session lives as long as the generator, so it is closed
+    when the response finishes or the client goes away.
+    """
+    with SessionLocal() as session:
+        result = session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE, stream_results=True))
+        for batch in result.partitions():
+            rows_counter.inc(len(batch))
+            yield batch
+
+
+@app.get("/export")
+def export_predictions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    prediction_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    where: List[str] = Query([]),
+):
+    """
+    Stream every matching prediction, oldest first, as NDJSON, CSV or Parquet,
+    filtered like /history.
+    Rows are read and encoded one batch at a time, so memory stays flat and
+    the first bytes go out before the query has finished.
+    """
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed")
+    try:
+        filters = typed_filters(prediction_type, where) if where else None
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    stmt = _filtered(select(
+        Prediction.id, Prediction.prediction_type, Prediction.inputs_json,
+        Prediction.output_json, Prediction.created_at, Prediction.model_version,
+    ), prediction_type, since, until, filters)
+    stmt = stmt.order_by(Prediction.created_at, Prediction.id)
+
+    encode = {"ndjson": export.ndjson_chunks, "csv": export.csv_chunks, "parquet": export.parquet_chunks}[format]
+    media_type, extension = export.FORMATS[format]
+    return StreamingResponse(
+        encode(_export_batches(stmt, _EXPORT_ROWS.labels(format))),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="predictions.{extension}"'},
+    )
+
+
+# Predictions carry the model version that made them, for clients to log
+MODEL_VERSION_HEADER = "X-Model-Version"
+
+
+@app.post("/predict/recovery_days", response_model=RecoveryBatchResponse)
+def predict_recovery_days(response: Response, payload: BatchPayload = Body(...)):
+    inference = _inference()
+    version = inference.MODELS.current(RECOVERY.name)
+    try:
+        preds = inference.predict_recovery_days(inference.to_columns(payload), version)
+    except FeatureError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    response.headers[MODEL_VERSION_HEADER] = version.version
+    return {"recovery_days": preds.round(2).tolist()}
+
+
+@app.post("/predict/diet_plan", response_model=DietBatchResponse)
+def predict_diet_plan(response: Response, payload: BatchPayload = Body(...)):
+    inference = _inference()
+    version = inference.MODELS.current(DIET.name)
+    try:
+        classes = inference.predict_diet_plan(inference.to_columns(payload), version)
+    except FeatureError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    response.headers[MODEL_VERSION_HEADER] = version.version
+    return {
+        "diet_plan_class": classes.tolist(),
+        "diet_plan_label": [inference.DIET_PLAN_LABELS.get(c, "Unknown") for c in classes.tolist()],
+    }
+
+
+@app.post("/explain/recovery_days", response_model=RecoveryExplainResponse)
+def explain_recovery_days(
+    response: Response,
+    payload: BatchPayload = Body(...),
+    method: str = Query("path", pattern="^(path|shap)$"),
+):
+    """
+    Predictions with per-feature contributions, computed in the same batched
+    model call. `path` (default) attributes each tree split along the
+    prediction's path to its feature, at about the cost of predicting;
+    `shap` is LightGBM's exact TreeSHAP `pred_contrib`, much slower.
+    """
+    inference = _inference()
+    version = inference.MODELS.current(RECOVERY.name)
+    try:
+        preds, contrib = inference.explain_recovery_days(inference.to_columns(payload), method, version)
+    except FeatureError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    response.headers[MODEL_VERSION_HEADER] = version.version
+    return {
+        "recovery_days": preds.round(2).tolist(),
+        "features": list(RECOVERY.columns),
+        "contributions": contrib[:, :-1].round(4).tolist(),
+        "base_value": contrib[:, -1].round(4).tolist(),
+    }
+
+
+@app.post("/explain/diet_plan", response_model=DietExplainResponse)
+def explain_diet_plan(response: Response, payload: BatchPayload = Body(...)):
+    """Diet-plan predictions with the coefficient x scaled-feature terms of the chosen plan's logit."""
+    inference = _inference()
+    version = inference.MODELS.current(DIET.name)
+    try:
+        classes, proba, contrib = inference.explain_diet_plan(inference.to_columns(payload), version)
+    except FeatureError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    response.headers[MODEL_VERSION_HEADER] = version.version
+    return {
+        "diet_plan_class": classes.tolist(),
+        "diet_plan_label": [inference.DIET_PLAN_LABELS.get(c, "Unknown") for c in classes.tolist()],
+        "probability": proba.max(axis=1).round(4).tolist(),
+        "features": list(DIET.columns),
+        "contributions": contrib[:, :-1].round(4).tolist(),
+        "base_value": contrib[:, -1].round(4).tolist(),
+    }
+
+
+@app.post("/whatif/{prediction_type}")
+def what_if(prediction_type: str, req: WhatIfRequest):
+    """
+    One patient's prediction over a grid of one or two varied inputs (e.g.
+    rest_hours_per_day x medication_adherence), scored in a single batched
+    model call. Returns the axes, the patient's own prediction as `baseline`
+    and the predictions as nested lists, one level per axis.
+    """
+    if prediction_type not in TYPED_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown prediction type {prediction_type!r}")
+    inference = _inference()
+    try:
+        return inference.what_if(
+            prediction_type, req.inputs, [a.model_dump(exclude_none=True) for a in req.vary], WHATIF_MAX_POINTS
+        )
+    except FeatureError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/models")
+def model_versions():
+    """Active version of each loaded model: manifest checksums, metadata and load time."""
+    return _inference().MODELS.describe()
+
+
+@app.post("/models/reload")
+def reload_models():
+    """
+    Check for new model versions now instead of waiting for the next poll.
+    New versions are loaded and warmed up before they replace the active ones.
+    """
+    inference = _inference()
+    inference.load_fast_predictors()
+    return {"swapped": inference.MODELS.refresh(), "active": inference.MODELS.versions()}
+
+
+@app.get("/cache/stats")
+def prediction_cache_stats():
+    """Hit/miss/eviction counters of the prediction cache used by /predict/*."""
+    return _inference().PREDICTION_CACHE.stats()
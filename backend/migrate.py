@@ -0,0 +1,38 @@
+"""
+Create or update the database schema.
+
+    DB_URL=... python -m backend.migrate
+    DB_URL=... python -m backend.migrate --rebuild-stats
+
+Run this once per deployment (the backend no longer changes the schema when
+it starts, unless DB_AUTO_MIGRATE=1). `--rebuild-stats` recomputes the /stats
+rollups from the predictions table, e.g. after the prediction_stats table was
+first created on a database that already had predictions.
+"""
+
+import argparse
+import time
+
+from backend import main
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Create or update the HealthE database schema.")
+    parser.add_argument("--rebuild-stats", action="store_true", help="Recompute the /stats rollups afterwards")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    backfilled = main.migrate()
+    print(f"Schema up to date ({main.engine.url.render_as_string(hide_password=True)}, "
+          f"{time.perf_counter() - t0:.2f}s)")
+    for prediction_type, n in backfilled.items():
+        if n:
+            print(f"Backfilled {n} {prediction_type} rows into typed tables")
+    if args.rebuild_stats:
+        result = main.rebuild_stats()
+        print(f"Rebuilt stats from {result['rows']} predictions into {result['buckets']} buckets "
+              f"({result['seconds']:.2f}s)")
+
+
+if __name__ == "__main__":
+    run()
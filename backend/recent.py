@@ -0,0 +1,97 @@
+"""
+In-memory ring buffer of the most recent predictions.
+
+Each entry is kept as the exact JSON bytes `/history` would return for it,
+built by splicing the stored `inputs_json` / `output_json` text rather than
+parsing and re-encoding it. Small unfiltered `/history` pages are then a join
+of cached bytes with no database round trip.
+
+The buffer is per process: with several workers, each one only sees rows it
+logged itself plus what it loaded at startup.
+"""
+
+import bisect
+import json
+import threading
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# (created_at, id) -- the same order /history pages in.
+Key = Tuple[datetime, int]
+
+
+def serialize_prediction(
+    id: int, prediction_type: str, inputs_json: str, output_json: str, created_at: datetime,
+    model_version: Optional[str] = None,
+) -> bytes:
+    return (
+        f'{{"id":{id},"prediction_type":{json.dumps(prediction_type)},'
+        f'"inputs":{inputs_json},"output":{output_json},'
+        f'"created_at":"{created_at.isoformat()}","model_version":{json.dumps(model_version)}}}'
+    ).encode()
+
+
+class RecentPredictions:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._keys: List[Key] = []
+        self._items: List[bytes] = []
+        self._lock = threading.Lock()
+        # True when the buffer is known to hold every row in the table.
+        self._complete = False
+        # Key of the row with the highest id seen, as the database's
+        # `order by id desc limit 1` would pick it (the /history validator)
+        self._newest: Optional[Key] = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def warm(self, rows):
+        """Replace the contents with `rows` (newest first, at most `capacity`)."""
+        rows = list(rows)
+        with self._lock:
+            self._keys = []
+            self._items = []
+            self._newest = None
+            for row in reversed(rows):
+                self._insert(row)
+            self._complete = len(rows) < self.capacity
+
+    def add(self, id, prediction_type, inputs_json, output_json, created_at, model_version=None):
+        with self._lock:
+            self._insert((id, prediction_type, inputs_json, output_json, created_at, model_version))
+
+    def _insert(self, row):
+        key = (row[4], row[0])
+        if self._newest is None or key[1] > self._newest[1]:
+            self._newest = key
+        data = serialize_prediction(*row)
+        # Rows almost always arrive in order, so this is normally an append.
+        pos = bisect.bisect(self._keys, key)
+        self._keys.insert(pos, key)
+        self._items.insert(pos, data)
+        if len(self._keys) > self.capacity:
+            del self._keys[0]
+            del self._items[0]
+            self._complete = False
+
+    def newest(self) -> Optional[Key]:
+        """(created_at, id) of the row with the highest id added so far."""
+        with self._lock:
+            return self._newest
+
+    def latest(self, limit: int) -> Optional[Tuple[bytes, Optional[Key]]]:
+        """
+        The newest `limit` entries as a JSON array, plus the key of the last
+        one when more rows may exist past it. None when the buffer cannot
+        answer (fewer than `limit` entries and possibly more in the database).
+        """
+        with self._lock:
+            n = len(self._keys)
+            if limit > n and not self._complete:
+                return None
+            take = min(limit, n)
+            items = self._items[n - take:]
+            last_key = self._keys[n - take] if take == limit and take else None
+        items.reverse()
+        return b"[" + b",".join(items) + b"]", last_key
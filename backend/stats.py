@@ -0,0 +1,311 @@
+"""
+Incrementally maintained prediction statistics.
+
+Every logged prediction is added to two rollups: the all-time total and the
+rollup of its time bucket (hourly by default). A rollup holds counts per
+prediction type, a quantile sketch of `recovery_days`, counts per
+`diet_plan_label` and, for input drift (see `healthe/drift.py`), counts per
+bin of every model input, keyed by the drift reference whose bins they use.
+`/stats` and `/drift` answer from memory by merging at most a window's worth
+of bucket rollups -- their cost does not grow with the number of logged
+predictions.
+
+The rollups are persisted in the `prediction_stats` table, one row per bucket
+plus one for the total. New observations accumulate as pending deltas that
+are periodically merged into those rows (adding counts, so several workers can
+write to the same bucket); after a flush the worker reloads the rows that can
+still change, which brings in other workers' deltas as well.
+"""
+
+import json
+import logging
+import math
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from healthe.sketch import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+TOTAL = "total"
+_EPOCH = datetime(1970, 1, 1)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _add_counts(into: List[int], counts: Sequence[int]):
+    if len(into) < len(counts):
+        into.extend([0] * (len(counts) - len(into)))
+    for i, n in enumerate(counts):
+        into[i] += n
+
+
+class Rollup:
+    __slots__ = ("counts", "recovery_days", "diet_plan_labels", "input_bins")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.counts: Dict[str, int] = {}
+        self.recovery_days = QuantileSketch(relative_accuracy)
+        self.diet_plan_labels: Dict[str, int] = {}
+        # drift counts key (see DriftReference.counts_key) -> per input, count per bin
+        self.input_bins: Dict[str, List[List[int]]] = {}
+
+    def add(self, prediction_type: str, output: Dict[str, Any], observation: Optional[Tuple[str, Sequence[int]]] = None):
+        """Count one prediction; `observation` is (drift counts key, bin per input) of its inputs."""
+        self.counts[prediction_type] = self.counts.get(prediction_type, 0) + 1
+        if observation is not None:
+            key, bins = observation
+            features = self.input_bins.setdefault(key, [])
+            if len(features) < len(bins):
+                features.extend([] for _ in range(len(bins) - len(features)))
+            for counts, b in zip(features, bins):
+                if len(counts) <= b:
+                    counts.extend([0] * (b + 1 - len(counts)))
+                counts[b] += 1
+        if prediction_type == "recovery_days":
+            value = output.get("recovery_days")
+            # The prediction is still counted; an infinite or NaN value has no place in the sketch
+            if isinstance(value, (int, float)) and math.isfinite(value):
+                self.recovery_days.add(float(value))
+        elif prediction_type == "diet_plan":
+            label = output.get("diet_plan_label")
+            if label is not None:
+                label = str(label)
+                self.diet_plan_labels[label] = self.diet_plan_labels.get(label, 0) + 1
+
+    def merge(self, other: "Rollup") -> "Rollup":
+        for k, n in other.counts.items():
+            self.counts[k] = self.counts.get(k, 0) + n
+        for k, n in other.diet_plan_labels.items():
+            self.diet_plan_labels[k] = self.diet_plan_labels.get(k, 0) + n
+        self.recovery_days.merge(other.recovery_days)
+        for key, features in other.input_bins.items():
+            mine = self.input_bins.setdefault(key, [])
+            if len(mine) < len(features):
+                mine.extend([] for _ in range(len(features) - len(mine)))
+            for into, counts in zip(mine, features):
+                _add_counts(into, counts)
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        sketch = self.recovery_days
+        return {
+            "counts": dict(sorted(self.counts.items())),
+            "total": sum(self.counts.values()),
+            "recovery_days": {
+                "count": sketch.count,
+                "mean": sketch.mean,
+                "min": sketch.min if sketch.count else None,
+                "max": sketch.max if sketch.count else None,
+                **{f"p{round(q * 100)}": sketch.quantile(q) for q in QUANTILES},
+            },
+            "diet_plan_label": dict(sorted(self.diet_plan_labels.items())),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "counts": self.counts,
+            "recovery_days": self.recovery_days.to_dict(),
+            "diet_plan_labels": self.diet_plan_labels,
+            "input_bins": self.input_bins,
+        })
+
+    @classmethod
+    def from_json(cls, text: str) -> "Rollup":
+        data = json.loads(text)
+        rollup = cls()
+        rollup.counts = data["counts"]
+        rollup.recovery_days = QuantileSketch.from_dict(data["recovery_days"])
+        rollup.diet_plan_labels = data["diet_plan_labels"]
+        # Absent from rows written before drift monitoring
+        rollup.input_bins = data.get("input_bins", {})
+        return rollup
+
+
+class PredictionStats:
+    """In-memory rollups plus the deltas not yet written to the summary table."""
+
+    def __init__(
+        self,
+        bucket_seconds: int = 3600,
+        retention_buckets: int = 168,
+        relative_accuracy: float = 0.01,
+        input_bins: Optional[Callable[[str, Mapping[str, Any]], Optional[Tuple[str, Sequence[int]]]]] = None,
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.retention_buckets = retention_buckets
+        self.relative_accuracy = relative_accuracy
+        # (prediction_type, inputs) -> (drift counts key, bin per input), or None to skip
+        self.input_bins = input_bins
+
+        self._total = Rollup(relative_accuracy)
+        self._buckets: Dict[datetime, Rollup] = {}
+        self._pending: Dict[str, Rollup] = {}
+        self._lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_fn: Callable[[], None] = lambda: None
+
+    # ---- keys ----
+
+    def bucket_start(self, created_at: datetime) -> datetime:
+        """Start of the bucket holding `created_at` (naive UTC, like `created_at` columns)."""
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        seconds = int((created_at - _EPOCH).total_seconds())
+        return _EPOCH + timedelta(seconds=seconds - seconds % self.bucket_seconds)
+
+    @staticmethod
+    def key(bucket_start: Optional[datetime]) -> str:
+        return TOTAL if bucket_start is None else bucket_start.isoformat()
+
+    # ---- updates ----
+
+    def _bins(self, prediction_type: str, inputs: Optional[Mapping[str, Any]]) -> Optional[Tuple[str, Sequence[int]]]:
+        if self.input_bins is None or inputs is None:
+            return None
+        return self.input_bins(prediction_type, inputs)
+
+    def observe(
+        self, prediction_type: str, output: Dict[str, Any], created_at: datetime,
+        inputs: Optional[Mapping[str, Any]] = None,
+    ):
+        start = self.bucket_start(created_at)
+        key = self.key(start)
+        observation = self._bins(prediction_type, inputs)
+        with self._lock:
+            bucket = self._buckets.get(start)
+            if bucket is None:
+                bucket = self._buckets[start] = Rollup(self.relative_accuracy)
+                self._prune()
+            for rollup in (
+                self._total,
+                bucket,
+                self._pending.setdefault(TOTAL, Rollup(self.relative_accuracy)),
+                self._pending.setdefault(key, Rollup(self.relative_accuracy)),
+            ):
+                rollup.add(prediction_type, output, observation)
+
+    def take_pending(self) -> Dict[str, Rollup]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def restore_pending(self, pending: Dict[str, Rollup]):
+        """Put back deltas whose flush failed, ahead of anything newer."""
+        with self._lock:
+            for key, rollup in pending.items():
+                current = self._pending.get(key)
+                self._pending[key] = rollup if current is None else rollup.merge(current)
+
+    def load(self, rows: Iterable[Tuple[str, str]], replace: bool = False):
+        """
+        Set rollups from summary-table rows (key, data). Deltas that are still
+        pending are added on top, since the rows do not include them yet.
+        With `replace`, buckets missing from `rows` are dropped.
+        """
+        with self._lock:
+            if replace:
+                self._total = Rollup(self.relative_accuracy)
+                self._buckets = {}
+            for key, data in rows:
+                rollup = Rollup.from_json(data)
+                pending = self._pending.get(key)
+                if pending is not None:
+                    rollup.merge(pending)
+                if key == TOTAL:
+                    self._total = rollup
+                else:
+                    self._buckets[datetime.fromisoformat(key)] = rollup
+            self._prune()
+
+    def rollups_from_rows(
+        self, rows: Iterable[Tuple[str, Optional[Mapping[str, Any]], Dict[str, Any], datetime]]
+    ) -> Dict[str, Rollup]:
+        """
+        Rollups (by key, total included) for (prediction_type, inputs, output,
+        created_at) rows, e.g. a scan of the typed prediction tables. Nothing
+        in memory is changed.
+        """
+        total = Rollup(self.relative_accuracy)
+        rollups = {TOTAL: total}
+        for prediction_type, inputs, output, created_at in rows:
+            observation = self._bins(prediction_type, inputs)
+            key = self.key(self.bucket_start(created_at))
+            bucket = rollups.get(key)
+            if bucket is None:
+                bucket = rollups[key] = Rollup(self.relative_accuracy)
+            total.add(prediction_type, output, observation)
+            bucket.add(prediction_type, output, observation)
+        return rollups
+
+    def discard_pending(self):
+        with self._lock:
+            self._pending = {}
+
+    def _prune(self):
+        if len(self._buckets) > self.retention_buckets:
+            for start in sorted(self._buckets)[: len(self._buckets) - self.retention_buckets]:
+                del self._buckets[start]
+
+    # ---- reads ----
+
+    def snapshot(self, window_buckets: int, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Total, the merged last `window_buckets` buckets, and each of those buckets."""
+        current = self.bucket_start(now or datetime.utcnow())
+        since = current - timedelta(seconds=self.bucket_seconds * (window_buckets - 1))
+        with self._lock:
+            total = self._total.summary()
+            buckets = sorted((s, r) for s, r in self._buckets.items() if since <= s <= current)
+            window = Rollup(self.relative_accuracy)
+            series: List[Dict[str, Any]] = []
+            for start, rollup in buckets:
+                window.merge(rollup)
+                series.append({"start": start.isoformat(), **rollup.summary()})
+        return {
+            "bucket_seconds": self.bucket_seconds,
+            "total": total,
+            "window": {"since": since.isoformat(), "buckets": window_buckets, **window.summary()},
+            "buckets": series,
+        }
+
+    def input_counts(self, window_buckets: Optional[int] = None, now: Optional[datetime] = None) -> Dict[str, List[List[int]]]:
+        """Drift bin counts per counts key: all-time, or merged over the last `window_buckets` buckets."""
+        with self._lock:
+            if window_buckets is None:
+                return Rollup().merge(self._total).input_bins
+            current = self.bucket_start(now or datetime.utcnow())
+            since = current - timedelta(seconds=self.bucket_seconds * (window_buckets - 1))
+            window = Rollup()
+            for start, rollup in self._buckets.items():
+                if since <= start <= current:
+                    window.merge(rollup)
+        return window.input_bins
+
+    # ---- background flushing ----
+
+    def start(self, flush_fn: Callable[[], None], interval: float):
+        """Call `flush_fn` every `interval` seconds on a daemon thread, and once more on stop()."""
+        self._stop.clear()
+        self._flush_fn = flush_fn
+
+        def run():
+            while not self._stop.wait(interval):
+                self._flush()
+
+        self._thread = threading.Thread(target=run, name="prediction-stats", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self._flush()
+
+    def _flush(self):
+        try:
+            self._flush_fn()
+        except Exception:
+            logger.exception("Flushing prediction stats failed")
@@ -0,0 +1,399 @@
+"""
+Offline performance benchmarks for HealthE.
+
+Covers single-row and batched prediction for both models (the current
+encode + NumPy-predictor path and the original one-row DataFrame + scaler +
+estimator path), 100 x 100 what-if sweeps, one-row predictions from many
+threads with and without the micro-batching scheduler, /log_prediction
+throughput under concurrency, and /history latency as the predictions table
+grows. The backend runs in-process through FastAPI's TestClient against a
+throwaway SQLite database, so no services are needed.
+
+Results are written as JSON and compared with a stored baseline; the exit
+status is 1 when a benchmark is slower than the baseline by more than the
+tolerance, or when any of its requests failed. The groups run `--runs` times (default 3) and each benchmark keeps
+its fastest run, so one disturbed run (another process, a cold cache) does not
+show up as a regression. Store a baseline from one run of this script at the
+commit it describes.
+
+    python -m benchmarks.run                       # full run, compare with benchmarks/baseline.json
+    python -m benchmarks.run --quick               # smaller sizes, fewer repetitions
+    python -m benchmarks.run --update-baseline     # store this run as the new baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# "Lower is better" metric used to compare against the baseline
+COMPARE_METRIC = "p50_ms"
+# Slowdowns smaller than this are timer and scheduler noise, whatever their ratio
+NOISE_FLOOR_MS = 0.05
+
+
+# ======== Measurement ========
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int = 3, rows: int = 1) -> Dict[str, float]:
+    """Call `fn` `repeat` times and summarize the per-call latency."""
+    for _ in range(warmup):
+        fn()
+    times = np.empty(repeat)
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times[i] = time.perf_counter() - t0
+    return _summary(times, rows)
+
+
+def _summary(times: np.ndarray, rows: int = 1) -> Dict[str, float]:
+    ms = times * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "rows_per_s": float(rows / times.mean()),
+        "n": int(len(times)),
+    }
+
+
+# ======== Inference ========
+
+def bench_inference(results: Dict, repeat: int, batch_sizes: List[int]):
+    from healthe import inference
+    from healthe.features import DIET, RECOVERY
+
+    recovery_model, diet_model, recovery_scaler, diet_scaler = inference.load_artifacts()
+    recovery, diet = inference.load_fast_predictors()
+
+    health = pd.read_csv("data/new_health_dataset.csv").drop(columns=["recovery_days"])
+    diets = pd.read_csv("data/diet_dataset.csv").drop(columns=["diet_plan"])
+    health_row = health.iloc[0].to_dict()
+    diet_row = diets.iloc[0].to_dict()
+
+    # -- single row, as the Streamlit pages do it now --
+    results["predict.recovery.single"] = measure(
+        lambda: recovery.predict(RECOVERY.encode_record(health_row)), repeat)
+    results["predict.diet.single"] = measure(
+        lambda: diet.predict_with_proba(DIET.encode_record(diet_row)), repeat)
+
+    # -- single row, the original app.py path: one-row DataFrame, scaler, estimator --
+    X_rec = RECOVERY.encode_record(health_row)
+    X_diet = DIET.encode_record(diet_row)
+
+    def legacy_recovery():
+        X = pd.DataFrame({c: [v] for c, v in zip(RECOVERY.columns, X_rec[0])})
+        return recovery_model.predict(recovery_scaler.transform(X))
+
+    def legacy_diet():
+        X = pd.DataFrame({c: [v] for c, v in zip(DIET.columns, X_diet[0])})
+        X_scaled = X.copy()
+        cols = list(DIET.scaled_columns)
+        X_scaled[cols] = diet_scaler.transform(X[cols])
+        return diet_model.predict(X_scaled)
+
+    results["predict.recovery.single.legacy"] = measure(legacy_recovery, repeat)
+    results["predict.diet.single.legacy"] = measure(legacy_diet, repeat)
+
+    # -- batches: encode + predict --
+    for n in batch_sizes:
+        h = health.sample(n, replace=True, random_state=0).reset_index(drop=True)
+        d = diets.sample(n, replace=True, random_state=0).reset_index(drop=True)
+        reps = max(3, repeat // max(1, n // 100))
+        results[f"predict.recovery.batch{n}"] = measure(
+            lambda: recovery.predict(RECOVERY.encode(h)), reps, rows=n)
+        results[f"predict.diet.batch{n}"] = measure(
+            lambda: diet.predict_with_proba(DIET.encode(d)), reps, rows=n)
+        results[f"predict.recovery.batch{n}.legacy"] = measure(
+            lambda: recovery_model.predict(recovery_scaler.transform(RECOVERY.frame(RECOVERY.encode(h)))),
+            reps, rows=n)
+
+        def legacy_diet_batch(d=d):
+            X = DIET.frame(DIET.encode(d))
+            cols = list(DIET.scaled_columns)
+            X[cols] = diet_scaler.transform(X[cols])
+            return diet_model.predict(X)
+
+        results[f"predict.diet.batch{n}.legacy"] = measure(legacy_diet_batch, reps, rows=n)
+
+    # -- what-if sweeps of one patient, 100 x 100 grid in one call --
+    sweep = [
+        {"column": "rest_hours_per_day", "start": 0, "stop": 12, "steps": 100},
+        {"column": "medication_adherence", "start": 0, "stop": 1, "steps": 100},
+    ]
+    results["whatif.recovery.100x100"] = measure(
+        lambda: inference.what_if(RECOVERY.name, health_row, sweep), max(3, repeat // 20), rows=10_000)
+    diet_sweep = [
+        {"column": "daily_calories", "start": 1000, "stop": 4500, "steps": 100},
+        {"column": "protein_intake", "start": 20, "stop": 250, "steps": 100},
+    ]
+    results["whatif.diet.100x100"] = measure(
+        lambda: inference.what_if(DIET.name, diet_row, diet_sweep), max(3, repeat // 20), rows=10_000)
+
+
+# ======== Backend ========
+
+def bench_batching(results: Dict, n_requests: int, concurrency: int):
+    """One-row model calls from `concurrency` threads, each call direct or through a MicroBatcher."""
+    from healthe.batching import MicroBatcher
+    from healthe.features import RECOVERY
+    from healthe.inference import load_fast_predictors
+
+    recovery, _ = load_fast_predictors()
+    X = RECOVERY.encode(pd.read_csv("data/new_health_dataset.csv", nrows=n_requests).drop(columns=["recovery_days"]))
+
+    for mode in ("direct", "batched"):
+        batcher = MicroBatcher(recovery.predict, name="bench_recovery", max_wait_ms=1.0) if mode == "batched" else None
+        predict = batcher.predict if batcher else recovery.predict
+        latencies = np.empty(n_requests)
+
+        def one(i):
+            t0 = time.perf_counter()
+            predict(X[i:i + 1])
+            latencies[i] = time.perf_counter() - t0
+
+        for i in range(20):
+            one(i)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(one, range(n_requests)))
+        wall = time.perf_counter() - t0
+        if batcher:
+            batcher.close()
+
+        summary = _summary(latencies)
+        summary["requests_per_s"] = n_requests / wall
+        results[f"batching.recovery.{mode}.c{concurrency}"] = summary
+
+
+def _import_backend(db_path: str):
+    os.environ["DB_URL"] = f"sqlite:///{db_path}"
+    sys.modules.pop("backend.main", None)
+    import backend.main as backend
+    backend.migrate()
+    return backend
+
+
+def _log_payload(i: int) -> Dict:
+    return {
+        "prediction_type": "recovery_days" if i % 2 else "diet_plan",
+        "inputs": {"age": 20 + i % 60, "bmi": 24.5, "gender": i % 2},
+        "output": {"recovery_days": float(i % 30)},
+    }
+
+
+def bench_log_prediction(results: Dict, n_requests: int, concurrency: int):
+    from fastapi.testclient import TestClient
+
+    for mode in ("direct", "buffered", "async"):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["LOG_BUFFERED"] = "1" if mode == "buffered" else "0"
+            os.environ["DB_ASYNC"] = "1" if mode == "async" else "0"
+            backend = _import_backend(os.path.join(tmp, "bench.db"))
+            with TestClient(backend.app) as client:
+                for i in range(20):
+                    client.post("/log_prediction", json=_log_payload(i))
+
+                latencies = np.empty(n_requests)
+
+                def one(i):
+                    t0 = time.perf_counter()
+                    resp = client.post("/log_prediction", json=_log_payload(i))
+                    latencies[i] = time.perf_counter() - t0
+                    return resp.status_code
+
+                t0 = time.perf_counter()
+                with ThreadPoolExecutor(concurrency) as pool:
+                    codes = list(pool.map(one, range(n_requests)))
+                wall = time.perf_counter() - t0
+
+            summary = _summary(latencies)
+            summary["requests_per_s"] = n_requests / wall
+            summary["errors"] = sum(c >= 400 for c in codes)
+            results[f"log_prediction.{mode}.c{concurrency}"] = summary
+    os.environ.pop("LOG_BUFFERED", None)
+    os.environ.pop("DB_ASYNC", None)
+
+
+def _seed(backend, upto: int, have: int, chunk: int = 50_000):
+    """Grow the predictions table from `have` to `upto` rows with bulk inserts."""
+    from sqlalchemy import insert
+
+    start = datetime(2024, 1, 1)
+    inputs = json.dumps({"age": 40, "bmi": 24.5, "gender": 1, "condition_type": 3})
+    output = json.dumps({"recovery_days": 7.5})
+    with backend.SessionLocal() as session:
+        for lo in range(have, upto, chunk):
+            rows = [
+                {
+                    "prediction_type": "recovery_days" if i % 3 else "diet_plan",
+                    "inputs_json": inputs,
+                    "output_json": output,
+                    "created_at": start + timedelta(seconds=i),
+                }
+                for i in range(lo, min(upto, lo + chunk))
+            ]
+            session.execute(insert(backend.Prediction), rows)
+            session.commit()
+
+
+def bench_history(results: Dict, sizes: List[int], repeat: int):
+    from fastapi.testclient import TestClient
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = _import_backend(os.path.join(tmp, "history.db"))
+        have = 0
+        for size in sizes:
+            _seed(backend, size, have)
+            have = size
+            # Entering the client runs the lifespan, which re-warms the recent buffer
+            with TestClient(backend.app) as client:
+                results[f"history.latest10.rows{size}"] = measure(
+                    lambda: client.get("/history", params={"limit": 10}), repeat)
+                results[f"history.by_type10.rows{size}"] = measure(
+                    lambda: client.get("/history", params={"limit": 10, "prediction_type": "diet_plan"}), repeat)
+
+                # Cursor of a page 50 pages deep, then time fetching the next one
+                cursor = None
+                for _ in range(50):
+                    resp = client.get("/history", params={"limit": 100, **({"cursor": cursor} if cursor else {})})
+                    cursor = resp.headers.get("X-Next-Cursor")
+                results[f"history.deep_page100.rows{size}"] = measure(
+                    lambda: client.get("/history", params={"limit": 100, "cursor": cursor}), repeat)
+
+
+# ======== Reporting ========
+
+def best_of(runs: List[Dict]) -> Dict:
+    """
+    Per benchmark, the summary of the run with the lowest COMPARE_METRIC,
+    carrying the most errors any run had so a failing run is never hidden.
+    """
+    best: Dict[str, Dict] = {}
+    for results in runs:
+        for name, summary in results.items():
+            errors = max(summary.get("errors", 0), best.get(name, {}).get("errors", 0))
+            if name not in best or summary[COMPARE_METRIC] < best[name][COMPARE_METRIC]:
+                best[name] = dict(summary)
+            if "errors" in summary:
+                best[name]["errors"] = errors
+    return best
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float, floor_ms: float = NOISE_FLOOR_MS) -> List[str]:
+    """
+    Names of benchmarks slower than the baseline by more than `tolerance`
+    and `floor_ms`, or with failed requests (`errors` > 0): a timing taken
+    over failing requests measures the failures.
+    """
+    regressions = []
+    print(f"\n{'benchmark':45s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name, current in sorted(results.items()):
+        errors = current.get("errors", 0)
+        flag = f"  << {errors} ERRORS" if errors else ""
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:45s} {'-':>10s} {current[COMPARE_METRIC]:10.3f} {'new':>8s}{flag}")
+        else:
+            change = current[COMPARE_METRIC] / base[COMPARE_METRIC] - 1 if base[COMPARE_METRIC] else 0.0
+            slower_ms = current[COMPARE_METRIC] - base[COMPARE_METRIC]
+            if not flag and change > tolerance and slower_ms > floor_ms:
+                flag = "  << REGRESSION"
+            print(f"{name:45s} {base[COMPARE_METRIC]:10.3f} {current[COMPARE_METRIC]:10.3f} {change:+8.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def _meta(runs: int = 1) -> Dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "metric": COMPARE_METRIC,
+        "runs": runs,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the HealthE performance benchmarks.")
+    parser.add_argument("--quick", action="store_true", help="Small sizes and few repetitions")
+    parser.add_argument("--only", choices=("inference", "batching", "log", "history"), action="append",
+                        help="Run only these groups (repeatable)")
+    parser.add_argument("--history-sizes", default=None, help="Comma-separated row counts (default 10000,100000,1000000)")
+    parser.add_argument("--out", default="bench_results.json", help="Where to write this run's results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--runs", type=int, default=3, help="Run every group this many times, keep the fastest (default 3)")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown vs baseline (default 0.5)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run to --baseline")
+    args = parser.parse_args(argv)
+
+    groups = set(args.only or ("inference", "batching", "log", "history"))
+    repeat = 30 if args.quick else 200
+    if args.history_sizes:
+        sizes = [int(s) for s in args.history_sizes.split(",")]
+    else:
+        sizes = [10_000] if args.quick else [10_000, 100_000, 1_000_000]
+
+    runs = []
+    for run in range(args.runs):
+        if args.runs > 1:
+            print(f"Run {run + 1}/{args.runs}")
+        results: Dict[str, Dict] = {}
+        if "inference" in groups:
+            bench_inference(results, repeat, [100, 1000] if args.quick else [100, 1000, 10_000])
+        if "batching" in groups:
+            bench_batching(results, 1000 if args.quick else 5000, concurrency=32)
+        if "log" in groups:
+            bench_log_prediction(results, 200 if args.quick else 2000, concurrency=16)
+        if "history" in groups:
+            bench_history(results, sizes, repeat)
+        runs.append(results)
+    results = best_of(runs)
+
+    report = {"meta": _meta(args.runs), "results": results}
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.out}")
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+
+    if args.update_baseline:
+        failed = [name for name, summary in results.items() if summary.get("errors")]
+        if failed:
+            print(f"\nNot updating the baseline, requests failed in: {', '.join(failed)}")
+            sys.exit(1)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Updated baseline {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
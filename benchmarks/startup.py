@@ -0,0 +1,123 @@
+"""
+Cold-start time and per-worker memory of the backend.
+
+Starts the backend the ways it can be deployed, against a throwaway SQLite
+database, and reports for each:
+  - cold start: seconds from launching the server until every worker answers
+  - per-worker RSS and PSS (PSS splits pages shared after fork among the
+    processes using them, so the sum of PSS is the real total)
+
+Configurations:
+  uvicorn-lazy      one uvicorn process, models loaded on first /predict
+  gunicorn-startup  N workers, each loading its own models in its startup hook
+  gunicorn-preload  N workers forked from a master that loaded the models once
+
+    python -m benchmarks.startup --workers 4
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import requests
+
+from healthe.procinfo import child_pids, memory_usage
+
+MB = 1024 * 1024
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _command(config: str, port: int, workers: int) -> List[str]:
+    if config == "uvicorn-lazy":
+        return [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"]
+    return [sys.executable, "-m", "gunicorn", "-c", "backend/gunicorn.conf.py", "backend.main:app",
+            "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning"]
+
+
+def measure(config: str, workers: int, db_url: str, timeout: float = 60.0) -> Dict:
+    port = _free_port()
+    env = dict(os.environ, DB_URL=db_url)
+    if config == "uvicorn-lazy":
+        env["MODEL_LOADING"] = "lazy"
+        workers = 1
+    else:
+        env["MODEL_LOADING"] = config.split("-")[1]
+
+    base = f"http://127.0.0.1:{port}"
+    session = requests.Session()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(_command(config, port, workers), env=env)
+    try:
+        # Ready once every worker has answered /startup
+        seen: Dict[int, Dict] = {}
+        while len(seen) < workers:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{config} exited with {proc.returncode}")
+            if time.perf_counter() - t0 > timeout:
+                raise RuntimeError(f"{config} not ready after {timeout}s")
+            try:
+                report = session.get(f"{base}/startup", timeout=1, headers={"Connection": "close"}).json()
+                seen.setdefault(report["pid"], report)
+            except requests.RequestException:
+                time.sleep(0.05)
+        cold_start = time.perf_counter() - t0
+
+        worker_pids = [proc.pid] if config == "uvicorn-lazy" else child_pids(proc.pid)
+        per_worker = {pid: memory_usage(pid) for pid in worker_pids}
+        master = memory_usage(proc.pid) if config != "uvicorn-lazy" else {}
+        return {
+            "config": config,
+            "workers": workers,
+            "cold_start_seconds": round(cold_start, 3),
+            "worker_rss_mb": [round(m.get("rss_bytes", 0) / MB, 1) for m in per_worker.values()],
+            "worker_pss_mb": [round(m.get("pss_bytes", 0) / MB, 1) for m in per_worker.values()],
+            "total_pss_mb": round(sum(m.get("pss_bytes", 0) for m in [*per_worker.values(), master]) / MB, 1),
+            "startup_reports": list(seen.values()),
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure backend cold start and per-worker memory.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--config", action="append",
+                        choices=("uvicorn-lazy", "gunicorn-startup", "gunicorn-preload"),
+                        help="Configurations to run (repeatable; default all)")
+    parser.add_argument("--out", default="startup_results.json")
+    args = parser.parse_args(argv)
+
+    configs = args.config or ["uvicorn-lazy", "gunicorn-startup", "gunicorn-preload"]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+        subprocess.run([sys.executable, "-m", "backend.migrate"], env=dict(os.environ, DB_URL=db_url), check=True)
+        for config in configs:
+            results.append(measure(config, args.workers, db_url))
+
+    print(f"\n{'config':18s} {'workers':>7s} {'cold start':>10s} {'RSS/worker':>11s} {'PSS/worker':>11s} {'total PSS':>10s}")
+    for r in results:
+        rss = sum(r["worker_rss_mb"]) / len(r["worker_rss_mb"])
+        pss = sum(r["worker_pss_mb"]) / len(r["worker_pss_mb"])
+        print(f"{r['config']:18s} {r['workers']:7d} {r['cold_start_seconds']:9.2f}s "
+              f"{rss:8.1f} MB {pss:8.1f} MB {r['total_pss_mb']:7.1f} MB")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
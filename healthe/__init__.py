@@ -0,0 +1,7 @@
+"""
+Shared HealthE inference code.
+
+Used by the Streamlit frontend (`app.py`), the FastAPI backend
+(`backend/main.py`) and the command-line tools, so that every path encodes
+features and calls the models in the same way.
+"""
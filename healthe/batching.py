@@ -0,0 +1,261 @@
+"""
+Micro-batching in front of a model's predict function.
+
+Concurrent callers each submit a few encoded rows; a scheduler thread collects
+whatever arrives within a short window (`max_wait_ms`, or until `max_rows`
+rows are queued), scores it with one vectorized `predict_fn` call and hands
+every caller its own slice through a future. Under load, many one-row calls
+become a few large ones; a lone caller waits at most one window.
+
+    batcher = MicroBatcher(predictor.predict, name="recovery_days", max_wait_ms=1)
+    y = batcher.predict(X)            # blocking, from any thread
+    y = await batcher.apredict(X)     # from a coroutine
+
+Requests with at least `max_rows` rows are already a batch and are scored
+directly in the caller's thread. A caller that gives up (its future is
+cancelled, e.g. by `asyncio.wait_for`) is dropped from the queue unscored.
+
+`VersionBatchers` keeps one batcher per model version and method, so a batch
+never mixes rows meant for different versions.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from healthe.metrics import REGISTRY
+
+Result = Union[np.ndarray, Tuple[np.ndarray, ...]]
+
+QUEUE_ROWS = REGISTRY.gauge(
+    "healthe_batcher_queue_rows", "Rows waiting for the next micro-batch by model", ("model",)
+)
+BATCH_ROWS = REGISTRY.histogram(
+    "healthe_batcher_batch_rows", "Rows per micro-batch model call by model", ("model",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+QUEUE_SECONDS = REGISTRY.histogram(
+    "healthe_batcher_queue_seconds", "Time a request waited before its batch was scored by model", ("model",)
+)
+
+
+def _slice(result: Result, start: int, stop: int) -> Result:
+    if isinstance(result, tuple):
+        return tuple(part[start:stop] for part in result)
+    return result[start:stop]
+
+
+class BatcherClosed(RuntimeError):
+    pass
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], Result],
+        name: str = "model",
+        max_wait_ms: float = 1.0,
+        max_rows: int = 256,
+    ):
+        self.predict_fn = predict_fn
+        self.name = name
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_rows = max_rows
+
+        self._queue: Deque[Tuple[np.ndarray, Future, float]] = deque()
+        self._queued_rows = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+        QUEUE_ROWS.labels(name).set_function(lambda: self._queued_rows)
+        self._batch_rows = BATCH_ROWS.labels(name)
+        self._queue_seconds = QUEUE_SECONDS.labels(name)
+
+    @classmethod
+    def from_env(cls, predict_fn: Callable[[np.ndarray], Result], name: str) -> "MicroBatcher":
+        """Sized by INFERENCE_BATCH_WAIT_MS and INFERENCE_BATCH_MAX_ROWS."""
+        return cls(
+            predict_fn,
+            name=name,
+            max_wait_ms=float(os.getenv("INFERENCE_BATCH_WAIT_MS", "1")),
+            max_rows=int(os.getenv("INFERENCE_BATCH_MAX_ROWS", "256")),
+        )
+
+    # ---- callers ----
+
+    def submit(self, X: np.ndarray) -> Future:
+        """Future for `predict_fn(X)`, scored together with other queued rows."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        future: Future = Future()
+        if len(X) >= self.max_rows or len(X) == 0:
+            predict_fn = self.predict_fn
+            if predict_fn is None:
+                raise BatcherClosed(f"Batcher {self.name} is closed")
+            try:
+                future.set_result(predict_fn(X))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        with self._cond:
+            if self._closed:
+                raise BatcherClosed(f"Batcher {self.name} is closed")
+            self._ensure_thread()
+            was_empty = not self._queue
+            self._queue.append((X, future, time.perf_counter()))
+            self._queued_rows += len(X)
+            # Wake the scheduler to open a window or to close a full one;
+            # otherwise let it sleep out the window.
+            if was_empty or self._queued_rows >= self.max_rows:
+                self._cond.notify()
+        return future
+
+    def predict(self, X: np.ndarray) -> Result:
+        return self.submit(X).result()
+
+    async def apredict(self, X: np.ndarray) -> Result:
+        return await asyncio.wrap_future(self.submit(X))
+
+    def close(self):
+        """Score what is queued, then stop the scheduler thread; later submits raise BatcherClosed."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    # ---- scheduler ----
+
+    def _ensure_thread(self):
+        # Threads do not survive fork: a worker forked from a preloading
+        # master starts its own on first use.
+        # A scheduler that died is replaced too.
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> Optional[List[Tuple[np.ndarray, Future, float]]]:
+        """The next batch (empty if every caller in it gave up), or None once closed and drained."""
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            deadline = self._queue[0][2] + self.max_wait
+            while self._queued_rows < self.max_rows and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, rows = [], 0
+            while self._queue and (not batch or rows + len(self._queue[0][0]) <= self.max_rows):
+                item = self._queue.popleft()
+                self._queued_rows -= len(item[0])
+                # From here on the future can no longer be cancelled
+                if item[1].set_running_or_notify_cancel():
+                    batch.append(item)
+                    rows += len(item[0])
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            started = time.perf_counter()
+            for _, _, submitted in batch:
+                self._queue_seconds.observe(started - submitted)
+            X = batch[0][0] if len(batch) == 1 else np.concatenate([x for x, _, _ in batch])
+            self._batch_rows.observe(len(X))
+            try:
+                result = self.predict_fn(X)
+            except Exception as e:
+                for _, future, _ in batch:
+                    _settle(future.set_exception, e)
+                continue
+            offset = 0
+            for x, future, _ in batch:
+                try:
+                    _settle(future.set_result, _slice(result, offset, offset + len(x)))
+                except Exception as e:
+                    _settle(future.set_exception, e)
+                offset += len(x)
+
+
+def _settle(method: Callable, value):
+    # One caller's future must never take the scheduler thread down
+    try:
+        method(value)
+    except InvalidStateError:
+        pass
+
+
+# ======== Per-version batchers ========
+
+class VersionBatchers:
+    """
+    One `MicroBatcher` per (model version, predictor method), so every batch
+    is scored by the version its callers resolved. `retire(version)` closes
+    and drops a swapped-out version's batchers; requests still holding it are
+    then scored directly, and the version is freed once they finish.
+    """
+
+    def __init__(self, factory: Callable[..., MicroBatcher] = MicroBatcher.from_env):
+        self._factory = factory
+        self._batchers: Dict[Tuple[str, str, str], MicroBatcher] = {}
+        self._retired: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def get(self, version: Any, method: str, predict_fn: Callable[[np.ndarray], Result]) -> Optional[MicroBatcher]:
+        """
+        The batcher of `version` (a `registry.ModelVersion`) and `method`,
+        around `predict_fn` when created; None once `version` is retired.
+        """
+        key = (version.prediction_type, version.version, method)
+        with self._lock:
+            if key[:2] in self._retired:
+                return None
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                batcher = self._batchers[key] = self._factory(predict_fn, f"{version.prediction_type}.{method}")
+        return batcher
+
+    def predict_fn(self, version: Any, method: str, predict_fn: Callable[[np.ndarray], Result]):
+        """`predict_fn` batched with other callers of `version`, or called directly once it is retired."""
+        batcher = self.get(version, method, predict_fn)
+        if batcher is None:
+            return predict_fn
+
+        def predict(X):
+            try:
+                return batcher.predict(X)
+            except BatcherClosed:
+                return predict_fn(X)
+        return predict
+
+    def retire(self, version: Any):
+        # Only the (type, version) names are remembered, so a late caller is
+        # not given a new thread and the version itself can be freed
+        retired = (version.prediction_type, version.version)
+        with self._lock:
+            self._retired.add(retired)
+            batchers = [self._batchers.pop(k) for k in list(self._batchers) if k[:2] == retired]
+        for batcher in batchers:
+            batcher.close()
+            # The queue gauge still refers to the batcher; it must not keep the model alive
+            batcher.predict_fn = None
@@ -0,0 +1,167 @@
+"""
+Bulk scoring of CSV datasets.
+
+Streams a CSV shaped like `data/new_health_dataset.csv` (recovery) or
+`data/diet_dataset.csv` (diet) in fixed-size chunks, scores the chunks on a
+pool of worker processes (each loads the models once), and writes the input
+columns plus predictions to CSV or Parquet as chunks complete, in input order.
+At most `--max-in-flight` chunks are held in memory at any time.
+
+    python -m healthe.bulk_score recovery data/new_health_dataset.csv out.csv
+    python -m healthe.bulk_score diet data/diet_dataset.csv out.parquet --workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import pandas as pd
+
+from healthe import inference
+
+MODELS = ("recovery", "diet")
+
+
+# ======== Scoring (runs in workers) ========
+
+def score_chunk(model: str, chunk: pd.DataFrame) -> pd.DataFrame:
+    """Input chunk plus prediction columns."""
+    recovery, diet = inference.load_fast_predictors()
+    out = chunk.copy()
+    if model == "recovery":
+        X = inference.encode_recovery(chunk)
+        out["predicted_recovery_days"] = recovery.predict(X).round(2)
+    else:
+        X = inference.encode_diet(chunk)
+        classes, proba = diet.predict_with_proba(X)
+        out["predicted_diet_plan_class"] = classes.astype(int)
+        out["predicted_diet_plan_label"] = pd.Series(classes).map(inference.DIET_PLAN_LABELS).to_numpy()
+        out["predicted_diet_plan_proba"] = proba.max(axis=1)
+    return out
+
+
+def _warm_worker():
+    inference.load_fast_predictors()
+
+
+# ======== Output ========
+
+class _CsvWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._header = True
+
+    def write(self, df: pd.DataFrame):
+        df.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        pass
+
+
+class _ParquetWriter:
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+        self._pa, self._pq = pa, pq
+        self.path = path
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        table = self._pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _open_writer(path: str, fmt: Optional[str]):
+    fmt = fmt or ("parquet" if path.endswith((".parquet", ".pq")) else "csv")
+    return _ParquetWriter(path) if fmt == "parquet" else _CsvWriter(path)
+
+
+# ======== Driver ========
+
+def score_file(
+    model: str,
+    input_path: str,
+    output_path: str,
+    chunksize: int = 100_000,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    fmt: Optional[str] = None,
+    progress=sys.stderr,
+) -> int:
+    """Score `input_path` into `output_path`; returns the number of rows written."""
+    if model not in MODELS:
+        raise ValueError(f"model must be one of {MODELS}")
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+
+    writer = _open_writer(output_path, fmt)
+    reader = pd.read_csv(input_path, chunksize=chunksize)
+    start = time.perf_counter()
+    rows = 0
+
+    def emit(result: pd.DataFrame):
+        nonlocal rows
+        writer.write(result)
+        rows += len(result)
+        if progress is not None:
+            elapsed = time.perf_counter() - start
+            print(f"\r{rows:,} rows  {rows / max(elapsed, 1e-9):,.0f} rows/s", end="", file=progress)
+
+    try:
+        if workers == 1:
+            for chunk in reader:
+                emit(score_chunk(model, chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker) as pool:
+                pending = deque()
+                for chunk in reader:
+                    pending.append(pool.submit(score_chunk, model, chunk))
+                    # Backpressure: stop reading until the oldest chunk is written
+                    if len(pending) >= max_in_flight:
+                        emit(pending.popleft().result())
+                while pending:
+                    emit(pending.popleft().result())
+    finally:
+        writer.close()
+        reader.close()
+        if progress is not None:
+            print(file=progress)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV with the HealthE models.")
+    parser.add_argument("model", choices=MODELS)
+    parser.add_argument("input", help="CSV shaped like data/new_health_dataset.csv or data/diet_dataset.csv")
+    parser.add_argument("output", help="Output .csv or .parquet")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Rows per chunk (default 100000)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Chunks held in memory (default 2x workers)")
+    parser.add_argument("--format", choices=("csv", "parquet"), default=None, help="Default: from output extension")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    n = score_file(
+        args.model, args.input, args.output,
+        chunksize=args.chunksize, workers=args.workers,
+        max_in_flight=args.max_in_flight, fmt=args.format,
+    )
+    print(f"Scored {n:,} rows in {time.perf_counter() - t0:.1f}s -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
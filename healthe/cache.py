@@ -0,0 +1,176 @@
+"""
+Process-wide LRU + TTL cache of prediction results.
+
+Entries are keyed on the model name and a hash of the encoded (float64)
+feature row, so identical inputs hit regardless of how they were entered. Each
+model is tied to the files its artifacts were loaded from; when a file's
+mtime or size changes, that model's entries are dropped. Callers name a model
+with its version (`version_key`), so results of two versions never mix, even
+when a request still scoring on a replaced version stores its results late.
+
+`predict()` works on whole batches: hits are filled from the cache and all
+misses are scored together in one call to the model.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+Result = Union[np.ndarray, Tuple[np.ndarray, ...]]
+
+
+def artifact_fingerprint(paths: Sequence[str]) -> Tuple:
+    """Cheap identity of a set of artifact files: (path, mtime_ns, size) for each."""
+    out = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            out.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append((path, None, None))
+    return tuple(out)
+
+
+def version_key(model: str, version: str) -> str:
+    """Cache name of `model` as scored by one model version."""
+    return f"{model}@{version}"
+
+
+def row_key(row: np.ndarray) -> bytes:
+    # + 0.0 folds -0.0 into 0.0 so both hash the same
+    return hashlib.blake2b((np.asarray(row, dtype=np.float64) + 0.0).tobytes(), digest_size=16).digest()
+
+
+class PredictionCache:
+    def __init__(self, maxsize: int = 4096, ttl: float = 3600.0, check_interval: float = 1.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._clock = clock
+
+        self._entries: "OrderedDict[Tuple[str, bytes], Tuple[float, tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._artifacts: Dict[str, Sequence[str]] = {}
+        self._fingerprints: Dict[str, Tuple] = {}
+        self._checked_at: Dict[str, float] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "PredictionCache":
+        """Sized by PREDICTION_CACHE_SIZE (entries, 0 disables) and PREDICTION_CACHE_TTL (seconds)."""
+        return cls(
+            maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "4096")),
+            ttl=float(os.getenv("PREDICTION_CACHE_TTL", "3600")),
+        )
+
+    def register(self, model: str, artifact_paths: Sequence[str]):
+        """Tie `model`'s entries to the files it was loaded from."""
+        with self._lock:
+            self._artifacts[model] = tuple(artifact_paths)
+            self._fingerprints[model] = artifact_fingerprint(artifact_paths)
+            self._checked_at[model] = self._clock()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def clear(self, model: Optional[str] = None):
+        with self._lock:
+            self._clear_locked(model)
+
+    def forget(self, model: str):
+        """Drop `model`'s entries and the artifact files it was tied to."""
+        with self._lock:
+            self._clear_locked(model)
+            for tracked in (self._artifacts, self._fingerprints, self._checked_at):
+                tracked.pop(model, None)
+
+    def _clear_locked(self, model: Optional[str]):
+        if model is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] == model]:
+            del self._entries[key]
+
+    def _check_artifacts(self, model: str, now: float):
+        paths = self._artifacts.get(model)
+        if paths is None or now - self._checked_at.get(model, 0.0) < self.check_interval:
+            return
+        self._checked_at[model] = now
+        current = artifact_fingerprint(paths)
+        if current != self._fingerprints[model]:
+            self._fingerprints[model] = current
+            self._clear_locked(model)
+            self.invalidations += 1
+
+    # ---- batch lookup ----
+
+    def predict(self, model: str, X: np.ndarray, predict_fn: Callable[[np.ndarray], Result]) -> Result:
+        """
+        `predict_fn(X)` with cached rows filled in. `predict_fn` returns one
+        array, or a tuple of arrays, whose first axis matches the rows of `X`.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if self.maxsize <= 0 or len(X) == 0:
+            return predict_fn(X)
+
+        keys = [(model, row_key(row)) for row in X]
+        found: list = [None] * len(keys)
+        now = self._clock()
+        with self._lock:
+            self._check_artifacts(model, now)
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[i] = entry[1]
+            missing = [i for i, v in enumerate(found) if v is None]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            computed = predict_fn(X[missing])
+            single = not isinstance(computed, tuple)
+            parts = (computed,) if single else computed
+            expires = now + self.ttl
+            with self._lock:
+                for j, i in enumerate(missing):
+                    # Copies, so an entry does not keep the whole batch's arrays alive
+                    value = tuple(np.array(p[j]) for p in parts)
+                    found[i] = value
+                    self._entries[keys[i]] = (expires, value)
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        else:
+            single = len(found[0]) == 1
+
+        stacked = tuple(np.stack([v[k] for v in found]) for k in range(len(found[0])))
+        return stacked[0] if single else stacked
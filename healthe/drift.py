@@ -0,0 +1,266 @@
+"""
+Input drift against the training datasets.
+
+A `DriftReference` is computed once from the training CSVs: for each model
+input, bin edges (the training deciles) and the share of training rows in
+each bin, or the share of each category. Live inputs are counted into the
+same bins as they are logged (see `backend/stats.py`), so comparing them with
+the training distribution only needs those counts, never the logged rows:
+
+    psi = sum((live - train) * ln(live / train))     population stability index
+    kl  = sum(live * ln(live / train))               KL divergence, live || train
+
+The usual reading of PSI: below 0.1 the feature is stable, 0.1-0.25 it has
+moved, above 0.25 it has shifted enough to question the model.
+
+The reference is stored as JSON next to the data (`data/drift_reference.json`)
+together with the checksums of the CSVs it came from, and rebuilt when they
+change (a CSV that is missing keeps the stored reference). Counts are kept
+under `counts_key(prediction_type)`, which includes a fingerprint of the bins,
+so counts made against other bins are never read against these:
+
+    python -m healthe.drift
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from healthe.features import DIET, RECOVERY, SCHEMAS, FeatureError, FeatureSchema
+from healthe.registry import file_sha256
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.getenv("DRIFT_REFERENCE", "data/drift_reference.json")
+
+# Training data of each model: (schema, CSV)
+SOURCES = {
+    RECOVERY.name: (RECOVERY, "data/new_health_dataset.csv"),
+    DIET.name: (DIET, "data/diet_dataset.csv"),
+}
+
+N_BINS = 10
+# Share given to empty bins so the logarithms stay finite
+EPSILON = 1e-4
+
+PSI_WARN = float(os.getenv("DRIFT_PSI_WARN", "0.1"))
+PSI_ALERT = float(os.getenv("DRIFT_PSI_ALERT", "0.25"))
+# Fewer live rows than this are reported but not judged
+MIN_COUNT = int(os.getenv("DRIFT_MIN_COUNT", "100"))
+
+
+def _shares(counts: Sequence[float]) -> np.ndarray:
+    p = np.asarray(counts, dtype=np.float64)
+    total = p.sum()
+    p = p / total if total else np.full(len(p), 1 / len(p))
+    p = np.maximum(p, EPSILON)
+    return p / p.sum()
+
+
+def psi(live: Sequence[float], expected: Sequence[float]) -> float:
+    a, e = _shares(live), _shares(expected)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def kl_divergence(live: Sequence[float], expected: Sequence[float]) -> float:
+    a, e = _shares(live), _shares(expected)
+    return float(np.sum(a * np.log(a / e)))
+
+
+def status(score: float, count: int, min_count: int = MIN_COUNT) -> str:
+    if count < min_count:
+        return "insufficient_data"
+    if score >= PSI_ALERT:
+        return "alert"
+    if score >= PSI_WARN:
+        return "warn"
+    return "ok"
+
+
+# ======== Reference ========
+
+class FeatureReference:
+    """Bins of one input: category codes, or numeric bins split at `edges`."""
+
+    __slots__ = ("column", "edges", "expected")
+
+    def __init__(self, column: str, edges: Optional[List[float]], expected: List[float]):
+        self.column = column
+        self.edges = edges  # None for categorical columns
+        self.expected = expected  # training share per bin
+
+    @property
+    def n_bins(self) -> int:
+        return len(self.expected)
+
+    def bin(self, value: float) -> int:
+        if self.edges is None:
+            return int(value)
+        return bisect.bisect_right(self.edges, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"edges": self.edges, "expected": self.expected}
+
+
+class DriftReference:
+    def __init__(self, features: Mapping[str, List[FeatureReference]], sources: Mapping[str, Dict[str, Any]]):
+        self.features = dict(features)
+        self.sources = dict(sources)
+        # prediction type -> hash of its inputs' bins
+        self.fingerprints = {t: _fingerprint(refs) for t, refs in self.features.items()}
+
+    @classmethod
+    def from_training_data(cls, sources: Optional[Mapping[str, Any]] = None, n_bins: int = N_BINS) -> "DriftReference":
+        import pandas as pd
+
+        features, meta = {}, {}
+        for prediction_type, (schema, path) in (sources or SOURCES).items():
+            X = schema.encode(pd.read_csv(path))
+            features[prediction_type] = [
+                _feature_reference(schema, j, X[:, j], n_bins) for j in range(schema.n_features)
+            ]
+            meta[prediction_type] = {"path": path, "sha256": file_sha256(path), "rows": len(X)}
+        return cls(features, meta)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH, sources: Optional[Mapping[str, Any]] = None) -> "DriftReference":
+        """
+        The stored reference, rebuilt (and stored again) when the training
+        CSVs changed or it is missing or unreadable. When a CSV is gone the
+        stored reference is used as it is.
+        """
+        try:
+            with open(path) as f:
+                stored = cls.from_dict(json.load(f))
+        except FileNotFoundError:
+            stored = None
+        except (ValueError, KeyError, TypeError) as e:
+            # Truncated or edited by hand, or written in another layout
+            logger.warning("Drift reference %s is corrupt (%s); rebuilding it", path, e)
+            stored = None
+        if stored is not None:
+            missing = [s["path"] for s in stored.sources.values() if not os.path.exists(s["path"])]
+            if missing:
+                logger.warning("Training data %s not found; using the stored drift reference %s", missing, path)
+                return stored
+            if all(file_sha256(s["path"]) == s["sha256"] for s in stored.sources.values()):
+                return stored
+        reference = cls.from_training_data(sources)
+        try:
+            reference.save(path)
+        except OSError:
+            pass  # read-only data directory: keep it in memory only
+        return reference
+
+    def save(self, path: str = DEFAULT_PATH):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp, path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sources": self.sources,
+            "features": {
+                t: {f.column: f.to_dict() for f in refs} for t, refs in self.features.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "DriftReference":
+        features = {
+            t: [FeatureReference(column, f["edges"], f["expected"]) for column, f in cols.items()]
+            for t, cols in data["features"].items()
+        }
+        return cls(features, data["sources"])
+
+    # ---- live side ----
+
+    def counts_key(self, prediction_type: str) -> str:
+        """Key of `prediction_type`'s bin counts in the rollups, tied to these bins."""
+        return f"{prediction_type}@{self.fingerprints[prediction_type]}"
+
+    def observation(self, prediction_type: str, inputs: Mapping[str, Any]) -> Optional[Tuple[str, List[int]]]:
+        """(counts key, bins) of a logged row for `PredictionStats`, or None when it cannot be binned."""
+        bins = self.bins(prediction_type, inputs)
+        return None if bins is None else (self.counts_key(prediction_type), bins)
+
+    def bins(self, prediction_type: str, inputs: Mapping[str, Any]) -> Optional[List[int]]:
+        """Bin index of each input of a logged row, or None when it cannot be encoded."""
+        refs = self.features.get(prediction_type)
+        if refs is None:
+            return None
+        schema = SCHEMAS[prediction_type]
+        try:
+            row = schema.encode_record(inputs)[0]
+        except FeatureError:
+            return None
+        return [ref.bin(v) for ref, v in zip(refs, row.tolist())]
+
+    def report(self, counts: Mapping[str, Sequence[Sequence[int]]], min_count: int = MIN_COUNT) -> Dict[str, Any]:
+        """
+        PSI and KL per input of each prediction type, from live bin counts as
+        kept by the rollups. Counts under another reference's key are ignored.
+        """
+        out = {}
+        for prediction_type, refs in self.features.items():
+            live = counts.get(self.counts_key(prediction_type), [])
+            n = int(sum(live[0])) if live else 0
+            features = {}
+            for j, ref in enumerate(refs):
+                observed = np.zeros(ref.n_bins)
+                if j < len(live):
+                    observed[:len(live[j])] = live[j][:ref.n_bins]
+                score = psi(observed, ref.expected)
+                features[ref.column] = {
+                    "psi": round(score, 4),
+                    "kl": round(kl_divergence(observed, ref.expected), 4),
+                    "status": status(score, n, min_count),
+                }
+            worst = max(features.values(), key=lambda f: f["psi"])
+            out[prediction_type] = {
+                "count": n,
+                "max_psi": worst["psi"],
+                "status": worst["status"],
+                "features": features,
+            }
+        return out
+
+
+def _fingerprint(refs: Sequence[FeatureReference]) -> str:
+    bins = [[r.column, r.edges, r.n_bins] for r in refs]
+    return hashlib.sha256(json.dumps(bins).encode()).hexdigest()[:12]
+
+
+def _feature_reference(schema: FeatureSchema, j: int, values: np.ndarray, n_bins: int) -> FeatureReference:
+    column = schema.columns[j]
+    if column in schema.categories:
+        counts = np.bincount(values.astype(np.int64), minlength=len(schema.categories[column]))
+        return FeatureReference(column, None, (counts / counts.sum()).round(6).tolist())
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+    counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    return FeatureReference(
+        column, [float(e) for e in edges], (counts / counts.sum()).round(6).tolist()
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the drift reference from the training CSVs.")
+    parser.add_argument("--out", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+    reference = DriftReference.from_training_data()
+    reference.save(args.out)
+    for prediction_type, refs in reference.features.items():
+        print(f"{prediction_type}: {len(refs)} inputs, {sum(r.n_bins for r in refs)} bins "
+              f"from {reference.sources[prediction_type]['rows']} rows")
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Feature schemas for the two models.
+
+Each schema is the single source of truth for a model's column order, column
+dtypes, categorical vocabularies (a category's code is its position in the
+vocabulary) and which columns its scaler was fitted on. Encoding turns whole
+columns of labels into codes with one hashed lookup per column and returns a
+contiguous float64 matrix in model column order, ready for the scalers and the
+predictors in `healthe.tree_predictor` / `healthe.linear_predictor`.
+
+Categorical values may be given either as labels ("Male") or as their codes
+(1), since logged inputs store codes.
+
+pandas is only imported by the whole-column paths; encoding single records
+(the Streamlit pages) never loads it.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class FeatureError(ValueError):
+    """Raised when input is missing columns or holds values a model cannot encode."""
+
+
+Columns = Union["pd.DataFrame", Mapping[str, Sequence[Any]]]
+
+
+class FeatureSchema:
+    def __init__(
+        self,
+        name: str,
+        columns: Sequence[str],
+        dtypes: Mapping[str, str],
+        categories: Mapping[str, Sequence[str]],
+        scaled_columns: Sequence[str],
+    ):
+        self.name = name
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.dtypes: Dict[str, str] = dict(dtypes)
+        self.categories: Dict[str, Tuple[str, ...]] = {c: tuple(v) for c, v in categories.items()}
+        self.scaled_columns: Tuple[str, ...] = tuple(scaled_columns)
+        self.scaled_indices = np.array([self.columns.index(c) for c in self.scaled_columns], dtype=np.intp)
+
+        # Precomputed lookups: a plain dict per vocabulary for single records,
+        # and a hashed pd.Index for whole columns (built on first use).
+        self._codes = {c: {label: i for i, label in enumerate(v)} for c, v in self.categories.items()}
+        self._indexes = None
+
+    @property
+    def n_features(self) -> int:
+        return len(self.columns)
+
+    def label(self, column: str, code: int) -> str:
+        return self.categories[column][int(code)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready description of the encoding (stored in model manifests)."""
+        return {
+            "columns": list(self.columns),
+            "dtypes": dict(self.dtypes),
+            "categories": {c: list(v) for c, v in self.categories.items()},
+            "scaled_columns": list(self.scaled_columns),
+        }
+
+    # ---- encoding ----
+
+    def encode(self, data: Columns) -> np.ndarray:
+        """Encode a DataFrame or a dict of equal-length columns into an (n, n_features) matrix."""
+        missing = [c for c in self.columns if c not in data]
+        if missing:
+            raise FeatureError(f"Missing columns: {missing}")
+        lengths = {len(data[c]) for c in self.columns}
+        if len(lengths) > 1:
+            raise FeatureError("Columns have different lengths")
+        n = lengths.pop()
+        out = np.empty((n, self.n_features), dtype=np.float64)
+        for j, col in enumerate(self.columns):
+            out[:, j] = self._encode_column(col, data[col])
+        return out
+
+    def encode_record(self, record: Mapping[str, Any]) -> np.ndarray:
+        """Encode one row (dict of column -> value) into a (1, n_features) matrix, without pandas."""
+        out = np.empty((1, self.n_features), dtype=np.float64)
+        for j, col in enumerate(self.columns):
+            if col not in record:
+                raise FeatureError(f"Missing columns: {[c for c in self.columns if c not in record]}")
+            out[0, j] = self.encode_value(col, record[col])
+        if np.isnan(out).any():
+            raise FeatureError("Record has missing values")
+        return out
+
+    def encode_value(self, col: str, value: Any) -> float:
+        """Encode one value of column `col` (a label or code for categorical columns)."""
+        if col in self._codes and isinstance(value, str):
+            if value not in self._codes[col]:
+                raise FeatureError(
+                    f"Column '{col}' has unknown category {value!r}; expected one of {list(self.categories[col])}"
+                )
+            value = self._codes[col][value]
+        try:
+            encoded = float(value)
+        except (TypeError, ValueError):
+            raise FeatureError(f"Column '{col}' has a non-numeric value {value!r}")
+        if col in self._codes and not _is_code(encoded, len(self.categories[col])):
+            raise FeatureError(f"Column '{col}' has unknown category code {value!r}")
+        return encoded
+
+    def _index(self, col: str) -> "pd.Index":
+        if self._indexes is None:
+            import pandas as pd
+            self._indexes = {c: pd.Index(v) for c, v in self.categories.items()}
+        return self._indexes[col]
+
+    def _encode_column(self, col: str, values) -> np.ndarray:
+        import pandas as pd
+
+        s = values if isinstance(values, pd.Series) else pd.Series(values)
+        numeric = pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64)
+
+        if col in self.categories:
+            size = len(self.categories[col])
+            codes = numeric.copy()
+            if not pd.api.types.is_numeric_dtype(s):
+                # One hashed lookup for every label in the column
+                looked_up = self._index(col).get_indexer(s)
+                codes = np.where(looked_up >= 0, looked_up, codes)
+            bad = ~_is_code(codes, size)
+            if bad.any():
+                raise FeatureError(
+                    f"Column '{col}' has unknown categories at rows {_first(bad)}; "
+                    f"expected one of {list(self.categories[col])}"
+                )
+            return codes
+
+        bad = np.isnan(numeric)
+        if bad.any():
+            raise FeatureError(f"Column '{col}' has missing or non-numeric values at rows {_first(bad)}")
+        return numeric
+
+    # ---- views ----
+
+    def frame(self, X: np.ndarray) -> "pd.DataFrame":
+        """Named DataFrame view of an encoded matrix (for estimators fitted on DataFrames)."""
+        import pandas as pd
+
+        return pd.DataFrame(X, columns=list(self.columns))
+
+    def records(self, X: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Encoded rows as JSON-friendly dicts, ints where the schema says int.
+        A non-integral value of an int column stays a float rather than being
+        truncated.
+        """
+        out = []
+        for row in np.asarray(X).tolist():
+            out.append({
+                c: int(v) if self.dtypes[c].startswith("int") and float(v).is_integer() else v
+                for c, v in zip(self.columns, row)
+            })
+        return out
+
+
+def _is_code(codes, size: int):
+    codes = np.asarray(codes)
+    return (codes >= 0) & (codes < size) & (codes == np.floor(codes))
+
+
+def _first(mask: np.ndarray, limit: int = 10) -> List[int]:
+    return [int(i) for i in np.flatnonzero(mask)[:limit]]
+
+
+# ======== Schemas ========
+
+RECOVERY = FeatureSchema(
+    name="recovery_days",
+    columns=[
+        "age", "gender", "bmi", "condition_type", "severity_score",
+        "rest_hours_per_day", "medication_adherence", "hospital_visits",
+        "smoking_status",
+    ],
+    dtypes={
+        "age": "int64", "gender": "int64", "bmi": "float64", "condition_type": "int64",
+        "severity_score": "float64", "rest_hours_per_day": "float64",
+        "medication_adherence": "float64", "hospital_visits": "int64", "smoking_status": "int64",
+    },
+    categories={
+        "gender": ["Female", "Male", "Other"],
+        "condition_type": ["Allergy", "Cough", "Fever", "Flu", "Infection", "Injury"],
+        "smoking_status": ["Non-Smoker", "Occasional", "Regular"],
+    },
+    # recovery_scaler was fitted on every column
+    scaled_columns=[
+        "age", "gender", "bmi", "condition_type", "severity_score",
+        "rest_hours_per_day", "medication_adherence", "hospital_visits",
+        "smoking_status",
+    ],
+)
+
+DIET = FeatureSchema(
+    name="diet_plan",
+    columns=[
+        "age", "gender", "conditions", "bmi", "daily_calories",
+        "protein_intake", "carb_intake", "fat_intake", "sleep_hours",
+        "daily_steps", "water_intake_liters",
+    ],
+    dtypes={
+        "age": "int64", "gender": "int64", "conditions": "int64", "bmi": "float64",
+        "daily_calories": "float64", "protein_intake": "float64", "carb_intake": "float64",
+        "fat_intake": "float64", "sleep_hours": "float64", "daily_steps": "float64",
+        "water_intake_liters": "float64",
+    },
+    categories={
+        "gender": ["Female", "Male"],
+        "conditions": ["Allergy", "Cough", "Fever", "Flu", "Infection", "Injury", "No"],
+    },
+    # diet_scaler was fitted on the numeric columns only
+    scaled_columns=[
+        "age", "bmi", "daily_calories", "protein_intake",
+        "carb_intake", "fat_intake", "sleep_hours",
+        "daily_steps", "water_intake_liters",
+    ],
+)
+
+SCHEMAS = {RECOVERY.name: RECOVERY, DIET.name: DIET}
+
+DIET_PLAN_LABELS = (
+    "Balanced Diet",
+    "High-Protein Diet",
+    "Keto Diet",
+    "Low-Carb Diet",
+    "Low-Fat Diet",
+    "Vegan Diet",
+)
@@ -0,0 +1,239 @@
+"""
+Batch inference for the recovery-days and diet-plan models.
+
+Rows are encoded in one vectorized pass per batch (see `healthe.features`) and
+scored with the NumPy predictors, which apply each model's scaler themselves,
+so a batch costs one encode and one predict call however many rows it has.
+"""
+
+import gc
+import os
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from healthe.features import DIET, RECOVERY, FeatureError  # noqa: F401 (re-exported)
+from healthe import features, registry, whatif
+from healthe.batching import VersionBatchers
+from healthe.cache import PredictionCache, version_key
+from healthe.metrics import REGISTRY, timed
+
+# ======== Artifacts ========
+
+MODELS_DIR = registry.MODELS_DIR
+
+# NumPy arrays inside the (uncompressed) joblib files are memory-mapped
+# read-only, so processes loading the same files share those pages.
+# Set MODELS_MMAP_MODE to an empty string to load them into private memory.
+MODELS_MMAP_MODE = os.getenv("MODELS_MMAP_MODE", "r") or None
+
+# Score concurrent requests' cache misses together (see `healthe.batching`)
+INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "0").lower() in ("1", "true", "yes")
+
+# Versioned models, swapped in when a new version is published (see `healthe.registry`)
+MODELS = registry.ModelRegistry.from_env(MODELS_DIR, MODELS_MMAP_MODE)
+
+
+def load_artifacts():
+    """The active versions' (recovery_model, diet_model, recovery_scaler, diet_scaler)."""
+    recovery, diet = MODELS.current(RECOVERY.name), MODELS.current(DIET.name)
+    return recovery.model, diet.model, recovery.scaler, diet.scaler
+
+
+# Shared by every caller in this process (backend endpoints, bulk workers)
+PREDICTION_CACHE = PredictionCache.from_env()
+
+for _stat in ("hits", "misses", "evictions"):
+    REGISTRY.counter(
+        f"healthe_prediction_cache_{_stat}_total", f"Prediction cache {_stat}"
+    ).labels().set_function(lambda _stat=_stat: getattr(PREDICTION_CACHE, _stat))
+
+# Model calls only: rows answered from the cache are not scored
+INFERENCE_SECONDS = REGISTRY.histogram(
+    "healthe_model_inference_seconds", "Model predict call latency by prediction type", ("prediction_type",)
+)
+INFERENCE_ROWS = REGISTRY.counter(
+    "healthe_model_inference_rows_total", "Rows scored by the models by prediction type", ("prediction_type",)
+)
+
+
+# Recovery-model explanations: "path" credits each split's change in expected
+# value to its feature during the prediction's own tree walk (about the cost
+# of predicting); "shap" is LightGBM's exact pred_contrib (TreeSHAP), which on
+# this model costs about 100x a prediction.
+EXPLAIN_METHODS = ("path", "shap")
+
+
+def load_fast_predictors():
+    """
+    NumPy-only versions of both active models with their scalers folded in:
+    (TreeEnsemblePredictor, FusedLogisticPredictor). Both take raw encoded rows.
+    Fetch them per call rather than keeping them, so a new version is picked up.
+    """
+    return MODELS.current(RECOVERY.name).predictor, MODELS.current(DIET.name).predictor
+
+
+# Cache keys of each prediction type, each qualified by the version that
+# scored its entries (see `cache.version_key`)
+CACHE_KEYS = {
+    RECOVERY.name: (RECOVERY.name, *(f"{RECOVERY.name}:{m}" for m in EXPLAIN_METHODS)),
+    DIET.name: (DIET.name, f"{DIET.name}:explain"),
+}
+
+# Micro-batchers of each model version, used when INFERENCE_BATCHING is on
+BATCHERS = VersionBatchers()
+
+
+def _on_model_swap(prediction_type, old, new):
+    # A request that resolved `old` before the swap may still store its
+    # results, but under `old`'s keys, where `new` never looks
+    for key in CACHE_KEYS[prediction_type]:
+        PREDICTION_CACHE.register(version_key(key, new.version), list(new.paths.values()))
+        if old is not None:
+            PREDICTION_CACHE.forget(version_key(key, old.version))
+    if old is not None:
+        BATCHERS.retire(old)
+
+
+MODELS.on_swap(_on_model_swap)
+
+
+def preload():
+    """
+    Load the artifacts and build the fast predictors now, in a server's master
+    process before it forks workers. The loaded objects are then frozen out of
+    the garbage collector, whose passes would otherwise write to their object
+    headers in every worker and turn the shared copy-on-write pages into
+    private copies.
+    """
+    load_fast_predictors()
+    # The master only loads; each worker runs its own watcher
+    MODELS.stop()
+    gc.collect()
+    gc.freeze()
+
+
+DIET_PLAN_LABELS = dict(enumerate(features.DIET_PLAN_LABELS))
+
+
+# ======== Encoding ========
+
+Payload = Union[List[Dict[str, Any]], Dict[str, List[Any]]]
+
+
+def to_columns(payload: Payload):
+    """
+    Column-oriented view of either a list of row dicts or a dict of
+    equal-length lists (the latter is used as-is).
+    """
+    if isinstance(payload, dict):
+        return payload
+    return pd.DataFrame.from_records(payload)
+
+
+def encode_recovery(data) -> np.ndarray:
+    return RECOVERY.encode(data)
+
+
+def encode_diet(data) -> np.ndarray:
+    return DIET.encode(data)
+
+
+# ======== Prediction ========
+
+def _instrumented(prediction_type: str, predict_fn):
+    rows = INFERENCE_ROWS.labels(prediction_type)
+    fn = timed(predict_fn, INFERENCE_SECONDS.labels(prediction_type))
+
+    def run(X):
+        rows.inc(len(X))
+        return fn(X)
+    return run
+
+
+# Every function below scores with one `registry.ModelVersion`: the one passed
+# in (so a caller can report the version that made its predictions), or else
+# the active one, resolved once per call.
+
+def _resolve(prediction_type: str, version: Optional[registry.ModelVersion]) -> registry.ModelVersion:
+    return version if version is not None else MODELS.current(prediction_type)
+
+
+def _shap_fn(recovery: registry.ModelVersion):
+    def contributions(X: np.ndarray):
+        scaler = recovery.scaler
+        contrib = recovery.model.booster_.predict((X - scaler.mean_) / scaler.scale_, pred_contrib=True)
+        return contrib.sum(axis=1), contrib
+    return contributions
+
+
+def explain_recovery_days(data, method: str = "path", version: Optional[registry.ModelVersion] = None):
+    """
+    Predicted recovery days and per-feature contributions, (n, n_features + 1)
+    with the expected value last, so each row sums to its prediction. Both
+    come from one model call and are cached together per input row.
+    """
+    if method not in EXPLAIN_METHODS:
+        raise FeatureError(f"Unknown explanation method {method!r}; expected one of {list(EXPLAIN_METHODS)}")
+    recovery = _resolve(RECOVERY.name, version)
+    fn = recovery.predictor.predict_with_contributions if method == "path" else _shap_fn(recovery)
+    return PREDICTION_CACHE.predict(
+        version_key(f"{RECOVERY.name}:{method}", recovery.version), encode_recovery(data),
+        _instrumented(RECOVERY.name, fn),
+    )
+
+
+def explain_diet_plan(data, version: Optional[registry.ModelVersion] = None):
+    """
+    Predicted diet-plan classes, class probabilities and the predicted class's
+    logit split into coefficient x scaled-feature terms (intercept last), from
+    one matmul and cached together per input row.
+    """
+    diet = _resolve(DIET.name, version)
+    classes, proba, contrib = PREDICTION_CACHE.predict(
+        version_key(f"{DIET.name}:explain", diet.version), encode_diet(data),
+        _instrumented(DIET.name, diet.predictor.predict_with_contributions),
+    )
+    return classes.astype(int), proba, contrib
+
+
+def _model_fn(version: registry.ModelVersion, method: str):
+    """`version`'s predictor `method` for cache misses, batched if INFERENCE_BATCHING is on."""
+    fn = _instrumented(version.prediction_type, getattr(version.predictor, method))
+    if INFERENCE_BATCHING:
+        return BATCHERS.predict_fn(version, method, fn)
+    return fn
+
+
+def predict_recovery_days(data, version: Optional[registry.ModelVersion] = None) -> np.ndarray:
+    """Predicted recovery days for every row of `data` (DataFrame or dict of columns)."""
+    recovery = _resolve(RECOVERY.name, version)
+    return PREDICTION_CACHE.predict(
+        version_key(RECOVERY.name, recovery.version), encode_recovery(data), _model_fn(recovery, "predict")
+    )
+
+
+def predict_diet_plan(data, version: Optional[registry.ModelVersion] = None) -> np.ndarray:
+    """Predicted diet-plan class for every row of `data` (DataFrame or dict of columns)."""
+    diet = _resolve(DIET.name, version)
+    classes, _ = PREDICTION_CACHE.predict(
+        version_key(DIET.name, diet.version), encode_diet(data), _model_fn(diet, "predict_with_proba")
+    )
+    return classes.astype(int)
+
+
+def what_if(prediction_type: str, record: Dict[str, Any], vary: List[Dict[str, Any]], max_points: int = None) -> Dict[str, Any]:
+    """
+    What-if sweep of one patient (see `healthe.whatif`); `vary` holds the
+    keyword arguments of `whatif.axis` for each varied column. The grid is
+    scored in one model call, without the prediction cache.
+    """
+    recovery, diet = load_fast_predictors()
+    if prediction_type == RECOVERY.name:
+        axes = [whatif.axis(RECOVERY, **spec, max_points=max_points) for spec in vary]
+        return whatif.recovery_days_sweep(record, axes, _instrumented(RECOVERY.name, recovery.predict), max_points)
+    if prediction_type == DIET.name:
+        axes = [whatif.axis(DIET, **spec, max_points=max_points) for spec in vary]
+        return whatif.diet_plan_sweep(record, axes, _instrumented(DIET.name, diet.predict_with_proba), max_points)
+    raise FeatureError(f"Unknown prediction type {prediction_type!r}")
@@ -0,0 +1,141 @@
+"""
+Fused scaler + logistic-regression inference for the diet model.
+
+`StandardScaler` is affine, so scaling a column and then applying the model's
+coefficients is the same as applying rescaled coefficients to the raw column
+plus a constant. Folding the scaler's mean/scale into the coefficient matrix
+and intercept once at load time turns a prediction on raw features into one
+matrix product, and the class probabilities come from the same logits.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class FusedLogisticPredictor:
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: np.ndarray,
+        classes: np.ndarray,
+        multinomial: bool = True,
+        center: Optional[np.ndarray] = None,
+    ):
+        # weights: (n_features, n_classes) so that logits = X @ weights + bias
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = np.ascontiguousarray(bias, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.multinomial = multinomial
+        # Scaler means (0 for unscaled columns): (x - center) * weights is the
+        # coefficient x scaled-feature term, and bias + center @ weights the
+        # model's own intercept
+        self.center = np.zeros(len(self.weights)) if center is None else np.asarray(center, dtype=np.float64)
+        self.intercept = self.bias + self.center @ self.weights
+        self._weights32 = self.weights.astype(np.float32)
+        self._bias32 = self.bias.astype(np.float32)
+
+    @classmethod
+    def from_model(
+        cls,
+        model,
+        scaler=None,
+        columns: Optional[Sequence[str]] = None,
+        scaled_columns: Optional[Sequence[str]] = None,
+    ) -> "FusedLogisticPredictor":
+        """
+        Fold `scaler` into a fitted `LogisticRegression`.
+
+        `columns` is the feature order of the raw input (defaults to the order
+        the model was fitted with). `scaled_columns` are the columns `scaler`
+        was fitted on (defaults to the scaler's own feature names, or all columns).
+        """
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        intercept = np.asarray(model.intercept_, dtype=np.float64)
+        fitted = _names(model)
+        if columns is None:
+            columns = fitted or [f"x{i}" for i in range(coef.shape[1])]
+        elif fitted:
+            # Reorder coefficients to the raw input's column order
+            coef = coef[:, [fitted.index(c) for c in columns]]
+        columns = list(columns)
+
+        weights = coef.T.copy()
+        bias = intercept.copy()
+        center = np.zeros(len(columns))
+        if scaler is not None:
+            if scaled_columns is None:
+                scaled_columns = _names(scaler) or columns
+            for k, col in enumerate(scaled_columns):
+                j = columns.index(col)
+                # w * (x - mean) / scale == (w / scale) * x - w * mean / scale
+                weights[j] = coef[:, j] / scaler.scale_[k]
+                bias -= coef[:, j] * scaler.mean_[k] / scaler.scale_[k]
+                center[j] = scaler.mean_[k]
+
+        binary = coef.shape[0] == 1
+        multinomial = not binary and getattr(model, "multi_class", "auto") != "ovr"
+        return cls(weights, bias, model.classes_, multinomial=multinomial, center=center)
+
+    # ---- inference ----
+
+    def decision_function(self, X) -> np.ndarray:
+        X = np.asarray(X)
+        if X.dtype != np.float32:
+            X = X.astype(np.float64, copy=False)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.dtype == np.float32:
+            return X @ self._weights32 + self._bias32
+        return X @ self.weights + self.bias
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self._proba(self.decision_function(X))
+
+    def predict(self, X) -> np.ndarray:
+        return self._classes(self.decision_function(X))
+
+    def predict_with_proba(self, X) -> Tuple[np.ndarray, np.ndarray]:
+        """Predicted classes and probabilities from a single matmul."""
+        logits = self.decision_function(X)
+        return self._classes(logits), self._proba(logits)
+
+    def predict_with_contributions(self, X) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Classes, probabilities and the predicted class's logit split into
+        per-feature terms (coefficient x scaled feature), from the same
+        matmul. Contributions are (n, n_features + 1); the last column is the
+        class's intercept, so each row sums to the class logit.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        logits = X @ self.weights + self.bias
+        k = (logits[:, 0] > 0).astype(int) if logits.shape[1] == 1 else logits.argmax(axis=1)
+        # A binary model's single logit is the positive class's
+        w = self.weights[:, 0][None, :] if logits.shape[1] == 1 else self.weights.T[k]
+        b = np.full(len(X), self.intercept[0]) if logits.shape[1] == 1 else self.intercept[k]
+        contrib = np.empty((len(X), X.shape[1] + 1))
+        contrib[:, :-1] = (X - self.center) * w
+        contrib[:, -1] = b
+        return self._classes(logits), self._proba(logits), contrib
+
+    def _classes(self, logits: np.ndarray) -> np.ndarray:
+        if logits.shape[1] == 1:
+            return self.classes[(logits[:, 0] > 0).astype(int)]
+        return self.classes[logits.argmax(axis=1)]
+
+    def _proba(self, logits: np.ndarray) -> np.ndarray:
+        if logits.shape[1] == 1:
+            p = 1.0 / (1.0 + np.exp(-logits[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        if self.multinomial:
+            z = np.exp(logits - logits.max(axis=1, keepdims=True))
+        else:
+            z = 1.0 / (1.0 + np.exp(-logits))
+        return z / z.sum(axis=1, keepdims=True)
+
+
+def _names(estimator) -> Optional[List[str]]:
+    names = getattr(estimator, "feature_names_in_", None)
+    return [str(c) for c in names] if names is not None else None
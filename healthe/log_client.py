@@ -0,0 +1,147 @@
+"""
+Background prediction logging for the Streamlit frontend.
+
+`log()` only appends to an in-memory spool and returns. A single worker thread
+sends spooled entries to the backend's `/log_predictions` batch endpoint over
+one keep-alive `requests.Session`. When the backend is down, entries stay in the
+bounded spool (oldest dropped first) and are retried with backoff.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionLogClient:
+    def __init__(
+        self,
+        base_url: str,
+        batch_size: int = 20,
+        flush_interval: float = 1.0,
+        max_spool: int = 1000,
+        timeout: float = 2.0,
+        max_backoff: float = 30.0,
+        session: Optional[requests.Session] = None,
+    ):
+        self.url = f"{base_url.rstrip('/')}/log_predictions"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session = session
+
+        self._spool: deque = deque(maxlen=max_spool)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._backoff = 0.0
+
+        self.sent = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name="prediction-log-client", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def pending(self) -> int:
+        return len(self._spool)
+
+    def log(
+        self, prediction_type: str, inputs: Dict[str, Any], output: Dict[str, Any], model_version: Optional[str] = None
+    ):
+        """Queue one prediction for delivery. Never blocks on the network."""
+        entry = {"prediction_type": prediction_type, "inputs": inputs, "output": output}
+        if model_version is not None:
+            entry["model_version"] = model_version
+        with self._cond:
+            if len(self._spool) == self._spool.maxlen:
+                self.dropped += 1
+            self._spool.append(entry)
+            if len(self._spool) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wake the worker and wait until the spool is empty or `timeout` passes."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._backoff = 0.0
+            self._cond.notify()
+        while self._spool and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._spool
+
+    def close(self, timeout: float = 2.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self.session.close()
+
+    # ---- worker thread ----
+
+    def _send(self, batch) -> int:
+        """POST one batch; return how many entries the backend accepted."""
+        resp = self.session.post(self.url, json=batch, timeout=self.timeout)
+        if resp.status_code == 503:
+            # Backend queue full: the leading `accepted` entries made it in.
+            try:
+                accepted = int(resp.json().get("accepted", 0))
+            except ValueError:
+                accepted = 0
+            self.sent += accepted
+            return accepted
+        if 400 <= resp.status_code < 500:
+            # Retrying a payload the backend rejects would never succeed.
+            logger.warning("Backend rejected %d prediction logs: %s", len(batch), resp.text[:200])
+            self.dropped += len(batch)
+            return len(batch)
+        resp.raise_for_status()
+        self.sent += len(batch)
+        return len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed:
+                    if self._backoff:
+                        self._cond.wait(self._backoff)
+                    elif len(self._spool) < self.batch_size:
+                        self._cond.wait(self.flush_interval)
+                if self._closed:
+                    return
+                batch = [self._spool[i] for i in range(min(self.batch_size, len(self._spool)))]
+            if not batch:
+                continue
+
+            try:
+                done = self._send(batch)
+            except requests.RequestException:
+                done = 0
+
+            with self._cond:
+                # Entries are only removed once delivered; anything else stays
+                # at the front of the spool for the next attempt. An entry may
+                # already be gone if the spool overflowed while we were sending.
+                for entry in batch[:done]:
+                    if self._spool and self._spool[0] is entry:
+                        self._spool.popleft()
+                if done < len(batch):
+                    self._backoff = min(max(self._backoff * 2, self.flush_interval), self.max_backoff)
+                else:
+                    self._backoff = 0.0
@@ -0,0 +1,446 @@
+"""
+In-process counters, gauges and histograms, rendered in the Prometheus text
+exposition format.
+
+Metrics live in a process-wide `REGISTRY`. A labelled metric hands out one
+child per label combination; hot paths bind their children once at import
+(`HIST.labels("history", "query")`) so an observation is a bisect, a lock and
+two additions. Histogram buckets are fixed at creation, so memory does not
+grow with traffic.
+
+Values are per process. With several server workers, a
+`MultiProcessCollector` has each worker write snapshots of its registry to a
+shared directory and merges the live workers' snapshots at scrape time, so a
+scrape sees every worker whichever one answers it.
+"""
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans sub-millisecond model calls up to slow DB commits
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ======== Metric types ========
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """The child for one combination of label values (created on first use)."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _unlabelled(self):
+        return self.labels()
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock", "_fn")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+        self._fn: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, fn: Callable[[], float]):
+        """Read the value from `fn` at scrape time instead."""
+        self._fn = fn
+
+    def get(self) -> float:
+        return self._fn() if self._fn is not None else self.value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(child.get())}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float):
+        self._unlabelled().set(value)
+
+    def set_function(self, fn: Callable[[], float]):
+        self._unlabelled().set_function(fn)
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramValue"):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramValue:
+    __slots__ = ("_bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        """Context manager that observes the seconds spent inside it."""
+        return _Timer(self)
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the q-quantile, interpolated within its bucket."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if total == 0:
+            return float("nan")
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= rank:
+                lo = self._bounds[i - 1] if i > 0 else 0.0
+                hi = self._bounds[i] if i < len(self._bounds) else self._bounds[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self._bounds[-1]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled().observe(value)
+
+    def time(self) -> _Timer:
+        return self._unlabelled().time()
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total, sum_ = list(child.counts), child.count, child.sum
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(sum_)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {total}"
+
+
+def timed(fn: Callable, child: _HistogramValue) -> Callable:
+    """`fn` wrapped so that the duration of every call is observed by `child`."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            child.observe(time.perf_counter() - start)
+    return wrapper
+
+
+# ======== Registry ========
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Re-importing a module (tests, Streamlit reruns) reuses the metric
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-ready values of every metric, as merged by `merged()`."""
+        out = {}
+        for metric in list(self._metrics.values()):
+            samples = []
+            for key, child in list(metric._children.items()):
+                if isinstance(child, _HistogramValue):
+                    with child._lock:
+                        samples.append([list(key), list(child.counts), child.sum, child.count])
+                else:
+                    samples.append([list(key), child.get()])
+            out[metric.name] = {
+                "type": metric.type,
+                "help": metric.help,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": samples,
+            }
+        return out
+
+
+def merged(snapshots: Sequence[Dict[str, Any]]) -> Registry:
+    """A registry holding the sum of `snapshots` (counters, gauges and histogram buckets all add up)."""
+    registry = Registry()
+    for snapshot in snapshots:
+        for name, m in snapshot.items():
+            if m["type"] == "histogram":
+                metric = registry.histogram(name, m["help"], m["labelnames"], m["buckets"])
+            elif m["type"] == "gauge":
+                metric = registry.gauge(name, m["help"], m["labelnames"])
+            else:
+                metric = registry.counter(name, m["help"], m["labelnames"])
+            for key, *values in m["samples"]:
+                child = metric.labels(*key)
+                if m["type"] == "histogram":
+                    counts, sum_, count = values
+                    with child._lock:
+                        child.counts = [a + b for a, b in zip(child.counts, counts)]
+                        child.sum += sum_
+                        child.count += count
+                else:
+                    child.inc(values[0])
+    return registry
+
+
+REGISTRY = Registry()
+
+
+# ======== Several processes ========
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MultiProcessCollector:
+    """
+    Metrics of every worker process, merged at scrape time.
+
+    Each process writes a snapshot of its registry to `<directory>/<pid>.json`
+    every `interval` seconds and right before it renders a scrape; `render()`
+    sums the snapshots of the processes still alive (files of dead ones are
+    deleted). Other workers' values are therefore up to `interval` old, and a
+    worker that exits takes its counts with it, which Prometheus reads as a
+    counter reset.
+    """
+
+    def __init__(self, directory: str, registry: Registry = REGISTRY, interval: float = 1.0):
+        self.directory = directory
+        self.registry = registry
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def path(self, pid: Optional[int] = None) -> str:
+        return os.path.join(self.directory, f"{pid or os.getpid()}.json")
+
+    def write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.registry.snapshot(), f)
+        os.replace(tmp, self.path())
+
+    def render(self) -> str:
+        self.write()
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json") or name.startswith("."):
+                continue
+            pid = int(name[:-len(".json")])
+            if not _alive(pid):
+                remove(self.directory, pid)
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue  # its process exited or it is being replaced
+        registry = merged(snapshots)
+        registry.gauge("healthe_metrics_processes", "Worker processes merged into this scrape").set(len(snapshots))
+        return registry.render()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop writing and delete this process's snapshot."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        remove(self.directory, os.getpid())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                pass  # e.g. the directory was removed; try again next time
+
+
+def remove(directory: str, pid: int):
+    """Delete the snapshot of process `pid` (e.g. from gunicorn's child_exit hook)."""
+    try:
+        os.remove(os.path.join(directory, f"{pid}.json"))
+    except FileNotFoundError:
+        pass
+
+
+# ======== ASGI middleware ========
+
+class RequestMetricsMiddleware:
+    """
+    Times every HTTP request by route template (so /items/1 and /items/2 share
+    a series), method and status, and tracks requests in flight.
+    """
+
+    def __init__(self, app, registry: Registry = REGISTRY):
+        self.app = app
+        self.latency = registry.histogram(
+            "healthe_http_request_duration_seconds", "HTTP request latency by route",
+            ("route", "method", "status"),
+        )
+        self.in_flight = registry.gauge("healthe_http_requests_in_flight", "HTTP requests being served")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        gauge = self.in_flight.labels()
+        gauge.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            gauge.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.latency.labels(path, scope["method"], status).observe(elapsed)
@@ -0,0 +1,57 @@
+"""
+Process memory figures for startup reports.
+
+RSS counts every resident page, including pages shared with a preloading
+parent after fork; PSS divides each shared page among the processes mapping
+it, so summing PSS across workers gives their real footprint. PSS and the
+shared/private split come from /proc (Linux); elsewhere only peak RSS is known.
+"""
+
+import os
+import resource
+import sys
+from typing import Dict, List, Union
+
+Pid = Union[int, str]
+
+
+def memory_usage(pid: Pid = "self") -> Dict[str, int]:
+    """{"rss_bytes", and on Linux "pss_bytes", "shared_bytes", "private_bytes"} for `pid`."""
+    fields = _smaps_rollup(pid)
+    if fields:
+        shared = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+        private = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+        return {
+            "rss_bytes": fields.get("Rss", 0),
+            "pss_bytes": fields.get("Pss", 0),
+            "shared_bytes": shared,
+            "private_bytes": private,
+        }
+    if pid != "self" and pid != os.getpid():
+        return {}
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"rss_bytes": peak if sys.platform == "darwin" else peak * 1024}
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of `pid` (Linux)."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _smaps_rollup(pid: Pid) -> Dict[str, int]:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+    out = {}
+    for line in lines[1:]:
+        parts = line.split()
+        if len(parts) >= 3 and parts[2] == "kB":
+            out[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return out
@@ -0,0 +1,470 @@
+"""
+Versioned model artifacts with hot reload.
+
+Each prediction type has its own directory of immutable versions and a
+CURRENT file naming the one to serve:
+
+    models/registry/recovery_days/
+        CURRENT                      "20261017-093000-1a2b3c4d"
+        20261017-093000-1a2b3c4d/
+            manifest.json            checksums, feature schema, metadata
+            model.joblib
+            scaler.joblib
+
+`publish()` writes a version into a hidden temporary directory and renames it
+into place, then replaces CURRENT; both are atomic renames, so a reader sees
+the old version or the complete new one, never a partial copy. A prediction
+type with no registry directory is served from its flat files in `models/`
+(the layout before the registry) as version "legacy-<checksum>".
+
+`ModelRegistry.current()` returns the active `ModelVersion`. A watcher thread
+polls CURRENT every `poll_seconds`; a new version is loaded, checked against
+its manifest, warmed up with a few predictions and only then swapped in with
+one reference assignment, so requests in flight finish on the version they
+started with. A version that fails any check is skipped and the active one
+keeps serving. Nothing else holds on to replaced versions, so they are freed
+once their last request is done.
+
+    python -m healthe.registry publish recovery_days model.joblib scaler.joblib
+    python -m healthe.registry activate recovery_days 20261017-093000-1a2b3c4d
+    python -m healthe.registry list
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from healthe.cache import artifact_fingerprint
+from healthe.features import DIET, RECOVERY, SCHEMAS
+from healthe.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.getenv("MODELS_DIR", "models")
+REGISTRY_DIRNAME = "registry"
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+ARTIFACTS = ("model", "scaler")
+
+# File names in MODELS_DIR before the registry existed
+LEGACY_FILES = {
+    RECOVERY.name: {"model": "LightGBM_recovery_time.joblib", "scaler": "recovery_scaler_realistic.joblib"},
+    DIET.name: {"model": "new_lr_model_final.joblib", "scaler": "new_diet_scaler_final.joblib"},
+}
+
+SWAPS = REGISTRY.counter("healthe_model_swaps_total", "Model versions swapped in by prediction type", ("prediction_type",))
+LOAD_ERRORS = REGISTRY.counter(
+    "healthe_model_load_errors_total", "Model versions rejected or failing to load by prediction type", ("prediction_type",)
+)
+LOAD_SECONDS = REGISTRY.histogram(
+    "healthe_model_load_seconds", "Time to load, check and warm up a model version by prediction type",
+    ("prediction_type",), buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+class RegistryError(RuntimeError):
+    """Raised when a model version is missing, corrupt or does not fit its feature schema."""
+
+
+class ModelVersion(NamedTuple):
+    prediction_type: str
+    version: str
+    manifest: Dict[str, Any]
+    paths: Dict[str, str]  # artifact name -> file
+    model: Any
+    scaler: Any
+    predictor: Any  # TreeEnsemblePredictor or FusedLogisticPredictor
+    loaded_at: datetime
+    load_seconds: float
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "created_at": self.manifest.get("created_at"),
+            "loaded_at": self.loaded_at.isoformat(timespec="seconds"),
+            "load_seconds": round(self.load_seconds, 4),
+            "artifacts": {name: a["sha256"] for name, a in self.manifest["artifacts"].items()},
+            "metadata": self.manifest.get("metadata", {}),
+        }
+
+
+# ======== Layout ========
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def type_dir(models_dir: str, prediction_type: str) -> str:
+    return os.path.join(models_dir, REGISTRY_DIRNAME, prediction_type)
+
+
+def current_version(models_dir: str, prediction_type: str) -> Optional[str]:
+    """The version named by CURRENT, or None when the type has no registry yet."""
+    try:
+        with open(os.path.join(type_dir(models_dir, prediction_type), CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(models_dir: str, prediction_type: str) -> List[str]:
+    root = type_dir(models_dir, prediction_type)
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if not name.startswith(".") and os.path.isfile(os.path.join(root, name, MANIFEST))
+    )
+
+
+def _manifest(prediction_type: str, version: str, paths: Mapping[str, str], metadata=None) -> Dict[str, Any]:
+    return {
+        "prediction_type": prediction_type,
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "artifacts": {
+            name: {"file": os.path.basename(path), "sha256": file_sha256(path), "bytes": os.path.getsize(path)}
+            for name, path in paths.items()
+        },
+        "features": SCHEMAS[prediction_type].to_dict(),
+        "metadata": dict(metadata or {}),
+    }
+
+
+def _write_atomic(path: str, text: str):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def activate(models_dir: str, prediction_type: str, version: str):
+    """Point CURRENT at an existing `version` (also how to roll back)."""
+    if version not in list_versions(models_dir, prediction_type):
+        raise RegistryError(f"No version {version!r} of {prediction_type}")
+    _write_atomic(os.path.join(type_dir(models_dir, prediction_type), CURRENT), version + "\n")
+
+
+def publish(
+    models_dir: str,
+    prediction_type: str,
+    model_path: str,
+    scaler_path: str,
+    version: Optional[str] = None,
+    metadata: Optional[Mapping[str, Any]] = None,
+    make_current: bool = True,
+) -> str:
+    """
+    Copy a model and its scaler into a new version with its manifest, and make
+    it CURRENT unless `make_current` is False. Returns the version name
+    (by default the UTC time plus the start of the model's checksum).
+    """
+    if prediction_type not in LEGACY_FILES:
+        raise RegistryError(f"Unknown prediction type {prediction_type!r}")
+    root = type_dir(models_dir, prediction_type)
+    os.makedirs(root, exist_ok=True)
+    if version is None:
+        version = f"{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{file_sha256(model_path)[:8]}"
+    final = os.path.join(root, version)
+    if os.path.exists(final):
+        raise RegistryError(f"Version {version!r} of {prediction_type} already exists")
+
+    staging = tempfile.mkdtemp(dir=root, prefix=f".{version}-")
+    try:
+        paths = {}
+        for name, src in (("model", model_path), ("scaler", scaler_path)):
+            paths[name] = os.path.join(staging, f"{name}.joblib")
+            shutil.copyfile(src, paths[name])
+        with open(os.path.join(staging, MANIFEST), "w") as f:
+            json.dump(_manifest(prediction_type, version, paths, metadata), f, indent=2)
+        os.rename(staging, final)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if make_current:
+        activate(models_dir, prediction_type, version)
+    return version
+
+
+# ======== Loading ========
+
+def build_predictor(prediction_type: str, model, scaler):
+    """The NumPy predictor for a loaded model and scaler, scalers folded in."""
+    from healthe.linear_predictor import FusedLogisticPredictor
+    from healthe.tree_predictor import TreeEnsemblePredictor
+
+    if prediction_type == RECOVERY.name:
+        return TreeEnsemblePredictor.from_model(model, scaler)
+    return FusedLogisticPredictor.from_model(model, scaler, DIET.columns, DIET.scaled_columns)
+
+
+def warmup_rows(prediction_type: str, scaler, n: int, seed: int = 0) -> np.ndarray:
+    """`n` plausible encoded rows: valid category codes, other columns drawn around the scaler's means."""
+    schema = SCHEMAS[prediction_type]
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n, schema.n_features))
+    mean = np.asarray(getattr(scaler, "mean_", np.zeros(len(schema.scaled_indices))), dtype=np.float64)
+    scale = np.asarray(getattr(scaler, "scale_", np.ones(len(schema.scaled_indices))), dtype=np.float64)
+    X[:, schema.scaled_indices] = mean + scale * rng.standard_normal((n, len(schema.scaled_indices)))
+    for column, vocabulary in schema.categories.items():
+        X[:, schema.columns.index(column)] = rng.integers(0, len(vocabulary), n)
+    return X
+
+
+def warm_up(prediction_type: str, predictor, scaler, n: int):
+    """Run every predict path once so the first real request does not pay for it."""
+    if n <= 0:
+        return
+    X = warmup_rows(prediction_type, scaler, n)
+    if prediction_type == RECOVERY.name:
+        predictor.predict(X)
+        predictor.predict(X[:1])
+        predictor.predict_with_contributions(X)
+    else:
+        predictor.predict_with_proba(X)
+        predictor.predict_with_proba(X[:1])
+        predictor.predict_with_contributions(X)
+
+
+def _joblib_load(path: str, mmap_mode: Optional[str]):
+    import joblib
+
+    if mmap_mode is None:
+        return joblib.load(path)
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        models_dir: str = MODELS_DIR,
+        mmap_mode: Optional[str] = "r",
+        poll_seconds: float = 0.0,
+        warmup: int = 8,
+    ):
+        self.models_dir = models_dir
+        self.mmap_mode = mmap_mode
+        self.poll_seconds = poll_seconds
+        self.warmup = warmup
+
+        # prediction type -> (source, ModelVersion); replaced, never mutated
+        self._active: Dict[str, Tuple[Any, ModelVersion]] = {}
+        self._load_lock = threading.Lock()
+        self._listeners: List[Callable[[str, Optional[ModelVersion], ModelVersion], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, models_dir: str = MODELS_DIR, mmap_mode: Optional[str] = "r") -> "ModelRegistry":
+        """Polling every MODEL_RELOAD_SECONDS (0 disables hot reload), MODEL_WARMUP_ROWS rows of warm-up."""
+        return cls(
+            models_dir,
+            mmap_mode=mmap_mode,
+            poll_seconds=float(os.getenv("MODEL_RELOAD_SECONDS", "5")),
+            warmup=int(os.getenv("MODEL_WARMUP_ROWS", "8")),
+        )
+
+    # ---- readers ----
+
+    def current(self, prediction_type: str) -> ModelVersion:
+        """The active version, loaded on first use (which also starts the watcher)."""
+        entry = self._active.get(prediction_type)
+        if entry is None:
+            with self._load_lock:
+                entry = self._active.get(prediction_type)
+                if entry is None:
+                    source = self._source(prediction_type)
+                    entry = (source, self._load(prediction_type, source))
+                    self._swap(prediction_type, entry)
+            self._ensure_watcher()
+        return entry[1]
+
+    def versions(self) -> Dict[str, str]:
+        """Active version per loaded prediction type."""
+        return {t: entry[1].version for t, entry in self._active.items()}
+
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        return {t: entry[1].describe() for t, entry in self._active.items()}
+
+    def on_swap(self, listener: Callable[[str, Optional[ModelVersion], ModelVersion], None]):
+        """Call `listener(prediction_type, old, new)` whenever a version becomes active (old is None at first)."""
+        self._listeners.append(listener)
+
+    # ---- reloading ----
+
+    def refresh(self) -> Dict[str, str]:
+        """
+        Load, check, warm up and swap in every loaded type whose CURRENT (or
+        legacy files) changed. Returns {prediction_type: new version}; a
+        version that fails is logged, counted and retried on the next call.
+        """
+        swapped = {}
+        with self._load_lock:
+            for prediction_type, (active_source, _) in list(self._active.items()):
+                source = self._source(prediction_type)
+                if source == active_source:
+                    continue
+                try:
+                    version = self._load(prediction_type, source)
+                except Exception:
+                    LOAD_ERRORS.labels(prediction_type).inc()
+                    logger.exception("Keeping %s %s: loading %s failed",
+                                     prediction_type, self._active[prediction_type][1].version, source)
+                    continue
+                self._swap(prediction_type, (source, version))
+                swapped[prediction_type] = version.version
+        if swapped:
+            # The replaced versions are unreferenced now; free them before the next poll
+            gc.collect()
+        return swapped
+
+    def start(self):
+        """Start polling for new versions (no-op when poll_seconds is 0)."""
+        self._ensure_watcher()
+
+    def stop(self):
+        """Stop the watcher thread; `current()` starts a new one after a fork."""
+        thread = self._thread
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _ensure_watcher(self):
+        if self.poll_seconds <= 0:
+            return
+        # Threads do not survive fork: each worker starts its own
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        stop = self._stop
+        while not stop.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Model registry refresh failed")
+
+    # ---- internals ----
+
+    def _source(self, prediction_type: str):
+        """What identifies the files to serve: the CURRENT version, or the legacy files' stat."""
+        version = current_version(self.models_dir, prediction_type)
+        if version is not None:
+            return ("registry", version)
+        files = LEGACY_FILES[prediction_type]
+        return ("legacy", artifact_fingerprint([os.path.join(self.models_dir, files[a]) for a in ARTIFACTS]))
+
+    def _resolve(self, prediction_type: str, source) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        """(version, manifest, artifact paths) of `source`."""
+        kind, value = source
+        if kind == "legacy":
+            files = LEGACY_FILES[prediction_type]
+            paths = {a: os.path.join(self.models_dir, files[a]) for a in ARTIFACTS}
+            if not all(os.path.exists(p) for p in paths.values()):
+                raise RegistryError(f"No registry version and no legacy files for {prediction_type} in {self.models_dir}")
+            manifest = _manifest(prediction_type, "", paths)
+            combined = hashlib.sha256("".join(a["sha256"] for a in manifest["artifacts"].values()).encode())
+            manifest["version"] = f"legacy-{combined.hexdigest()[:8]}"
+            return manifest["version"], manifest, paths
+
+        directory = os.path.join(type_dir(self.models_dir, prediction_type), value)
+        try:
+            with open(os.path.join(directory, MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise RegistryError(f"Cannot read the manifest of {prediction_type} {value}: {e}")
+        paths = {a: os.path.join(directory, manifest["artifacts"][a]["file"]) for a in ARTIFACTS}
+        for name, path in paths.items():
+            if file_sha256(path) != manifest["artifacts"][name]["sha256"]:
+                raise RegistryError(f"Checksum mismatch for {prediction_type} {value} {name}")
+        if manifest.get("features") != SCHEMAS[prediction_type].to_dict():
+            raise RegistryError(
+                f"{prediction_type} {value} was trained on another feature schema than healthe.features.{prediction_type}"
+            )
+        return value, manifest, paths
+
+    def _load(self, prediction_type: str, source) -> ModelVersion:
+        t0 = time.perf_counter()
+        version, manifest, paths = self._resolve(prediction_type, source)
+        model = _joblib_load(paths["model"], self.mmap_mode)
+        scaler = _joblib_load(paths["scaler"], self.mmap_mode)
+        predictor = build_predictor(prediction_type, model, scaler)
+        warm_up(prediction_type, predictor, scaler, self.warmup)
+        seconds = time.perf_counter() - t0
+        LOAD_SECONDS.labels(prediction_type).observe(seconds)
+        return ModelVersion(
+            prediction_type, version, manifest, paths, model, scaler, predictor,
+            datetime.now(timezone.utc), seconds,
+        )
+
+    def _swap(self, prediction_type: str, entry: Tuple[Any, ModelVersion]):
+        old = self._active.get(prediction_type)
+        active = dict(self._active)
+        active[prediction_type] = entry
+        self._active = active
+        SWAPS.labels(prediction_type).inc()
+        logger.info("Serving %s %s", prediction_type, entry[1].version)
+        for listener in self._listeners:
+            listener(prediction_type, old[1] if old else None, entry[1])
+
+
+# ======== CLI ========
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish and activate versioned HealthE models.")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pub = commands.add_parser("publish", help="Add a version and make it current")
+    pub.add_argument("prediction_type", choices=sorted(LEGACY_FILES))
+    pub.add_argument("model")
+    pub.add_argument("scaler")
+    pub.add_argument("--version")
+    pub.add_argument("--no-activate", action="store_true", help="Only add it; activate later")
+
+    act = commands.add_parser("activate", help="Make an existing version current (or roll back)")
+    act.add_argument("prediction_type", choices=sorted(LEGACY_FILES))
+    act.add_argument("version")
+
+    commands.add_parser("list", help="Show versions and which one is current")
+    args = parser.parse_args(argv)
+
+    if args.command == "publish":
+        version = publish(args.models_dir, args.prediction_type, args.model, args.scaler,
+                          version=args.version, make_current=not args.no_activate)
+        print(f"Published {args.prediction_type} {version}")
+    elif args.command == "activate":
+        activate(args.models_dir, args.prediction_type, args.version)
+        print(f"{args.prediction_type} now serves {args.version}")
+    else:
+        for prediction_type in sorted(LEGACY_FILES):
+            current = current_version(args.models_dir, prediction_type)
+            print(f"{prediction_type}: {'legacy files' if current is None else current}")
+            for version in list_versions(args.models_dir, prediction_type):
+                print(f"  {'*' if version == current else ' '} {version}")
+
+
+if __name__ == "__main__":
+    main()
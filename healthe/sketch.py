@@ -0,0 +1,126 @@
+"""
+Mergeable quantile sketch with relative-error guarantees (DDSketch).
+
+Values are counted in logarithmically sized bins: bin i holds values in
+(gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so any quantile is
+answered within relative error `a` of a true sample value. Two sketches with
+the same accuracy merge by adding bin counts, which makes them suitable for
+per-bucket rollups that are combined into arbitrary windows later. Memory is
+one counter per occupied bin (a few hundred for values spanning several
+orders of magnitude), independent of how many values were added.
+"""
+
+import math
+from typing import Dict, Optional
+
+# Magnitudes below this are counted as zero
+_MIN_VALUE = 1e-9
+
+
+class QuantileSketch:
+    __slots__ = ("relative_accuracy", "_gamma", "_log_gamma", "positive", "negative", "zeros",
+                 "count", "sum", "min", "max")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        # Midpoint (in relative terms) of the bin's range
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def add(self, value: float, weight: int = 1):
+        if value > _MIN_VALUE:
+            i = self._index(value)
+            self.positive[i] = self.positive.get(i, 0) + weight
+        elif value < -_MIN_VALUE:
+            i = self._index(-value)
+            self.negative[i] = self.negative.get(i, 0) + weight
+        else:
+            self.zeros += weight
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Add `other`'s counts into this sketch (in place); returns self."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can only merge sketches with the same relative accuracy")
+        for i, c in other.positive.items():
+            self.positive[i] = self.positive.get(i, 0) + c
+        for i, c in other.negative.items():
+            self.negative[i] = self.negative.get(i, 0) + c
+        self.zeros += other.zeros
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("q must be in [0, 1]")
+        rank = q * (self.count - 1)
+        seen = 0
+        # Ascending value order: most negative, zeros, then positives
+        for i in sorted(self.negative, reverse=True):
+            seen += self.negative[i]
+            if seen > rank:
+                return self._clamp(-self._value(i))
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for i in sorted(self.positive):
+            seen += self.positive[i]
+            if seen > rank:
+                return self._clamp(self._value(i))
+        return self.max
+
+    def _clamp(self, value: float) -> float:
+        return min(max(value, self.min), self.max)
+
+    # ---- serialization ----
+
+    def to_dict(self) -> Dict:
+        return {
+            "a": self.relative_accuracy,
+            "p": {str(i): c for i, c in self.positive.items()},
+            "n": {str(i): c for i, c in self.negative.items()},
+            "z": self.zeros,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QuantileSketch":
+        sketch = cls(data["a"])
+        sketch.positive = {int(i): c for i, c in data["p"].items()}
+        sketch.negative = {int(i): c for i, c in data["n"].items()}
+        sketch.zeros = data["z"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
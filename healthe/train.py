@@ -0,0 +1,405 @@
+"""
+Retraining pipeline for the two models.
+
+Stages, each timed:
+
+    features  parse and encode the training CSV with its `FeatureSchema`, or
+              reuse the cached matrix (`<cache>/<type>-<key>-X.npy`, keyed by
+              the CSV's checksum and the schema) when neither has changed;
+              the cached arrays are memory-mapped, not read into memory
+    search    k-fold cross-validation of every candidate in the grid, one
+              (candidate, fold) fit per task on a process pool; workers open
+              the same memory-mapped arrays by path instead of receiving
+              pickled copies
+    fit       refit the best candidate on all rows
+    check     the NumPy predictor built from the new artifacts must agree
+              with the fitted estimators
+    write     dump `model.joblib`, `scaler.joblib` and `schema.json`, then
+              publish them as a new registry version (`healthe/registry.py`);
+              by default it only becomes CURRENT, and is swapped in by
+              running servers, when its CV score is at least as good as the
+              active version's (`--activate`)
+
+Scalers are fitted the way the shipped ones were: on every column for
+recovery_days, on the numeric columns only for diet_plan. The grids are small
+(`GRIDS`) so a full run takes minutes on a few cores.
+
+    python -m healthe.train
+    python -m healthe.train recovery_days --workers 8 --folds 5
+    python -m healthe.train diet_plan --no-publish --out /tmp/diet
+    python -m healthe.train recovery_days --activate never
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from healthe import registry
+from healthe.drift import SOURCES
+from healthe.features import DIET, DIET_PLAN_LABELS, RECOVERY, SCHEMAS, FeatureError
+
+CACHE_DIR = os.getenv("TRAIN_CACHE_DIR", ".cache/train")
+# Bump when the cached arrays change meaning
+CACHE_FORMAT = 1
+
+SEED = 42
+
+# Fixed parameters (those of the shipped models) and the searched grid
+BASE_PARAMS = {
+    RECOVERY.name: {
+        "n_estimators": 300, "learning_rate": 0.05, "max_depth": 8, "num_leaves": 64,
+        "subsample": 0.8, "colsample_bytree": 0.8, "random_state": SEED, "verbose": -1,
+    },
+    DIET.name: {"max_iter": 500, "random_state": SEED},
+}
+GRIDS = {
+    RECOVERY.name: {"num_leaves": [31, 64], "learning_rate": [0.05, 0.1], "max_depth": [6, 8]},
+    DIET.name: {"C": [0.1, 0.3, 1.0, 3.0, 10.0]},
+}
+# Cross-validation metric per type and whether larger is better
+METRICS = {RECOVERY.name: ("mae", False), DIET.name: ("accuracy", True)}
+
+
+class StageTimer:
+    """Wall time of each named stage, printed as it finishes."""
+
+    def __init__(self, prediction_type: str, progress=sys.stderr):
+        self.prediction_type = prediction_type
+        self.progress = progress
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = round(time.perf_counter() - t0, 3)
+            if self.progress is not None:
+                print(f"[{self.prediction_type}] {name}: {self.seconds[name]:.2f}s", file=self.progress)
+
+
+# ======== Features ========
+
+def targets(prediction_type: str, df) -> np.ndarray:
+    """Training targets: recovery days, or diet plan class indices (the order of DIET_PLAN_LABELS)."""
+    if prediction_type == RECOVERY.name:
+        return df["recovery_days"].to_numpy(dtype=np.float64)
+    # The CSV has "Keto" where the app says "Keto Diet"
+    classes = {label.removesuffix(" Diet"): i for i, label in enumerate(DIET_PLAN_LABELS)}
+    y = df["diet_plan"].map(classes)
+    if y.isna().any():
+        raise FeatureError(f"Unknown diet plans: {sorted(set(df['diet_plan'][y.isna()]))}")
+    return y.to_numpy(dtype=np.int64)
+
+
+def cache_paths(prediction_type: str, csv_path: str, cache_dir: str = CACHE_DIR) -> Tuple[str, str]:
+    """The cached (X, y) files for the CSV as it is now."""
+    digest = hashlib.sha256(registry.file_sha256(csv_path).encode())
+    digest.update(json.dumps([CACHE_FORMAT, SCHEMAS[prediction_type].to_dict()], sort_keys=True).encode())
+    stem = os.path.join(cache_dir, f"{prediction_type}-{digest.hexdigest()[:16]}")
+    return f"{stem}-X.npy", f"{stem}-y.npy"
+
+
+def load_features(prediction_type: str, csv_path: str, cache_dir: str = CACHE_DIR) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """Memory-mapped (X, y) and whether they came from the cache; parses the CSV only on a miss."""
+    x_path, y_path = cache_paths(prediction_type, csv_path, cache_dir)
+    hit = os.path.exists(x_path) and os.path.exists(y_path)
+    if not hit:
+        import pandas as pd
+
+        df = pd.read_csv(csv_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        for path, array in ((y_path, targets(prediction_type, df)), (x_path, SCHEMAS[prediction_type].encode(df))):
+            # Renamed into place, so a reader never sees a partial file
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=".tmp-", suffix=".npy")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, path)
+    return np.load(x_path, mmap_mode="r"), np.load(y_path, mmap_mode="r"), hit
+
+
+# ======== Fitting ========
+
+def fit(prediction_type: str, X: np.ndarray, y: np.ndarray, params: Mapping[str, Any], n_jobs: int = 1):
+    """Fitted (model, scaler) for one set of parameters."""
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+
+    schema = SCHEMAS[prediction_type]
+    if prediction_type == RECOVERY.name:
+        from lightgbm import LGBMRegressor
+
+        scaler = StandardScaler().fit(schema.frame(X))
+        model = LGBMRegressor(**params, n_jobs=n_jobs).fit(scaler.transform(schema.frame(X)), y)
+        return model, scaler
+
+    from sklearn.linear_model import LogisticRegression
+
+    scaled = list(schema.scaled_columns)
+    scaler = StandardScaler().fit(pd.DataFrame(X[:, schema.scaled_indices], columns=scaled))
+    model = LogisticRegression(**params).fit(_scale_diet(X, scaler), y)
+    return model, scaler
+
+
+def predict(prediction_type: str, model, scaler, X: np.ndarray) -> np.ndarray:
+    schema = SCHEMAS[prediction_type]
+    if prediction_type == RECOVERY.name:
+        return model.predict(scaler.transform(schema.frame(X)))
+    return model.predict(_scale_diet(X, scaler))
+
+
+def _scale_diet(X: np.ndarray, scaler):
+    import pandas as pd
+
+    frame = DIET.frame(np.array(X))
+    scaled = list(DIET.scaled_columns)
+    frame[scaled] = scaler.transform(pd.DataFrame(frame[scaled].to_numpy(), columns=scaled))
+    return frame
+
+
+def score(prediction_type: str, y_true: np.ndarray, y_pred: np.ndarray) -> float:
+    if prediction_type == RECOVERY.name:
+        return float(np.mean(np.abs(y_true - y_pred)))
+    return float(np.mean(y_true == y_pred))
+
+
+def folds(prediction_type: str, y: np.ndarray, n_folds: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """(train, test) row indices; stratified by class for diet_plan."""
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    if prediction_type == RECOVERY.name:
+        splitter = KFold(n_folds, shuffle=True, random_state=SEED)
+    else:
+        splitter = StratifiedKFold(n_folds, shuffle=True, random_state=SEED)
+    return list(splitter.split(np.zeros(len(y)), y))
+
+
+def candidates(prediction_type: str, grid: Optional[Mapping[str, Sequence[Any]]] = None) -> List[Dict[str, Any]]:
+    """Full parameter sets for every combination in the grid."""
+    grid = GRIDS[prediction_type] if grid is None else grid
+    names = sorted(grid)
+    return [
+        {**BASE_PARAMS[prediction_type], **dict(zip(names, values))}
+        for values in itertools.product(*(grid[n] for n in names))
+    ]
+
+
+# ======== Search (runs in workers) ========
+
+_arrays: Dict[str, np.ndarray] = {}
+
+
+def _open(path: str) -> np.ndarray:
+    if path not in _arrays:
+        _arrays[path] = np.load(path, mmap_mode="r")
+    return _arrays[path]
+
+
+def cv_task(prediction_type: str, x_path: str, y_path: str, params: Dict[str, Any], fold: int, n_folds: int) -> float:
+    """Score of one candidate on one fold (the folds are recomputed, identically, in every worker)."""
+    X, y = _open(x_path), _open(y_path)
+    train, test = folds(prediction_type, y, n_folds)[fold]
+    model, scaler = fit(prediction_type, X[train], y[train], params)
+    return score(prediction_type, y[test], predict(prediction_type, model, scaler, X[test]))
+
+
+def search(
+    prediction_type: str,
+    x_path: str,
+    y_path: str,
+    params_list: List[Dict[str, Any]],
+    n_folds: int,
+    workers: int,
+) -> List[List[float]]:
+    """Fold scores of every candidate."""
+    tasks = [(i, fold) for i in range(len(params_list)) for fold in range(n_folds)]
+    scores = [[0.0] * n_folds for _ in params_list]
+    if workers == 1:
+        for i, fold in tasks:
+            scores[i][fold] = cv_task(prediction_type, x_path, y_path, params_list[i], fold, n_folds)
+        return scores
+    # Spawned, not forked: a fork after LightGBM has started its OpenMP
+    # threads in this process can deadlock the children
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {
+            pool.submit(cv_task, prediction_type, x_path, y_path, params_list[i], fold, n_folds): (i, fold)
+            for i, fold in tasks
+        }
+        for future, (i, fold) in futures.items():
+            scores[i][fold] = future.result()
+    return scores
+
+
+# ======== Driver ========
+
+# When a published version becomes CURRENT: "if-better" when its CV score is at
+# least as good as the one stored with the active version (a type still on
+# legacy files, or whose version has no score, keeps it), "always" or "never"
+ACTIVATE = ("if-better", "always", "never")
+
+
+def active_score(models_dir: str, prediction_type: str, metric: str) -> Tuple[Optional[str], Optional[float]]:
+    """(CURRENT version, the CV `metric` in its manifest), None where unknown."""
+    version = registry.current_version(models_dir, prediction_type)
+    if version is None:
+        return None, None
+    try:
+        with open(os.path.join(registry.type_dir(models_dir, prediction_type), version, registry.MANIFEST)) as f:
+            metadata = json.load(f).get("metadata", {})
+    except (OSError, ValueError):
+        return version, None
+    if metadata.get("metric") != metric:
+        return version, None
+    return version, metadata.get("best", {}).get(metric)
+
+
+def train(
+    prediction_type: str,
+    csv_path: Optional[str] = None,
+    models_dir: str = registry.MODELS_DIR,
+    cache_dir: str = CACHE_DIR,
+    out_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    n_folds: int = 5,
+    grid: Optional[Mapping[str, Sequence[Any]]] = None,
+    publish: bool = True,
+    activate: str = "if-better",
+    progress=sys.stderr,
+) -> Dict[str, Any]:
+    """Run every stage for one model; returns the report (also stored in the version's manifest)."""
+    if prediction_type not in SCHEMAS:
+        raise ValueError(f"prediction_type must be one of {sorted(SCHEMAS)}")
+    if activate not in ACTIVATE:
+        raise ValueError(f"activate must be one of {ACTIVATE}")
+    csv_path = csv_path or SOURCES[prediction_type][1]
+    out_dir = out_dir or os.path.join(cache_dir, "artifacts", prediction_type)
+    workers = workers or os.cpu_count() or 1
+    timer = StageTimer(prediction_type, progress)
+    metric, larger_is_better = METRICS[prediction_type]
+
+    with timer.stage("features"):
+        X, y, cache_hit = load_features(prediction_type, csv_path, cache_dir)
+    x_path, y_path = cache_paths(prediction_type, csv_path, cache_dir)
+
+    params_list = candidates(prediction_type, grid)
+    with timer.stage("search"):
+        fold_scores = search(prediction_type, x_path, y_path, params_list, n_folds, workers)
+    results = [
+        {"params": params, metric: round(float(np.mean(s)), 4), f"{metric}_std": round(float(np.std(s)), 4)}
+        for params, s in zip(params_list, fold_scores)
+    ]
+    best = (max if larger_is_better else min)(results, key=lambda r: r[metric])
+
+    with timer.stage("fit"):
+        model, scaler = fit(prediction_type, X, y, best["params"], n_jobs=workers)
+
+    with timer.stage("check"):
+        sample = np.array(X[:1000])
+        expected = predict(prediction_type, model, scaler, sample)
+        predictor = registry.build_predictor(prediction_type, model, scaler)
+        if prediction_type == RECOVERY.name:
+            served = predictor.predict(sample)
+        else:
+            served = predictor.predict_with_proba(sample)[0]
+        if not np.allclose(served, expected, atol=1e-6):
+            raise RuntimeError(f"The {prediction_type} predictor disagrees with the fitted model")
+
+    report = {
+        "prediction_type": prediction_type,
+        "csv": {"path": csv_path, "sha256": registry.file_sha256(csv_path), "rows": len(y)},
+        "cache_hit": cache_hit,
+        "workers": workers,
+        "folds": n_folds,
+        "metric": metric,
+        "best": best,
+        "candidates": results,
+        "version": None,
+        "activated": False,
+    }
+    with timer.stage("write"):
+        import joblib
+
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {name: os.path.join(out_dir, f"{name}.joblib") for name in registry.ARTIFACTS}
+        joblib.dump(model, paths["model"])
+        joblib.dump(scaler, paths["scaler"])
+        with open(os.path.join(out_dir, "schema.json"), "w") as f:
+            json.dump(SCHEMAS[prediction_type].to_dict(), f, indent=2)
+        if publish:
+            previous, previous_score = active_score(models_dir, prediction_type, metric)
+            score = best[metric]
+            better = previous_score is not None and (
+                score >= previous_score if larger_is_better else score <= previous_score
+            )
+            report["previous"] = {"version": previous, metric: previous_score}
+            report["activated"] = activate == "always" or (activate == "if-better" and better)
+            metadata = {k: report[k] for k in ("csv", "metric", "best", "folds")}
+            report["version"] = registry.publish(
+                models_dir, prediction_type, paths["model"], paths["scaler"],
+                metadata=metadata, make_current=report["activated"],
+            )
+    report["stages"] = dict(timer.seconds)
+    report["seconds"] = round(sum(timer.seconds.values()), 3)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain the HealthE models from the training CSVs.")
+    parser.add_argument("prediction_type", nargs="*", help=f"Any of {sorted(SCHEMAS)} (default: both)")
+    parser.add_argument("--csv", help="Training CSV (default: the one in data/; only with a single type)")
+    parser.add_argument("--models-dir", default=registry.MODELS_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--out", help="Where to write the artifacts (default: under --cache-dir)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--no-publish", action="store_true", help="Only write the artifacts")
+    parser.add_argument("--activate", choices=ACTIVATE, default="if-better",
+                        help="When the published version becomes CURRENT (default: if-better)")
+    parser.add_argument("--report", help="Also write the reports as JSON here")
+    args = parser.parse_args(argv)
+    types = args.prediction_type or sorted(SCHEMAS)
+    unknown = sorted(set(types) - set(SCHEMAS))
+    if unknown:
+        parser.error(f"unknown prediction types {unknown}; choose from {sorted(SCHEMAS)}")
+    if args.csv and len(types) > 1:
+        parser.error("--csv needs a single prediction type")
+
+    reports = []
+    for prediction_type in types:
+        report = train(
+            prediction_type, args.csv, models_dir=args.models_dir, cache_dir=args.cache_dir,
+            out_dir=args.out and os.path.join(args.out, prediction_type), workers=args.workers,
+            n_folds=args.folds, publish=not args.no_publish, activate=args.activate,
+        )
+        reports.append(report)
+        best = report["best"]
+        tuned = {k: v for k, v in best["params"].items() if k in GRIDS[prediction_type]}
+        print(f"{prediction_type}: {report['metric']} {best[report['metric']]} ± {best[report['metric'] + '_std']} "
+              f"with {tuned}; {'cached' if report['cache_hit'] else 'parsed'} features, "
+              f"{report['seconds']:.1f}s ({', '.join(f'{k} {v:.1f}s' for k, v in report['stages'].items())})")
+        if report["version"] and report["activated"]:
+            print(f"  published {report['version']} and made it current")
+        elif report["version"]:
+            previous = report["previous"]
+            print(f"  published {report['version']}, not current (active: {previous['version'] or 'legacy files'}, "
+                  f"{report['metric']} {previous[report['metric']]})")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
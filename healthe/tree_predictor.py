@@ -0,0 +1,254 @@
+"""
+Pure-NumPy evaluation of the LightGBM recovery model.
+
+The booster's trees are flattened once into node arrays (split feature,
+threshold, children, missing-value handling, leaf value). Every tree is then
+walked for every row at the same time, one depth level per step, so a single
+row or a whole batch costs a handful of vectorized array operations with no
+DataFrame and no LightGBM call. The fitted `StandardScaler` is kept as its
+mean/scale vectors and applied as the first step.
+
+The arrays can be saved to an `.npz` file and loaded without lightgbm or
+scikit-learn installed:
+
+    python -m healthe.tree_predictor models/LightGBM_recovery_time.joblib \
+        models/recovery_scaler_realistic.joblib models/recovery_trees.npz
+"""
+
+import sys
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# LightGBM's MissingType, as stored per node
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+
+# Values this close to zero count as zero for MissingType::Zero (kZeroThreshold)
+_ZERO_THRESHOLD = 1e-35
+
+# Objectives whose raw score is already the prediction
+_IDENTITY_OBJECTIVES = {"regression", "regression_l1", "huber", "fair", "quantile", "mape"}
+
+_ARRAYS = (
+    "split_feature", "threshold", "left", "right",
+    "default_left", "missing_type", "value", "roots", "mean", "scale",
+)
+
+
+class TreeEnsemblePredictor:
+    """
+    Every node (internal or leaf) of every tree lives in the same flat arrays.
+    Leaves point to themselves, so walking `depth` steps from each root always
+    ends on a leaf no matter how deep that particular branch was.
+    """
+
+    def __init__(
+        self,
+        split_feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        default_left: np.ndarray,
+        missing_type: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        mean: Optional[np.ndarray] = None,
+        scale: Optional[np.ndarray] = None,
+    ):
+        self.split_feature = np.ascontiguousarray(split_feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.missing_type = np.ascontiguousarray(missing_type, dtype=np.int8)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+        self.depth = _max_depth(self.left, self.right, self.roots)
+        self._has_missing_rules = bool((self.missing_type != MISSING_NONE).any())
+        # Interleaved [left, right] per node so one gather picks the next node
+        self._children = np.stack([self.left, self.right], axis=1).ravel().astype(np.intp)
+        self._split_feature = self.split_feature.astype(np.intp)
+        self._roots = self.roots.astype(np.intp)
+        # Files saved before internal values were kept only have leaf values
+        self._has_node_values = bool((self.value[self.left != np.arange(len(self.left))] != 0).any())
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    # ---- construction ----
+
+    @classmethod
+    def from_model(cls, model, scaler=None) -> "TreeEnsemblePredictor":
+        """Build from a fitted `LGBMRegressor` (or raw `Booster`) and optional `StandardScaler`."""
+        booster = getattr(model, "booster_", model)
+        return cls.from_dump(
+            booster.dump_model(),
+            mean=None if scaler is None else scaler.mean_,
+            scale=None if scaler is None else scaler.scale_,
+        )
+
+    @classmethod
+    def from_dump(cls, dump: Dict[str, Any], mean=None, scale=None) -> "TreeEnsemblePredictor":
+        objective = str(dump.get("objective", "regression")).split()[0]
+        if objective not in _IDENTITY_OBJECTIVES:
+            raise NotImplementedError(f"Unsupported LightGBM objective: {objective}")
+        if dump.get("num_tree_per_iteration", 1) != 1:
+            raise NotImplementedError("Multiclass boosters are not supported")
+
+        cols: Dict[str, List] = {k: [] for k in ("split_feature", "threshold", "left", "right",
+                                                  "default_left", "missing_type", "value")}
+        roots = []
+
+        def add(node) -> int:
+            idx = len(cols["value"])
+            for k in cols:
+                cols[k].append(0)
+            if "leaf_value" in node:
+                cols["value"][idx] = node["leaf_value"]
+                cols["left"][idx] = cols["right"][idx] = idx
+                return idx
+            if node.get("decision_type", "<=") != "<=":
+                raise NotImplementedError("Categorical splits are not supported")
+            # Expected value of the node's subtree, used by predict_with_contributions
+            cols["value"][idx] = node.get("internal_value", 0.0)
+            cols["split_feature"][idx] = node["split_feature"]
+            cols["threshold"][idx] = node["threshold"]
+            cols["default_left"][idx] = node["default_left"]
+            cols["missing_type"][idx] = _MISSING_TYPES[node["missing_type"]]
+            cols["left"][idx] = add(node["left_child"])
+            cols["right"][idx] = add(node["right_child"])
+            return idx
+
+        for tree in dump["tree_info"]:
+            roots.append(add(tree["tree_structure"]))
+
+        return cls(roots=np.array(roots), mean=mean, scale=scale,
+                   **{k: np.array(v) for k, v in cols.items()})
+
+    def save(self, path: str):
+        np.savez(path, **{k: getattr(self, k) for k in _ARRAYS if getattr(self, k) is not None})
+
+    @classmethod
+    def load(cls, path: str) -> "TreeEnsemblePredictor":
+        with np.load(path) as data:
+            return cls(**{k: data[k] for k in _ARRAYS if k in data})
+
+    # ---- inference ----
+
+    def predict(self, X, chunk_size: int = 1024) -> np.ndarray:
+        """Predictions for raw (unscaled) feature rows; `X` is 1-D for one row or 2-D."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if self.mean is not None:
+            # Same operations as StandardScaler.transform, so splits see identical values
+            X = (X - self.mean) / self.scale
+        X = np.ascontiguousarray(X)
+
+        out = np.empty(X.shape[0], dtype=np.float64)
+        # Chunks keep the (rows x trees) working arrays cache-sized
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = X[start:start + chunk_size]
+            out[start:start + len(chunk)] = self._predict_chunk(chunk)
+        return out
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        n, n_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n, dtype=np.intp) * n_features)[:, None]
+        nodes = np.broadcast_to(self._roots, (n, self.n_trees))
+
+        for _ in range(self.depth):
+            x = flat.take(row_offsets + self._split_feature.take(nodes))
+            go_left = x <= self.threshold.take(nodes)
+            if self._has_missing_rules or np.isnan(x).any():
+                go_left = self._missing_aware(x, nodes)
+            nodes = self._children.take(nodes * 2 + ~go_left)
+
+        return self.value.take(nodes).sum(axis=1)
+
+    def predict_with_contributions(self, X, chunk_size: int = 1024):
+        """
+        Predictions and per-feature contributions from the same tree walk.
+
+        Each split credits its feature with the change in expected value from
+        the node to the child the row goes to (path attribution); the last
+        column is the ensemble's expected value, so every row of the (n,
+        n_features + 1) matrix sums to its prediction -- the layout of
+        LightGBM's `pred_contrib`, at about the cost of a prediction.
+        """
+        if not self._has_node_values:
+            raise ValueError("Predictor has no internal node values; rebuild it from the model")
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if self.mean is not None:
+            X = (X - self.mean) / self.scale
+        X = np.ascontiguousarray(X)
+
+        n, n_features = X.shape
+        pred = np.empty(n, dtype=np.float64)
+        contrib = np.empty((n, n_features + 1), dtype=np.float64)
+        contrib[:, -1] = self.value.take(self._roots).sum()
+        for start in range(0, n, chunk_size):
+            chunk = X[start:start + chunk_size]
+            stop = start + len(chunk)
+            pred[start:stop], contrib[start:stop, :-1] = self._contrib_chunk(chunk)
+        return pred, contrib
+
+    def _contrib_chunk(self, X: np.ndarray):
+        n, n_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n, dtype=np.intp) * n_features)[:, None]
+        nodes = np.broadcast_to(self._roots, (n, self.n_trees))
+        contrib = np.zeros(n * n_features, dtype=np.float64)
+
+        for _ in range(self.depth):
+            idx = row_offsets + self._split_feature.take(nodes)
+            x = flat.take(idx)
+            go_left = x <= self.threshold.take(nodes)
+            if self._has_missing_rules or np.isnan(x).any():
+                go_left = self._missing_aware(x, nodes)
+            children = self._children.take(nodes * 2 + ~go_left)
+            # Leaves point to themselves, so finished paths add nothing
+            delta = self.value.take(children) - self.value.take(nodes)
+            contrib += np.bincount(idx.ravel(), weights=delta.ravel(), minlength=n * n_features)
+            nodes = children
+
+        return self.value.take(nodes).sum(axis=1), contrib.reshape(n, n_features)
+
+    def _missing_aware(self, x, nodes):
+        """Apply LightGBM's NumericalDecision rules for NaN / zero-as-missing."""
+        missing_type = self.missing_type.take(nodes)
+        nan = np.isnan(x)
+        # Without a NaN rule, NaN is treated as 0.0
+        x = np.where(nan & (missing_type != MISSING_NAN), 0.0, x)
+        is_missing = ((missing_type == MISSING_ZERO) & (np.abs(x) <= _ZERO_THRESHOLD)) | (
+            (missing_type == MISSING_NAN) & nan
+        )
+        return np.where(is_missing, self.default_left.take(nodes), x <= self.threshold.take(nodes))
+
+
+def _max_depth(left, right, roots) -> int:
+    depth = 0
+    frontier = np.unique(roots)
+    while True:
+        internal = frontier[left[frontier] != frontier]
+        if internal.size == 0:
+            return depth
+        depth += 1
+        frontier = np.unique(np.concatenate([left[internal], right[internal]]))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        sys.exit("usage: python -m healthe.tree_predictor MODEL.joblib SCALER.joblib OUT.npz")
+    import joblib
+
+    predictor = TreeEnsemblePredictor.from_model(joblib.load(sys.argv[1]), joblib.load(sys.argv[2]))
+    predictor.save(sys.argv[3])
+    print(f"Saved {predictor.n_trees} trees (depth {predictor.depth}) to {sys.argv[3]}")
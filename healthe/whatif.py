@@ -0,0 +1,146 @@
+"""
+What-if sweeps: one patient's prediction as one or two inputs vary.
+
+The whole grid is built as a single (n_points, n_features) matrix -- the
+patient's encoded row repeated, with the varied columns filled from the
+cartesian product of their values -- and scored in one batched model call, so
+a 100 x 100 sweep costs about as much as predicting 10k rows, not 10k calls.
+
+    axes = [axis(RECOVERY, "rest_hours_per_day", start=4, stop=10, steps=25)]
+    result = recovery_days_sweep(record, axes, predictor.predict)
+
+The `*_sweep` functions return JSON-ready dicts shared by the backend's
+/whatif endpoint and the Streamlit what-if panels.
+"""
+
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from healthe.features import DIET, DIET_PLAN_LABELS, RECOVERY, FeatureError, FeatureSchema
+
+MAX_AXES = 2
+
+
+class Axis(NamedTuple):
+    column: str
+    codes: np.ndarray  # encoded values, as the model sees them
+    values: List[Any]  # the same values for display (category labels, ints)
+
+
+def axis(
+    schema: FeatureSchema,
+    column: str,
+    values: Optional[Sequence[Any]] = None,
+    start: Optional[float] = None,
+    stop: Optional[float] = None,
+    steps: int = 50,
+    max_points: Optional[int] = None,
+) -> Axis:
+    """
+    One varied column: explicit `values` (labels or codes for categories), or
+    `steps` evenly spaced numbers from `start` to `stop`. A categorical column
+    with neither sweeps its whole vocabulary; integer columns are rounded.
+    An axis longer than `max_points` is rejected before anything is allocated.
+    """
+    if column not in schema.columns:
+        raise FeatureError(f"Unknown column '{column}'; expected one of {list(schema.columns)}")
+    if max_points is not None:
+        size = len(values) if values is not None else steps
+        if size > max_points:
+            raise FeatureError(f"Column '{column}' has {size} values; at most {max_points} are allowed")
+    if values is not None:
+        codes = np.array([schema.encode_value(column, v) for v in values], dtype=np.float64)
+    elif column in schema.categories and start is None and stop is None:
+        codes = np.arange(len(schema.categories[column]), dtype=np.float64)
+    else:
+        if start is None or stop is None:
+            raise FeatureError(f"Column '{column}' needs either values or start and stop")
+        if steps < 1:
+            raise FeatureError("steps must be at least 1")
+        codes = np.linspace(start, stop, steps)
+        if schema.dtypes[column].startswith("int"):
+            codes = np.unique(np.round(codes))
+        if column in schema.categories:
+            codes = np.array([schema.encode_value(column, c) for c in codes], dtype=np.float64)
+    if len(codes) == 0:
+        raise FeatureError(f"Column '{column}' has no values to sweep")
+
+    if column in schema.categories:
+        display = [schema.label(column, c) for c in codes]
+    elif schema.dtypes[column].startswith("int"):
+        display = [int(c) for c in codes]
+    else:
+        display = codes.tolist()
+    return Axis(column, codes, display)
+
+
+def grid(base: np.ndarray, columns: Sequence[int], codes: Sequence[np.ndarray]) -> np.ndarray:
+    """`base` (1, n_features) repeated over the cartesian product of `codes` in `columns`, row-major."""
+    shape = tuple(len(c) for c in codes)
+    X = np.repeat(np.asarray(base, dtype=np.float64).reshape(1, -1), int(np.prod(shape)), axis=0)
+    for j, mesh in zip(columns, np.meshgrid(*codes, indexing="ij")):
+        X[:, j] = mesh.ravel()
+    return X
+
+
+def sweep(
+    schema: FeatureSchema,
+    record: Mapping[str, Any],
+    axes: Sequence[Axis],
+    predict_fn: Callable[[np.ndarray], Any],
+    max_points: Optional[int] = None,
+) -> Tuple[Any, Tuple[int, ...]]:
+    """
+    `predict_fn` over the grid of `axes` around `record`, in one call. The
+    patient's own row is scored in the same call and comes last, so callers
+    can split it off as the baseline. Returns (predict_fn's output, grid shape).
+    """
+    if not 1 <= len(axes) <= MAX_AXES:
+        raise FeatureError(f"Vary between 1 and {MAX_AXES} columns")
+    if len({a.column for a in axes}) != len(axes):
+        raise FeatureError("Each column can only be varied once")
+    shape = tuple(len(a.codes) for a in axes)
+    if max_points is not None and int(np.prod(shape)) > max_points:
+        raise FeatureError(f"Sweep has {int(np.prod(shape))} points; at most {max_points} are allowed")
+
+    base = schema.encode_record(record)
+    X = grid(base, [schema.columns.index(a.column) for a in axes], [a.codes for a in axes])
+    return predict_fn(np.vstack([X, base])), shape
+
+
+def _axes_json(axes: Sequence[Axis]) -> List[Dict[str, Any]]:
+    return [{"column": a.column, "values": a.values} for a in axes]
+
+
+def recovery_days_sweep(
+    record: Mapping[str, Any], axes: Sequence[Axis], predict_fn, max_points: Optional[int] = None
+) -> Dict[str, Any]:
+    """Predicted recovery days over the grid (nested lists, one level per axis)."""
+    pred, shape = sweep(RECOVERY, record, axes, predict_fn, max_points)
+    pred = np.round(np.asarray(pred, dtype=np.float64), 2)
+    return {
+        "axes": _axes_json(axes),
+        "baseline": {"recovery_days": float(pred[-1])},
+        "recovery_days": pred[:-1].reshape(shape).tolist(),
+    }
+
+
+def diet_plan_sweep(
+    record: Mapping[str, Any], axes: Sequence[Axis], predict_with_proba_fn, max_points: Optional[int] = None
+) -> Dict[str, Any]:
+    """Predicted diet-plan class and each plan's probability over the grid."""
+    (classes, proba), shape = sweep(DIET, record, axes, predict_with_proba_fn, max_points)
+    classes = np.asarray(classes).astype(int)
+    proba = np.round(proba, 4)
+    labels = [DIET_PLAN_LABELS[c] if c < len(DIET_PLAN_LABELS) else str(c) for c in range(proba.shape[1])]
+    return {
+        "axes": _axes_json(axes),
+        "baseline": {
+            "diet_plan_class": int(classes[-1]),
+            "diet_plan_label": labels[classes[-1]],
+            "probabilities": dict(zip(labels, proba[-1].tolist())),
+        },
+        "diet_plan_class": classes[:-1].reshape(shape).tolist(),
+        "probabilities": {label: proba[:-1, k].reshape(shape).tolist() for k, label in enumerate(labels)},
+    }
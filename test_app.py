@@ -5,7 +5,10 @@ Directions:
 - The main app file is named `app.py`.
 - These tests focus on:
   - Verifying that `load_models()` calls joblib.load with the correct paths
-    (once, at import time).
+    (once, at import time). With no published versions in models/registry,
+    the model registry serves these legacy files; building the NumPy
+    predictors and warming them up is stubbed out, since the loaded objects
+    are mocks.
   - Verifying that `load_models()` returns 4 objects and that module-level
     globals are set.
 """
@@ -16,6 +19,8 @@ from unittest.mock import MagicMock
 
 import joblib
 
+from healthe import registry
+
 
 def test_load_models_uses_expected_paths(monkeypatch):
     # Collect the file paths joblib.load gets called with
@@ -28,6 +33,8 @@ def test_load_models_uses_expected_paths(monkeypatch):
 
     # Patch joblib.load BEFORE importing the app
     monkeypatch.setattr(joblib, "load", fake_load)
+    monkeypatch.setattr(registry, "build_predictor", lambda *args: MagicMock(name="predictor"))
+    monkeypatch.setenv("MODEL_WARMUP_ROWS", "0")
 
     # Make sure we import a fresh copy of the module
     if "app" in sys.modules:
@@ -0,0 +1,687 @@
+"""
+Tests for the HealthE FastAPI backend.
+
+Directions:
+- The backend lives in `backend/main.py` and needs `DB_URL`; these tests point
+  it at a throwaway SQLite file before importing it, then create the schema
+  with `migrate()` (importing the module does not touch the database).
+- These tests focus on:
+  - The batch prediction endpoints agreeing with the per-row models used by
+    the Streamlit app.
+  - Logging predictions, directly and through the write-behind buffer.
+  - The frontend's batching log client delivering (and re-sending) logs.
+  - Keyset pagination and filters on /history.
+  - Small /history pages served from the in-memory recent buffer matching
+    what the database returns.
+  - ETag / If-None-Match revalidation of /history, taken from the database
+    when other workers may have logged rows.
+  - Typed recovery/diet tables written alongside each log, backfilled by
+    `migrate()` for rows logged before they existed, and serving the
+    `where` input filters of /history and /export.
+  - /stats rollups agreeing with a rebuild from the typed tables, and
+    skipping non-finite `recovery_days` values.
+  - /drift flagging a shifted input, from counts that survive a rebuild.
+  - /metrics exposing route, DB, JSON and model timings (also with the
+    write-behind buffer on), merged across workers when asked to.
+  - The DB_ASYNC mode (aiosqlite engine) serving logging and /history
+    like the sync mode.
+  - /explain contributions summing to the predictions they explain, made
+    by the model version named in their X-Model-Version header.
+  - /whatif sweeps agreeing with predicting each grid point on its own.
+  - /export streaming NDJSON, CSV and Parquet in cursor-sized batches.
+  - The model version stored with each log and shown by /history, the
+    column added by `migrate()` to older databases, and /predict reporting
+    the version that answered.
+  - Startup: no engine or schema work at import, a clear error when the
+    schema is missing, and opt-in migration in the startup hook.
+"""
+
+import os
+import sys
+import json
+import tempfile
+import importlib
+from datetime import datetime
+
+import joblib
+import pandas as pd
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from backend.ingest import PredictionBuffer
+from healthe.log_client import PredictionLogClient
+
+
+@pytest.fixture(scope="module")
+def backend():
+    db_dir = tempfile.mkdtemp()
+    os.environ["DB_URL"] = f"sqlite:///{os.path.join(db_dir, 'test.db')}"
+    if "backend.main" in sys.modules:
+        del sys.modules["backend.main"]
+    module = importlib.import_module("backend.main")
+    module.migrate()
+    return module
+
+
+@pytest.fixture(scope="module")
+def client(backend):
+    with TestClient(backend.app) as c:
+        yield c
+
+
+def _health_rows(n):
+    return pd.read_csv("data/new_health_dataset.csv", nrows=n)
+
+
+def _diet_rows(n):
+    return pd.read_csv("data/diet_dataset.csv", nrows=n)
+
+
+def test_predict_recovery_days_matches_single_row_path(client):
+    df = _health_rows(50).drop(columns=["recovery_days"])
+    resp = client.post("/predict/recovery_days", json=df.to_dict(orient="records"))
+    assert resp.status_code == 200
+    batch = resp.json()["recovery_days"]
+    assert len(batch) == 50
+
+    # Same thing, one row at a time, the way app.py does it
+    model = joblib.load("models/LightGBM_recovery_time.joblib")
+    scaler = joblib.load("models/recovery_scaler_realistic.joblib")
+    gender_map = {"Male": 1, "Female": 0, "Other": 2}
+    condition_map = {"Allergy": 0, "Cough": 1, "Fever": 2, "Flu": 3, "Infection": 4, "Injury": 5}
+    smoking_status_map = {"Non-Smoker": 0, "Occasional": 1, "Regular": 2}
+    for i in (0, 17, 49):
+        row = df.iloc[i]
+        X = pd.DataFrame({
+            "age": [row["age"]],
+            "gender": [gender_map[row["gender"]]],
+            "bmi": [row["bmi"]],
+            "condition_type": [condition_map[row["condition_type"]]],
+            "severity_score": [row["severity_score"]],
+            "rest_hours_per_day": [row["rest_hours_per_day"]],
+            "medication_adherence": [row["medication_adherence"]],
+            "hospital_visits": [row["hospital_visits"]],
+            "smoking_status": [smoking_status_map[row["smoking_status"]]],
+        })
+        expected = round(float(model.predict(scaler.transform(X))[0]), 2)
+        assert batch[i] == pytest.approx(expected)
+
+
+def test_predict_accepts_column_oriented_payload(client):
+    df = _health_rows(20).drop(columns=["recovery_days"])
+    records = client.post("/predict/recovery_days", json=df.to_dict(orient="records")).json()
+    columns = client.post("/predict/recovery_days", json=df.to_dict(orient="list")).json()
+    assert records == columns
+
+
+def test_predict_diet_plan_returns_classes_and_labels(client):
+    df = _diet_rows(30).drop(columns=["diet_plan"])
+    resp = client.post("/predict/diet_plan", json=df.to_dict(orient="list"))
+    assert resp.status_code == 200
+    body = resp.json()
+    assert len(body["diet_plan_class"]) == 30
+    assert len(body["diet_plan_label"]) == 30
+    assert all(0 <= c <= 5 for c in body["diet_plan_class"])
+
+
+def test_predict_rejects_unknown_category(client):
+    df = _health_rows(3).drop(columns=["recovery_days"])
+    df.loc[1, "gender"] = "Robot"
+    resp = client.post("/predict/recovery_days", json=df.to_dict(orient="records"))
+    assert resp.status_code == 422
+    assert "gender" in resp.json()["detail"]
+
+
+def _log_payload(i, **extra):
+    return {
+        "prediction_type": "recovery_days",
+        "inputs": {"age": 20 + i},
+        "output": {"recovery_days": float(i)},
+        **extra,
+    }
+
+
+def test_log_prediction_returns_id(client):
+    first = client.post("/log_prediction", json=_log_payload(1)).json()
+    second = client.post("/log_prediction", json=_log_payload(2, client_id="abc")).json()
+    assert second["id"] == first["id"] + 1
+    assert second["client_id"] == "abc"
+
+
+def test_buffered_log_prediction_flushes_on_stop(backend, client, monkeypatch):
+    buffer = PredictionBuffer(backend.bulk_insert_predictions, max_batch=4, flush_interval=5)
+    monkeypatch.setattr(backend, "log_buffer", buffer)
+    buffer.start()
+
+    before = client.get("/history", params={"limit": 1}).json()[0]["id"]
+    acks = [client.post("/log_prediction", json=_log_payload(i, client_id=f"c{i}")) for i in range(10)]
+    assert all(a.status_code == 202 for a in acks)
+    assert [a.json()["client_id"] for a in acks] == [f"c{i}" for i in range(10)]
+
+    buffer.stop()
+    assert buffer.flushed == 10
+
+    history = client.get("/history", params={"limit": 10}).json()
+    assert all(item["id"] > before for item in history)
+    assert sorted(item["inputs"]["age"] for item in history) == list(range(20, 30))
+
+
+def test_buffered_log_prediction_sheds_load_when_full(backend, client, monkeypatch):
+    # Not started, so nothing drains the queue.
+    buffer = PredictionBuffer(lambda rows: None, max_pending=2, block_seconds=0)
+    monkeypatch.setattr(backend, "log_buffer", buffer)
+
+    codes = [client.post("/log_prediction", json=_log_payload(i)).status_code for i in range(3)]
+    assert codes == [202, 202, 503]
+    assert buffer.rejected == 1
+
+    text = client.get("/metrics").text
+    assert "healthe_log_buffer_pending 2" in text
+    assert "healthe_log_buffer_rejected_total 1" in text
+
+
+def test_metrics_merged_across_workers(backend, client, monkeypatch, tmp_path):
+    from healthe.metrics import MultiProcessCollector, Registry
+
+    # Another live worker (this test's parent process) with its own counts
+    other = Registry()
+    other.histogram("healthe_db_seconds", "x", ("endpoint", "operation")).labels("history", "query").observe(0.01)
+    with open(tmp_path / f"{os.getppid()}.json", "w") as f:
+        json.dump(other.snapshot(), f)
+    monkeypatch.setattr(backend, "metrics_collector", MultiProcessCollector(str(tmp_path)))
+
+    client.get("/history", params={"limit": 3, "prediction_type": "recovery_days"})
+    mine = backend.REGISTRY.get("healthe_db_seconds").labels("history", "query").count
+    text = client.get("/metrics").text
+    assert "healthe_metrics_processes 2" in text
+    assert f'healthe_db_seconds_count{{endpoint="history",operation="query"}} {mine + 1}' in text
+
+
+class _FlakySession:
+    """Routes posts to the TestClient, failing the first `failures` of them."""
+
+    def __init__(self, client, failures):
+        self.client = client
+        self.failures = failures
+        self.posts = []
+
+    def post(self, url, json, timeout):
+        self.posts.append(len(json))
+        if self.failures:
+            self.failures -= 1
+            raise requests.ConnectionError("backend down")
+        return self.client.post(url, json=json)
+
+    def close(self):
+        pass
+
+
+def test_log_client_batches_and_retries_spooled_logs(client):
+    session = _FlakySession(client, failures=1)
+    log_client = PredictionLogClient(
+        "http://testserver", batch_size=5, flush_interval=0.05, session=session
+    )
+    before = client.get("/history", params={"limit": 1}).json()[0]["id"]
+
+    for i in range(12):
+        log_client.log("diet_plan", {"age": 40 + i}, {"diet_plan_class": 0})
+    assert log_client.flush(timeout=5)
+    log_client.close()
+
+    # First attempt failed and was retried; nothing was lost or duplicated.
+    assert log_client.sent == 12
+    assert max(session.posts) <= 5
+    history = client.get("/history", params={"limit": 20}).json()
+    ages = sorted(h["inputs"]["age"] for h in history if h["id"] > before)
+    assert ages == list(range(40, 52))
+
+
+def _all_pages(client, **params):
+    items, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        resp = client.get("/history", params=query)
+        assert resp.status_code == 200
+        items.extend(resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return items
+
+
+def test_history_keyset_pagination_and_type_filter(client):
+    logs = [
+        {"prediction_type": "page_a" if i % 3 else "page_b", "inputs": {"i": i}, "output": {}}
+        for i in range(25)
+    ]
+    assert client.post("/log_predictions", json=logs).json() == {"logged": 25}
+
+    page_a = _all_pages(client, prediction_type="page_a", limit=4)
+    assert [item["inputs"]["i"] for item in page_a] == [i for i in reversed(range(25)) if i % 3]
+
+    everything = _all_pages(client, limit=7)
+    ids = [item["id"] for item in everything]
+    assert ids == sorted(set(ids), reverse=True)
+
+
+def test_history_time_window_and_bad_cursor(client):
+    newest = client.get("/history", params={"limit": 1}).json()[0]
+    created_at = newest["created_at"]
+    assert client.get("/history", params={"since": created_at}).json()[0]["id"] == newest["id"]
+    assert all(item["id"] != newest["id"] for item in client.get("/history", params={"until": created_at}).json())
+    assert client.get("/history", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_history_served_from_recent_buffer_matches_database(backend, client, monkeypatch):
+    from backend.recent import RecentPredictions
+
+    # Opt-in (HISTORY_CACHE_SIZE), for single-worker deployments
+    assert backend.recent is None
+    monkeypatch.setattr(backend, "recent", RecentPredictions(200))
+    backend.warm_recent()
+    for i in range(3):
+        client.post("/log_prediction", json=_log_payload(100 + i))
+    # A filter that matches everything forces the database path.
+    from_db = client.get("/history", params={"limit": 10, "until": "2999-01-01T00:00:00"})
+
+    def no_db():
+        raise AssertionError("small unfiltered pages should not hit the database")
+
+    monkeypatch.setattr(backend, "SessionLocal", no_db)
+    cached = client.get("/history", params={"limit": 10})
+    assert cached.status_code == 200
+    assert cached.json() == from_db.json()
+    assert cached.headers["X-Next-Cursor"] == from_db.headers["X-Next-Cursor"]
+
+
+def test_history_etag_revalidation(client):
+    first = client.get("/history", params={"limit": 5})
+    etag = first.headers["ETag"]
+    assert "Last-Modified" in first.headers
+
+    same = client.get("/history", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert same.status_code == 304
+    assert same.content == b""
+
+    # Another query has another validator
+    other = client.get("/history", params={"limit": 6}, headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+    client.post("/log_prediction", json=_log_payload(7))
+    changed = client.get("/history", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_history_etag_sees_other_workers_inserts(backend, client, monkeypatch):
+    from backend.recent import RecentPredictions
+
+    monkeypatch.setattr(backend, "recent", RecentPredictions(200))
+    backend.warm_recent()
+    # A single worker's buffer and the database agree on the newest row
+    monkeypatch.setattr(backend, "WEB_CONCURRENCY", 1)
+    etag = client.get("/history", params={"limit": 5}).headers["ETag"]
+    monkeypatch.setattr(backend, "WEB_CONCURRENCY", 4)
+    assert client.get("/history", params={"limit": 5}).headers["ETag"] == etag
+
+    # A row logged by another worker never reaches this worker's buffer
+    with backend.SessionLocal() as session:
+        backend._insert_predictions(session, [backend._prediction_row(backend.LogPredictionRequest(**_log_payload(8)))])
+    assert client.get("/history", params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 200
+    # (its /stats counts would arrive through the shared table)
+    backend.rebuild_stats()
+
+
+def test_startup_leaves_schema_changes_to_migrate(tmp_path, monkeypatch):
+    db_file = tmp_path / "fresh.db"
+    monkeypatch.setenv("DB_URL", f"sqlite:///{db_file}")
+    monkeypatch.delitem(sys.modules, "backend.main", raising=False)
+    fresh = importlib.import_module("backend.main")
+
+    # Importing neither connects nor creates anything
+    assert fresh.engine is None
+    assert not db_file.exists()
+
+    with pytest.raises(RuntimeError, match="backend.migrate"):
+        with TestClient(fresh.app):
+            pass
+
+    monkeypatch.setattr(fresh, "DB_AUTO_MIGRATE", True)
+    with TestClient(fresh.app) as c:
+        assert c.get("/history").json() == []
+        report = c.get("/startup").json()
+    assert report["migrate_seconds"] >= 0
+    assert report["rss_bytes"] > 0
+
+
+def test_in_memory_sqlite_starts_without_queue_pool_options(monkeypatch):
+    monkeypatch.setenv("DB_URL", "sqlite://")
+    monkeypatch.setenv("DB_AUTO_MIGRATE", "1")
+    monkeypatch.delitem(sys.modules, "backend.main", raising=False)
+    fresh = importlib.import_module("backend.main")
+
+    assert "max_overflow" not in fresh.pool_options("sqlite://")
+    assert fresh.pool_options("sqlite:////tmp/x.db")["pool_size"] == fresh.DB_POOL_SIZE
+    with TestClient(fresh.app) as c:
+        assert c.get("/health").json() == {"status": "ok"}
+
+
+def test_metrics_endpoint_exposes_route_db_and_model_timings(client):
+    client.post("/log_prediction", json=_log_payload(11))
+    client.get("/history", params={"limit": 3, "prediction_type": "recovery_days"})
+    client.post("/predict/diet_plan", json=_diet_rows(5).drop(columns=["diet_plan"]).to_dict(orient="records"))
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = resp.text
+    assert 'healthe_http_request_duration_seconds_count{route="/history",method="GET",status="200"}' in text
+    assert 'healthe_db_seconds_count{endpoint="log_prediction",operation="commit"}' in text
+    assert 'healthe_db_seconds_count{endpoint="history",operation="query"}' in text
+    assert 'healthe_json_seconds_count{endpoint="log_prediction",operation="encode"}' in text
+    assert 'healthe_model_inference_seconds_bucket{prediction_type="diet_plan",le="+Inf"}' in text
+    assert "healthe_http_requests_in_flight 1" in text  # the /metrics request itself
+
+
+def test_stats_incremental_rollups_match_rebuild(backend, client):
+    before = client.get("/stats").json()["total"]["counts"]
+    client.post("/log_prediction", json={
+        "prediction_type": "diet_plan",
+        "inputs": {"age": 30},
+        "output": {"diet_plan_class": 2, "diet_plan_label": "Keto Diet"},
+    })
+    client.post("/log_predictions", json=[_log_payload(1), _log_payload(2)])
+
+    resp = client.get("/stats", params={"hours": 1})
+    assert resp.status_code == 200
+    stats = resp.json()
+    assert stats["total"]["counts"]["diet_plan"] == before.get("diet_plan", 0) + 1
+    assert stats["window"]["diet_plan_label"]["Keto Diet"] >= 1
+    assert stats["window"]["recovery_days"]["p50"] is not None
+    assert client.get("/stats", params={"hours": 100000}).status_code == 422
+
+    # Persisted deltas and a full rebuild from the table agree with memory
+    backend.flush_stats()
+    with backend.SessionLocal() as session:
+        assert session.get(backend.PredictionStatsRow, "total") is not None
+    rebuilt = client.post("/stats/rebuild").json()
+    assert rebuilt["rows"] == stats["total"]["total"]
+    total = client.get("/stats", params={"hours": 1}).json()["total"]
+    assert total["counts"] == stats["total"]["counts"]
+    assert total["diet_plan_label"] == stats["total"]["diet_plan_label"]
+    assert total["recovery_days"]["mean"] == pytest.approx(stats["total"]["recovery_days"]["mean"])
+
+
+def test_non_finite_recovery_days_logged_but_not_counted(backend, client):
+    before = client.get("/stats").json()["total"]
+    for value in ("Infinity", "-Infinity", "NaN"):
+        body = '{"prediction_type": "recovery_days", "inputs": {"age": 30}, "output": {"recovery_days": %s}}' % value
+        resp = client.post("/log_prediction", content=body, headers={"Content-Type": "application/json"})
+        assert resp.status_code == 200, resp.text
+
+    after = client.get("/stats").json()["total"]
+    assert after["counts"]["recovery_days"] == before["counts"].get("recovery_days", 0) + 3
+    assert after["recovery_days"] == before["recovery_days"]
+    assert client.post("/stats/rebuild").status_code == 200
+
+
+def test_drift_scores_logged_inputs_and_survive_rebuild(backend, client):
+    rows = _health_rows(200).drop(columns=["recovery_days"])
+    rows["age"] += 30
+    client.post("/log_predictions", json=[
+        {"prediction_type": "recovery_days", "inputs": r, "output": {"recovery_days": 9.5}}
+        for r in rows.to_dict(orient="records")
+    ])
+
+    resp = client.get("/drift", params={"hours": 1, "min_count": 50})
+    assert resp.status_code == 200
+    body = resp.json()
+    recovery = body["window"]["recovery_days"]
+    assert recovery["count"] >= 200
+    assert recovery["features"]["age"]["status"] == "alert"
+    assert recovery["status"] == "alert"
+    assert set(recovery["features"]) == set(backend.RECOVERY.columns)
+    assert body["reference"]["recovery_days"]["rows"] == 10000
+
+    # Counts are persisted with the /stats rollups and recomputed by a rebuild
+    backend.flush_stats()
+    client.post("/stats/rebuild")
+    rebuilt = client.get("/drift", params={"hours": 1, "min_count": 50}).json()
+    assert rebuilt["total"]["recovery_days"] == body["total"]["recovery_days"]
+
+
+def test_typed_tables_dual_write_and_backfill(backend, client):
+    from sqlalchemy import func, insert, select
+
+    row = _health_rows(1).drop(columns=["recovery_days"]).iloc[0].to_dict()
+    logged = client.post("/log_prediction", json={
+        "prediction_type": "recovery_days", "inputs": row, "output": {"recovery_days": 9.5},
+    }).json()
+    client.post("/log_predictions", json=[{
+        "prediction_type": "diet_plan",
+        "inputs": _diet_rows(1).drop(columns=["diet_plan"]).iloc[0].to_dict(),
+        "output": {"diet_plan_class": 3},
+    }])
+
+    with backend.SessionLocal() as session:
+        typed = session.get(backend.RecoveryPrediction, logged["id"])
+        assert typed.recovery_days == 9.5
+        assert typed.age == int(row["age"])
+        assert typed.condition_type == backend.RECOVERY.categories["condition_type"].index(row["condition_type"])
+        diet = session.execute(
+            select(backend.DietPrediction).order_by(backend.DietPrediction.prediction_id.desc())
+        ).scalars().first()
+        assert diet.diet_plan_label == "Low-Carb Diet"
+
+        # Rows written before the typed tables existed are backfilled by migrate()
+        legacy_id = session.execute(insert(backend.Prediction).returning(backend.Prediction.id), {
+            "prediction_type": "recovery_days",
+            "inputs_json": json.dumps({**row, "bmi": 31.0}),
+            "output_json": json.dumps({"recovery_days": 4.0}),
+            "created_at": datetime.utcnow(),
+        }).scalar_one()
+        session.commit()
+
+    assert backend.migrate()["recovery_days"] == 1
+    with backend.SessionLocal() as session:
+        assert session.get(backend.RecoveryPrediction, legacy_id).bmi == 31.0
+        # A typed predicate and aggregate, evaluated by the database
+        n = session.execute(
+            select(func.count()).where(backend.RecoveryPrediction.bmi > 30, backend.RecoveryPrediction.recovery_days < 5)
+        ).scalar_one()
+        assert n >= 1
+    assert backend.migrate()["recovery_days"] == 0
+
+    # Input filters on /history and /export run against the typed table
+    condition = row["condition_type"]
+    page = client.get("/history", params={
+        "prediction_type": "recovery_days", "where": [f"condition_type={condition}", "bmi>30"], "limit": 1000,
+    }).json()
+    assert legacy_id in [p["id"] for p in page]
+    assert all(p["inputs"]["bmi"] > 30 and p["inputs"]["condition_type"] == condition for p in page)
+    exported = client.get("/export", params={"prediction_type": "recovery_days", "where": "recovery_days<5"}).text
+    assert legacy_id in [json.loads(line)["id"] for line in exported.splitlines()]
+    for params in (
+        {"where": "bmi>30"},
+        {"prediction_type": "recovery_days", "where": "bmi~30"},
+        {"prediction_type": "recovery_days", "where": "inputs_json=1"},
+        {"prediction_type": "recovery_days", "where": "condition_type=Unknown"},
+    ):
+        assert client.get("/history", params=params).status_code == 422
+
+    # A value an Integer column would round stays JSON-only
+    skipped = backend._TYPED_SKIPPED.labels("recovery_days").value
+    fractional = client.post("/log_prediction", json={
+        "prediction_type": "recovery_days", "inputs": {**row, "age": 30.7}, "output": {"recovery_days": 3.0},
+    }).json()
+    with backend.SessionLocal() as session:
+        assert session.get(backend.RecoveryPrediction, fractional["id"]) is None
+    assert backend._TYPED_SKIPPED.labels("recovery_days").value == skipped + 1
+
+
+def test_export_streams_all_formats_in_batches(backend, client, monkeypatch):
+    import csv
+    import io
+
+    logs = [{"prediction_type": "export_a", "inputs": {"i": i}, "output": {"ok": True}} for i in range(7)]
+    client.post("/log_predictions", json=logs)
+    monkeypatch.setattr(backend, "EXPORT_BATCH_SIZE", 3)
+
+    resp = client.get("/export", params={"prediction_type": "export_a"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["inputs"]["i"] for line in lines] == list(range(7))
+
+    rows = list(csv.DictReader(io.StringIO(client.get(
+        "/export", params={"format": "csv", "prediction_type": "export_a", "since": lines[2]["created_at"]},
+    ).text)))
+    since = [line["inputs"]["i"] for line in lines if line["created_at"] >= lines[2]["created_at"]]
+    assert [json.loads(r["inputs"])["i"] for r in rows] == since
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(io.BytesIO(client.get(
+        "/export", params={"format": "parquet", "prediction_type": "export_a"},
+    ).content))
+    assert table.column("id").to_pylist() == [line["id"] for line in lines]
+    assert client.get("/export", params={"format": "xml"}).status_code == 422
+
+
+def test_async_db_mode_logs_and_pages_history(tmp_path, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    monkeypatch.setenv("DB_URL", f"sqlite:///{tmp_path / 'async.db'}")
+    monkeypatch.setenv("DB_ASYNC", "1")
+    monkeypatch.setenv("HISTORY_CACHE_SIZE", "0")
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.delitem(sys.modules, "backend.main", raising=False)
+    fresh = importlib.import_module("backend.main")
+    fresh.migrate()
+
+    assert fresh.async_db_url("postgresql+psycopg2://u:p@db:5432/x") == "postgresql+asyncpg://u:p@db:5432/x"
+    with TestClient(fresh.app) as c:
+        row = _health_rows(1).drop(columns=["recovery_days"]).iloc[0].to_dict()
+        first = c.post("/log_prediction", json={
+            "prediction_type": "recovery_days", "inputs": row, "output": {"recovery_days": 3.0},
+        }).json()["id"]
+        assert c.post("/log_predictions", json=[_log_payload(i) for i in range(2, 6)]).json() == {"logged": 5 - 1}
+        assert str(fresh.async_engine.url).startswith("sqlite+aiosqlite")
+        assert fresh.async_engine.pool.size() == 3
+
+        page = c.get("/history", params={"limit": 3})
+        assert [item["inputs"]["age"] for item in page.json()] == [25, 24, 23]
+        rest = c.get("/history", params={"limit": 3, "cursor": page.headers["X-Next-Cursor"]}).json()
+        assert [item["id"] for item in rest][-1] == first
+        assert c.get("/history", params={"limit": 3}, headers={"If-None-Match": page.headers["ETag"]}).status_code == 304
+
+    with fresh.SessionLocal() as session:
+        assert session.get(fresh.RecoveryPrediction, first) is not None
+
+
+def test_whatif_sweep_matches_row_by_row_predictions(client):
+    row = _health_rows(1).drop(columns=["recovery_days"]).iloc[0].to_dict()
+    resp = client.post("/whatif/recovery_days", json={
+        "inputs": row,
+        "vary": [
+            {"column": "rest_hours_per_day", "start": 2, "stop": 10, "steps": 5},
+            {"column": "smoking_status"},
+        ],
+    })
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["axes"][1]["values"] == ["Non-Smoker", "Occasional", "Regular"]
+    grid = body["recovery_days"]
+    assert len(grid) == 5 and len(grid[0]) == 3
+
+    # Each cell equals predicting that row on its own
+    cells = [(i, j) for i in range(5) for j in range(3)]
+    rows = [{**row, "rest_hours_per_day": body["axes"][0]["values"][i], "smoking_status": j} for i, j in cells]
+    single = client.post("/predict/recovery_days", json=rows).json()["recovery_days"]
+    assert [grid[i][j] for i, j in cells] == pytest.approx(single, abs=0.01)
+    assert body["baseline"]["recovery_days"] == pytest.approx(
+        client.post("/predict/recovery_days", json=[row]).json()["recovery_days"][0], abs=0.01)
+
+    diet = _diet_rows(1).drop(columns=["diet_plan"]).iloc[0].to_dict()
+    body = client.post("/whatif/diet_plan", json={
+        "inputs": diet, "vary": [{"column": "daily_calories", "start": 1000, "stop": 4000, "steps": 7}],
+    }).json()
+    assert len(body["diet_plan_class"]) == 7
+    assert sum(p[0] for p in body["probabilities"].values()) == pytest.approx(1, abs=1e-3)
+
+    too_big = {"inputs": row, "vary": [{"column": "bmi", "start": 10, "stop": 40, "steps": 1000},
+                                       {"column": "age", "start": 1, "stop": 100, "steps": 100}]}
+    assert client.post("/whatif/recovery_days", json=too_big).status_code == 422
+    assert client.post("/whatif/recovery_days", json={"inputs": row, "vary": [{"column": "nope"}]}).status_code == 422
+    # One huge axis is refused before its values are generated
+    huge = {"inputs": row, "vary": [{"column": "bmi", "start": 10, "stop": 40, "steps": 20_000_000}]}
+    assert client.post("/whatif/recovery_days", json=huge).status_code == 422
+    assert client.post("/whatif/recovery_days", json={"inputs": row, "vary": []}).status_code == 422
+    from healthe import whatif
+    from healthe.features import RECOVERY, FeatureError
+    with pytest.raises(FeatureError, match="at most 100"):
+        whatif.axis(RECOVERY, "bmi", start=10, stop=40, steps=10**12, max_points=100)
+
+
+def test_explain_contributions_sum_to_predictions(client):
+    rows = _health_rows(20).drop(columns=["recovery_days"]).to_dict(orient="records")
+    predicted = client.post("/predict/recovery_days", json=rows)
+    preds = predicted.json()["recovery_days"]
+    explained = client.post("/explain/recovery_days", json=rows)
+    assert explained.headers["X-Model-Version"] == predicted.headers["X-Model-Version"]
+    body = explained.json()
+    assert body["recovery_days"] == preds
+    assert len(body["features"]) == len(body["contributions"][0]) == 9
+    for pred, contrib, base in zip(preds, body["contributions"], body["base_value"]):
+        assert sum(contrib) + base == pytest.approx(pred, abs=0.01)
+
+    # Exact TreeSHAP agrees closely with the path attribution
+    shap = client.post("/explain/recovery_days", params={"method": "shap"}, json=rows[:3]).json()
+    assert shap["recovery_days"] == preds[:3]
+    assert shap["contributions"][0] == pytest.approx(body["contributions"][0], abs=1.0)
+
+    diets = _diet_rows(20).drop(columns=["diet_plan"]).to_dict(orient="records")
+    predicted = client.post("/predict/diet_plan", json=diets)
+    resp = client.post("/explain/diet_plan", json=diets)
+    assert resp.headers["X-Model-Version"] == predicted.headers["X-Model-Version"]
+    explained = resp.json()
+    assert explained["diet_plan_class"] == predicted.json()["diet_plan_class"]
+    assert all(0 < p <= 1 for p in explained["probability"])
+    assert client.post("/explain/recovery_days", params={"method": "nope"}, json=rows).status_code == 422
+
+
+def test_model_version_logged_and_added_to_older_databases(tmp_path, monkeypatch):
+    from sqlalchemy import create_engine, text
+
+    # A predictions table from before model versions were recorded
+    db_url = f"sqlite:///{tmp_path / 'old.db'}"
+    with create_engine(db_url).begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE predictions (id INTEGER PRIMARY KEY, prediction_type VARCHAR(50) NOT NULL, "
+            "inputs_json TEXT NOT NULL, output_json TEXT NOT NULL, created_at DATETIME NOT NULL)"
+        ))
+        conn.execute(text(
+            "INSERT INTO predictions (prediction_type, inputs_json, output_json, created_at) "
+            "VALUES ('old', '{}', '{}', '2024-01-01 00:00:00')"
+        ))
+    monkeypatch.setenv("DB_URL", db_url)
+    monkeypatch.delitem(sys.modules, "backend.main", raising=False)
+    fresh = importlib.import_module("backend.main")
+    fresh.get_engine()
+    assert fresh.missing_columns(fresh.engine) == {"predictions": ["model_version"]}
+    with pytest.raises(RuntimeError, match="backend.migrate"):
+        with TestClient(fresh.app):
+            pass
+
+    fresh.migrate()
+    assert fresh.missing_columns(fresh.engine) == {}
+    with TestClient(fresh.app) as c:
+        c.post("/log_prediction", json=_log_payload(1, model_version="v7"))
+        c.post("/log_predictions", json=[_log_payload(2)])
+        cached = c.get("/history", params={"limit": 3}).json()
+        from_db = c.get("/history", params={"limit": 3, "until": "2999-01-01T00:00:00"}).json()
+        assert cached == from_db
+        assert [item["model_version"] for item in from_db] == [None, "v7", None]
+
+        resp = c.post("/predict/recovery_days", json=_health_rows(2).drop(columns=["recovery_days"]).to_dict(orient="list"))
+        active = c.get("/models").json()
+        assert resp.headers["X-Model-Version"] == active["recovery_days"]["version"]
+        assert c.post("/models/reload").json()["swapped"] == {}
@@ -0,0 +1,102 @@
+"""
+Tests for the micro-batching scheduler (`healthe/batching.py`).
+
+Directions:
+- These tests focus on:
+  - Concurrent callers being scored in one model call, each getting back
+    exactly its own rows (single arrays and tuples of arrays).
+  - The max_rows cap, large requests bypassing the queue, model errors
+    reaching every caller in the batch, and the asyncio wrapper.
+  - A cancelled async caller being dropped without stopping the scheduler.
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from healthe.batching import MicroBatcher
+
+
+def _model(calls):
+    def predict(X):
+        calls.append(len(X))
+        return X.sum(axis=1), X.max(axis=1)
+    return predict
+
+
+def test_concurrent_callers_share_one_model_call():
+    calls = []
+    batcher = MicroBatcher(_model(calls), name="t_share", max_wait_ms=200, max_rows=64)
+    rows = [np.full((1 + i % 3, 2), float(i)) for i in range(8)]
+    results = [None] * len(rows)
+    start = threading.Barrier(len(rows))
+
+    def call(i):
+        start.wait()
+        results[i] = batcher.predict(rows[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(rows))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert sum(calls) == sum(len(r) for r in rows)
+    assert len(calls) < len(rows)
+    for X, (sums, maxes) in zip(rows, results):
+        np.testing.assert_array_equal(sums, X.sum(axis=1))
+        np.testing.assert_array_equal(maxes, X.max(axis=1))
+
+
+def test_max_rows_bypass_errors_and_async():
+    calls = []
+    batcher = MicroBatcher(lambda X: calls.append(len(X)) or X[:, 0], name="t_cap", max_wait_ms=50, max_rows=4)
+
+    # Already a full batch: scored in the caller's thread, not queued
+    np.testing.assert_array_equal(batcher.predict(np.arange(10.0).reshape(5, 2)), [0, 2, 4, 6, 8])
+    assert calls == [5]
+
+    # Queued requests never exceed max_rows per call
+    futures = [batcher.submit(np.ones((3, 2))) for _ in range(3)]
+    assert [len(f.result()) for f in futures] == [3, 3, 3]
+    assert max(calls[1:]) <= 4
+
+    out = asyncio.run(batcher.apredict(np.array([[7.0, 1.0]])))
+    np.testing.assert_array_equal(out, [7.0])
+    batcher.close()
+
+    def fail(X):
+        raise ValueError("bad batch")
+
+    failing = MicroBatcher(fail, name="t_fail", max_wait_ms=50)
+    futures = [failing.submit(np.ones((1, 2))) for _ in range(2)]
+    for f in futures:
+        with pytest.raises(ValueError, match="bad batch"):
+            f.result()
+    failing.close()
+    with pytest.raises(RuntimeError):
+        failing.submit(np.ones((1, 2)))
+
+
+def test_cancelled_async_caller_does_not_stop_the_scheduler():
+    calls = []
+    batcher = MicroBatcher(lambda X: calls.append(len(X)) or X[:, 0], name="t_cancel", max_wait_ms=300)
+
+    async def give_up():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(batcher.apredict(np.ones((2, 2))), timeout=0.02)
+
+    asyncio.run(give_up())
+    # Queued in the same window as the cancelled rows, which are not scored
+    np.testing.assert_array_equal(batcher.predict(np.array([[5.0, 0.0]])), [5.0])
+    assert calls == [1]
+    assert batcher._thread.is_alive()
+
+    # A scheduler that died anyway is replaced on the next submit
+    batcher.close()
+    batcher._closed = False
+    np.testing.assert_array_equal(batcher.predict(np.array([[6.0, 0.0]])), [6.0])
+    batcher.close()
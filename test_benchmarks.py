@@ -0,0 +1,41 @@
+"""
+Tests for the benchmark scripts (`benchmarks/`).
+
+Directions:
+- These are smoke tests: each script runs at its smallest size and writes its
+  report under tmp_path. The numbers themselves are not checked.
+- These tests focus on:
+  - The load generator starting its own server, driving it briefly and
+    writing its JSON report.
+  - The baseline comparison failing a benchmark whose requests failed, even
+    when its best run looks fast.
+"""
+
+import json
+
+from benchmarks import loadgen
+from benchmarks.run import best_of, compare
+
+
+def test_loadgen_writes_its_report(tmp_path):
+    out = tmp_path / "loadgen.json"
+    loadgen.main([
+        "--duration", "1", "--warmup", "0.2", "--concurrency", "2", "--payloads", "50", "--out", str(out),
+    ])
+    with open(out) as f:
+        report = json.load(f)
+    assert report["meta"]["metric"] == "p50_ms"
+    assert report["config"]["concurrency"] == 2
+    assert report["result"]["total"]["requests"] > 0
+
+
+def test_failed_requests_fail_the_comparison():
+    baseline = {"log": {"p50_ms": 1.0, "errors": 0}, "predict": {"p50_ms": 1.0}}
+    runs = [
+        {"log": {"p50_ms": 2.0, "errors": 1}, "predict": {"p50_ms": 1.0}},
+        {"log": {"p50_ms": 0.9, "errors": 0}, "predict": {"p50_ms": 1.1}},
+    ]
+    results = best_of(runs)
+    assert results["log"] == {"p50_ms": 0.9, "errors": 1}
+    assert compare(results, baseline, tolerance=0.5) == ["log"]
+    assert compare({"new": {"p50_ms": 1.0, "errors": 2}}, baseline, tolerance=0.5) == ["new"]
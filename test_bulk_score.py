@@ -0,0 +1,41 @@
+"""
+Tests for the bulk scoring CLI (`healthe/bulk_score.py`).
+
+Directions:
+- These tests focus on:
+  - Chunked, multi-process scoring writing every row, in input order, with
+    the same predictions as the batch inference functions.
+"""
+
+import numpy as np
+import pandas as pd
+
+from healthe import bulk_score, inference
+
+
+def test_recovery_csv_chunks_across_workers(tmp_path):
+    src = tmp_path / "health.csv"
+    pd.read_csv("data/new_health_dataset.csv", nrows=1000).to_csv(src, index=False)
+    out = tmp_path / "scored.csv"
+
+    n = bulk_score.score_file("recovery", str(src), str(out), chunksize=150, workers=2, progress=None)
+
+    scored = pd.read_csv(out)
+    original = pd.read_csv(src)
+    assert n == len(scored) == 1000
+    pd.testing.assert_frame_equal(scored[original.columns], original)
+    expected = inference.predict_recovery_days(original).round(2)
+    np.testing.assert_allclose(scored["predicted_recovery_days"], expected, atol=1e-9)
+
+
+def test_diet_in_process(tmp_path):
+    src = tmp_path / "diet.csv"
+    pd.read_csv("data/diet_dataset.csv", nrows=300).to_csv(src, index=False)
+    out = tmp_path / "scored.csv"
+
+    bulk_score.score_file("diet", str(src), str(out), chunksize=64, workers=1, progress=None)
+
+    scored = pd.read_csv(out)
+    expected = inference.predict_diet_plan(pd.read_csv(src))
+    np.testing.assert_array_equal(scored["predicted_diet_plan_class"], expected)
+    assert scored["predicted_diet_plan_label"].iloc[0] == inference.DIET_PLAN_LABELS[expected[0]]
@@ -0,0 +1,90 @@
+"""
+Tests for the prediction cache (`healthe/cache.py`).
+
+Directions:
+- These tests focus on:
+  - Batches mixing hits and misses returning the same as an uncached call,
+    with only the misses sent to the model.
+  - LRU eviction, TTL expiry and invalidation when an artifact file changes,
+    with the matching counters.
+"""
+
+import os
+
+import numpy as np
+
+from healthe.cache import PredictionCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _model(calls):
+    def predict(X):
+        calls.append(len(X))
+        return X.sum(axis=1), X.max(axis=1)
+    return predict
+
+
+def test_batch_mixes_hits_and_misses():
+    cache = PredictionCache(maxsize=100)
+    calls = []
+    X = np.arange(12, dtype=float).reshape(4, 3)
+
+    first = cache.predict("m", X[:2], _model(calls))
+    sums, maxes = cache.predict("m", X, _model(calls))
+
+    np.testing.assert_array_equal(sums, X.sum(axis=1))
+    np.testing.assert_array_equal(maxes, X.max(axis=1))
+    np.testing.assert_array_equal(first[0], sums[:2])
+    assert calls == [2, 2]
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 4
+
+    # Same row seen through another model is a different entry
+    cache.predict("other", X[:1], _model(calls))
+    assert calls[-1] == 1
+
+
+def test_lru_eviction_and_ttl():
+    clock = _Clock()
+    cache = PredictionCache(maxsize=2, ttl=10, clock=clock)
+    calls = []
+    rows = np.eye(3)
+
+    cache.predict("m", rows[0], _model(calls))
+    cache.predict("m", rows[1], _model(calls))
+    cache.predict("m", rows[0], _model(calls))  # refreshes row 0
+    cache.predict("m", rows[2], _model(calls))  # evicts row 1
+    assert cache.stats()["evictions"] == 1
+
+    cache.predict("m", rows[0], _model(calls))
+    assert calls == [1, 1, 1]
+
+    clock.now = 11
+    cache.predict("m", rows[0], _model(calls))
+    assert cache.stats()["expirations"] == 1
+    assert calls == [1, 1, 1, 1]
+
+
+def test_invalidated_when_artifact_changes(tmp_path):
+    artifact = tmp_path / "model.joblib"
+    artifact.write_bytes(b"v1")
+    clock = _Clock()
+    cache = PredictionCache(clock=clock, check_interval=1)
+    cache.register("m", [str(artifact)])
+    calls = []
+
+    cache.predict("m", np.ones(3), _model(calls))
+    artifact.write_bytes(b"v2 retrained")
+    os.utime(artifact, ns=(0, 123))
+    clock.now = 2
+    cache.predict("m", np.ones(3), _model(calls))
+
+    assert calls == [1, 1]
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,140 @@
+"""
+Tests for input-drift monitoring (`healthe/drift.py`, the input bins kept by
+`backend/stats.py`).
+
+Directions:
+- The reference is built from the training CSVs in `data/`; nothing under
+  `data/` is written (stored references go to tmp_path).
+- These tests focus on:
+  - Training rows scoring near-zero PSI against their own reference, and a
+    shifted input being flagged while the others stay stable.
+  - Input bin counts merging across buckets and surviving the JSON round
+    trip of a rollup, and counts made against other bins being ignored.
+  - The stored reference being reused while the CSVs are unchanged, rebuilt
+    when they change or the file is corrupt, and kept when they are missing.
+"""
+
+import json
+import shutil
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from backend.stats import PredictionStats, Rollup
+from healthe import drift
+from healthe.drift import DriftReference
+from healthe.features import RECOVERY
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return DriftReference.from_training_data()
+
+
+def _recovery_records(n, skip=0):
+    df = pd.read_csv("data/new_health_dataset.csv", skiprows=range(1, skip + 1), nrows=n)
+    return df.drop(columns=["recovery_days"]).to_dict(orient="records")
+
+
+def test_training_rows_are_stable_and_shifted_input_alerts(reference):
+    stats = PredictionStats(input_bins=reference.observation)
+    now = datetime(2026, 1, 2, 12, 0)
+    for record in _recovery_records(2000, skip=5000):
+        stats.observe("recovery_days", {"recovery_days": 10.0}, now, record)
+    report = reference.report(stats.input_counts(), min_count=100)["recovery_days"]
+    assert report["count"] == 2000
+    assert report["status"] == "ok"
+    assert report["max_psi"] < drift.PSI_WARN
+
+    later = now + timedelta(hours=2)
+    for record in _recovery_records(500):
+        stats.observe("recovery_days", {"recovery_days": 10.0}, later, {**record, "age": record["age"] + 30})
+    window = reference.report(stats.input_counts(1, now=later), min_count=100)["recovery_days"]
+    assert window["count"] == 500
+    assert window["features"]["age"]["status"] == "alert"
+    assert window["features"]["age"]["kl"] > 0
+    assert window["features"]["bmi"]["status"] == "ok"
+    assert window["status"] == "alert"
+    # Too few rows to judge; diet_plan has none at all
+    assert reference.report(stats.input_counts(1, now=later), min_count=1000)["recovery_days"]["status"] == "insufficient_data"
+    assert reference.report({})["diet_plan"]["count"] == 0
+
+    # Unencodable inputs are counted by /stats but not binned
+    assert reference.bins("recovery_days", {"age": 30}) is None
+    assert reference.bins("other", {}) is None
+
+
+def test_input_bins_merge_and_round_trip(reference):
+    records = _recovery_records(40)
+    a, b = Rollup(), Rollup()
+    for record in records[:25]:
+        a.add("recovery_days", {"recovery_days": 1.0}, reference.observation("recovery_days", record))
+    for record in records[25:]:
+        b.add("recovery_days", {"recovery_days": 1.0}, reference.observation("recovery_days", record))
+    b.add("diet_plan", {"diet_plan_class": 0})
+
+    merged = Rollup.from_json(Rollup().merge(a).merge(b).to_json())
+    features = merged.input_bins[reference.counts_key("recovery_days")]
+    assert len(features) == RECOVERY.n_features
+    assert all(sum(counts) == 40 for counts in features)
+    assert reference.counts_key("diet_plan") not in merged.input_bins
+    assert reference.report(merged.input_bins)["recovery_days"]["count"] == 40
+
+    # Counts made against other bins are not read against these
+    data = json.loads(json.dumps(reference.to_dict()))
+    data["features"]["recovery_days"]["age"]["edges"][0] += 1.0
+    other = DriftReference.from_dict(data)
+    assert other.counts_key("recovery_days") != reference.counts_key("recovery_days")
+    assert other.counts_key("diet_plan") == reference.counts_key("diet_plan")
+    assert other.report(merged.input_bins)["recovery_days"]["count"] == 0
+
+    # Rollups stored before drift monitoring have no input bins
+    old = json.loads(a.to_json())
+    del old["input_bins"]
+    assert Rollup.from_json(json.dumps(old)).input_bins == {}
+
+
+def test_stored_reference_reused_until_training_data_changes(reference, tmp_path):
+    csv = tmp_path / "health.csv"
+    shutil.copy("data/new_health_dataset.csv", csv)
+    sources = {RECOVERY.name: (RECOVERY, str(csv))}
+    path = str(tmp_path / "reference.json")
+
+    built = DriftReference.load(path, sources)
+    assert built.to_dict()["features"]["recovery_days"] == reference.to_dict()["features"]["recovery_days"]
+    with open(path) as f:
+        stored = json.load(f)
+    assert stored["sources"]["recovery_days"]["path"] == str(csv)
+
+    # Unchanged CSV: the file is used as stored
+    stored["features"]["recovery_days"]["age"]["expected"][0] = 0.5
+    with open(path, "w") as f:
+        json.dump(stored, f)
+    assert DriftReference.load(path, sources).features["recovery_days"][0].expected[0] == 0.5
+
+    # Changed CSV: rebuilt and stored again
+    pd.read_csv(csv).head(1000).to_csv(csv, index=False)
+    rebuilt = DriftReference.load(path, sources)
+    assert rebuilt.sources["recovery_days"]["rows"] == 1000
+    with open(path) as f:
+        assert json.load(f)["sources"]["recovery_days"]["rows"] == 1000
+
+    # Missing CSV: the stored reference is kept, even if it is stale
+    csv.unlink()
+    assert DriftReference.load(path, sources).sources["recovery_days"]["rows"] == 1000
+    with pytest.raises(FileNotFoundError):
+        DriftReference.load(str(tmp_path / "none.json"), sources)
+
+
+def test_corrupt_stored_reference_is_rebuilt(tmp_path):
+    csv = tmp_path / "health.csv"
+    pd.read_csv("data/new_health_dataset.csv").head(1000).to_csv(csv, index=False)
+    sources = {RECOVERY.name: (RECOVERY, str(csv))}
+    path = tmp_path / "reference.json"
+
+    for corrupt in ('{"sources": {"recovery_days": {"pa', '{"sources": {}}', "[]"):
+        path.write_text(corrupt)
+        assert DriftReference.load(str(path), sources).sources["recovery_days"]["rows"] == 1000
+        with open(path) as f:
+            assert json.load(f)["sources"]["recovery_days"]["rows"] == 1000
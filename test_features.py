@@ -0,0 +1,61 @@
+"""
+Tests for the shared feature schemas (`healthe/features.py`).
+
+Directions:
+- These tests focus on:
+  - Labels and their codes encoding identically, for whole columns and for
+    single records.
+  - The codes agreeing with the maps the Streamlit app used to hard-code.
+  - Clear errors for unknown categories and missing columns.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from healthe.features import DIET, RECOVERY, FeatureError
+
+
+def test_codes_match_original_app_maps():
+    assert RECOVERY.categories["gender"].index("Male") == 1
+    assert RECOVERY.categories["gender"].index("Other") == 2
+    assert RECOVERY.categories["condition_type"].index("Flu") == 3
+    assert RECOVERY.categories["smoking_status"].index("Regular") == 2
+    assert DIET.categories["conditions"].index("No") == 6
+
+
+def test_labels_and_codes_encode_the_same():
+    df = pd.read_csv("data/new_health_dataset.csv", nrows=500)
+    from_labels = RECOVERY.encode(df)
+    assert from_labels.shape == (500, RECOVERY.n_features)
+    assert from_labels.flags["C_CONTIGUOUS"]
+
+    as_codes = RECOVERY.frame(from_labels)
+    np.testing.assert_array_equal(RECOVERY.encode(as_codes), from_labels)
+    np.testing.assert_array_equal(RECOVERY.encode(df.to_dict(orient="list")), from_labels)
+
+    for i in (0, 250, 499):
+        np.testing.assert_array_equal(RECOVERY.encode_record(df.iloc[i].to_dict()), from_labels[i:i + 1])
+
+
+def test_diet_dataset_encodes_and_records_round_trip():
+    df = pd.read_csv("data/diet_dataset.csv", nrows=50)
+    X = DIET.encode(df)
+    records = DIET.records(X)
+    assert isinstance(records[0]["gender"], int)
+    np.testing.assert_array_equal(DIET.encode(pd.DataFrame(records)), X)
+    # Int columns are not truncated: 30.7 stays 30.7
+    record = RECOVERY.records(RECOVERY.encode_record({**dict.fromkeys(RECOVERY.columns, 1), "age": 30.7}))[0]
+    assert record["age"] == 30.7 and record["gender"] == 1 and isinstance(record["gender"], int)
+
+
+def test_errors():
+    row = {c: 1 for c in RECOVERY.columns}
+    with pytest.raises(FeatureError, match="gender"):
+        RECOVERY.encode_record(dict(row, gender="Robot"))
+    with pytest.raises(FeatureError, match="smoking_status"):
+        RECOVERY.encode_record(dict(row, smoking_status=7))
+    with pytest.raises(FeatureError, match="Missing columns"):
+        RECOVERY.encode({"age": [1, 2]})
+    with pytest.raises(FeatureError, match="condition_type"):
+        RECOVERY.encode(dict({c: [1, 1] for c in RECOVERY.columns}, condition_type=["Flu", "Plague"]))
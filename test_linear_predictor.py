@@ -0,0 +1,70 @@
+"""
+Tests for the fused scaler + logistic-regression predictor (`healthe/linear_predictor.py`).
+
+Directions:
+- These tests focus on:
+  - Same classes and probabilities as scaling `cols_to_scale` with
+    `diet_scaler` and calling `diet_model`, on all of `data/diet_dataset.csv`.
+  - float32 input giving the same classes.
+  - Contributions equal to coefficient x scaled feature for the predicted class.
+"""
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from healthe import inference
+from healthe.features import DIET
+from healthe.linear_predictor import FusedLogisticPredictor
+
+
+@pytest.fixture(scope="module")
+def artifacts():
+    model = joblib.load("models/new_lr_model_final.joblib")
+    scaler = joblib.load("models/new_diet_scaler_final.joblib")
+    return model, scaler
+
+
+@pytest.fixture(scope="module")
+def X():
+    return inference.encode_diet(pd.read_csv("data/diet_dataset.csv"))
+
+
+@pytest.fixture(scope="module")
+def reference(artifacts, X):
+    model, scaler = artifacts
+    X_scaled = DIET.frame(X)
+    cols_to_scale = list(DIET.scaled_columns)
+    X_scaled[cols_to_scale] = scaler.transform(X_scaled[cols_to_scale])
+    return model.predict(X_scaled), model.predict_proba(X_scaled)
+
+
+def test_matches_scaler_then_model(artifacts, X, reference):
+    predictor = FusedLogisticPredictor.from_model(*artifacts, columns=DIET.columns)
+    classes, proba = predictor.predict_with_proba(X)
+    np.testing.assert_array_equal(classes, reference[0])
+    np.testing.assert_allclose(proba, reference[1], rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(predictor.predict(X[0]), reference[0][:1])
+
+
+def test_float32_input(artifacts, X, reference):
+    predictor = FusedLogisticPredictor.from_model(*artifacts, columns=DIET.columns)
+    classes, proba = predictor.predict_with_proba(np.ascontiguousarray(X, dtype=np.float32))
+    np.testing.assert_array_equal(classes, reference[0])
+    np.testing.assert_allclose(proba, reference[1], rtol=0, atol=1e-5)
+
+
+def test_contributions_are_coefficient_times_scaled_feature(artifacts, X, reference):
+    model, scaler = artifacts
+    predictor = FusedLogisticPredictor.from_model(model, scaler, columns=DIET.columns)
+    classes, proba, contrib = predictor.predict_with_contributions(X)
+    np.testing.assert_array_equal(classes, reference[0])
+    np.testing.assert_allclose(proba, reference[1], rtol=0, atol=1e-12)
+
+    X_scaled = DIET.frame(X)
+    cols_to_scale = list(DIET.scaled_columns)
+    X_scaled[cols_to_scale] = scaler.transform(X_scaled[cols_to_scale])
+    k = np.searchsorted(model.classes_, classes)
+    np.testing.assert_allclose(contrib[:, :-1], X_scaled.to_numpy() * model.coef_[k], atol=1e-9)
+    np.testing.assert_allclose(contrib[:, -1], model.intercept_[k], atol=1e-12)
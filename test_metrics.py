@@ -0,0 +1,85 @@
+"""
+Tests for the in-process metrics (`healthe/metrics.py`).
+
+Directions:
+- These tests focus on:
+  - Histograms rendering cumulative buckets, sum and count in the Prometheus
+    text format, with label values escaped.
+  - Quantile estimates from the buckets, counters read through a function,
+    and re-registering a metric returning the existing one.
+  - Snapshots of several processes merging into one scrape, with the
+    snapshots of exited processes dropped.
+"""
+
+import math
+import os
+
+import pytest
+
+from healthe.metrics import MultiProcessCollector, Registry, merged, timed
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    hist = registry.histogram("t_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+    child = hist.labels('/a"b')
+    for v in (0.05, 0.5, 0.5, 3.0):
+        child.observe(v)
+
+    text = registry.render()
+    assert "# TYPE t_seconds histogram" in text
+    assert 't_seconds_bucket{route="/a\\"b",le="0.1"} 1' in text
+    assert 't_seconds_bucket{route="/a\\"b",le="1.0"} 3' in text
+    assert 't_seconds_bucket{route="/a\\"b",le="+Inf"} 4' in text
+    assert 't_seconds_count{route="/a\\"b"} 4' in text
+    assert 't_seconds_sum{route="/a\\"b"} 4.05' in text
+
+    with pytest.raises(ValueError):
+        hist.labels()
+
+
+def test_quantiles_function_counters_and_reregistration():
+    registry = Registry()
+    hist = registry.histogram("q_seconds", "Quantiles", buckets=(1.0, 2.0, 3.0, 4.0))
+    assert math.isnan(hist.labels().quantile(0.5))
+    for v in (0.5, 1.5, 2.5, 3.5):
+        hist.observe(v)
+    assert hist.labels().quantile(0.5) == pytest.approx(2.0)
+    assert hist.labels().quantile(0.99) == pytest.approx(3.96)
+
+    f = timed(lambda x: x * 2, hist.labels())
+    assert f(4) == 8
+    assert hist.labels().count == 5
+
+    state = {"n": 0}
+    registry.counter("c_total", "Read at scrape").labels().set_function(lambda: state["n"])
+    state["n"] = 7
+    assert "c_total 7" in registry.render()
+
+    assert registry.histogram("q_seconds", "Quantiles") is hist
+    with pytest.raises(ValueError):
+        registry.counter("q_seconds", "Clash")
+
+
+def test_snapshots_merge_across_processes(tmp_path):
+    a, b = Registry(), Registry()
+    for registry, latency in ((a, 0.05), (b, 0.5)):
+        registry.counter("r_total", "Requests", ("route",)).labels("/x").inc(2)
+        registry.histogram("l_seconds", "Latency", buckets=(0.1, 1.0)).observe(latency)
+    text = merged([a.snapshot(), b.snapshot()]).render()
+    assert 'r_total{route="/x"} 4' in text
+    assert 'l_seconds_bucket{le="0.1"} 1' in text
+    assert 'l_seconds_bucket{le="1.0"} 2' in text
+
+    # This process plus a live one (the parent) and an exited one
+    collector = MultiProcessCollector(str(tmp_path), registry=a)
+    MultiProcessCollector(str(tmp_path), registry=b).write()
+    os.replace(collector.path(), collector.path(os.getppid()))
+    dead = tmp_path / "999999999.json"
+    dead.write_text("{}")
+    text = collector.render()
+    assert 'r_total{route="/x"} 4' in text
+    assert "healthe_metrics_processes 2" in text
+    assert not dead.exists()
+    collector.stop()
+    assert not os.path.exists(collector.path())
@@ -0,0 +1,164 @@
+"""
+Tests for the versioned model registry (`healthe/registry.py`).
+
+Directions:
+- Each test builds its own models directory under tmp_path from the shipped
+  artifacts in `models/`, so nothing in the repository is modified.
+- These tests focus on:
+  - Serving the flat legacy files until a version is published, then
+    swapping published versions in (and rolling back) on refresh, with
+    requests holding the old version unaffected.
+  - Rejecting versions whose checksums or feature schema do not match their
+    manifest, while the active version keeps serving.
+  - The watcher thread picking up a new CURRENT on its own.
+  - Cached predictions and micro-batchers staying with the version that
+    scored them, even for a request that finishes after the swap.
+  - A swapped-out version being freed once no request holds it.
+"""
+
+import gc
+import json
+import os
+import shutil
+import time
+import weakref
+
+import joblib
+import numpy as np
+import pytest
+
+from healthe import inference, registry
+from healthe.features import RECOVERY
+from healthe.registry import ModelRegistry, RegistryError
+
+MODEL = "models/LightGBM_recovery_time.joblib"
+SCALER = "models/recovery_scaler_realistic.joblib"
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    for files in registry.LEGACY_FILES.values():
+        for name in files.values():
+            shutil.copy(os.path.join("models", name), tmp_path / name)
+    return str(tmp_path)
+
+
+def _shifted_scaler(tmp_path):
+    """The recovery scaler with every mean moved, so predictions change."""
+    scaler = joblib.load(SCALER)
+    scaler.mean_ = scaler.mean_ + scaler.scale_
+    path = str(tmp_path / "shifted_scaler.joblib")
+    joblib.dump(scaler, path)
+    return path
+
+
+def test_legacy_files_then_published_versions_swap_and_roll_back(models_dir, tmp_path):
+    models = ModelRegistry(models_dir, warmup=4)
+    swaps = []
+    models.on_swap(lambda t, old, new: swaps.append((t, old and old.version, new.version)))
+
+    legacy = models.current(RECOVERY.name)
+    assert legacy.version.startswith("legacy-")
+    X = registry.warmup_rows(RECOVERY.name, legacy.scaler, 20, seed=1)
+    before = legacy.predictor.predict(X)
+    assert models.refresh() == {}
+
+    v1 = registry.publish(models_dir, RECOVERY.name, MODEL, SCALER, version="v1")
+    v2 = registry.publish(models_dir, RECOVERY.name, MODEL, _shifted_scaler(tmp_path), version="v2")
+    assert registry.list_versions(models_dir, RECOVERY.name) == [v1, v2]
+    assert models.refresh() == {RECOVERY.name: v2}
+    assert models.current(RECOVERY.name).version == v2
+    assert not np.allclose(models.current(RECOVERY.name).predictor.predict(X), before)
+    # A request still holding the replaced version finishes on it
+    np.testing.assert_array_equal(legacy.predictor.predict(X), before)
+
+    registry.activate(models_dir, RECOVERY.name, v1)
+    assert models.refresh() == {RECOVERY.name: v1}
+    np.testing.assert_allclose(models.current(RECOVERY.name).predictor.predict(X), before)
+    assert swaps == [(RECOVERY.name, None, legacy.version), (RECOVERY.name, legacy.version, v2), (RECOVERY.name, v2, v1)]
+
+    manifest = models.describe()[RECOVERY.name]
+    assert manifest["version"] == v1
+    assert manifest["artifacts"]["model"] == registry.file_sha256(MODEL)
+    with pytest.raises(RegistryError):
+        registry.publish(models_dir, RECOVERY.name, MODEL, SCALER, version="v1")
+    with pytest.raises(RegistryError):
+        registry.activate(models_dir, RECOVERY.name, "v3")
+
+
+def test_corrupt_or_mismatched_versions_are_rejected(models_dir):
+    models = ModelRegistry(models_dir, warmup=2)
+    good = registry.publish(models_dir, RECOVERY.name, MODEL, SCALER, version="good")
+    assert models.current(RECOVERY.name).version == good
+    errors = registry.LOAD_ERRORS.labels(RECOVERY.name)
+    failed = errors.value
+
+    corrupt = registry.publish(models_dir, RECOVERY.name, MODEL, SCALER, version="corrupt")
+    with open(os.path.join(registry.type_dir(models_dir, RECOVERY.name), corrupt, "model.joblib"), "ab") as f:
+        f.write(b"\0")
+    assert models.refresh() == {}
+    assert models.current(RECOVERY.name).version == good
+
+    other = registry.publish(models_dir, RECOVERY.name, MODEL, SCALER, version="other_schema")
+    manifest_path = os.path.join(registry.type_dir(models_dir, RECOVERY.name), other, registry.MANIFEST)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest["features"]["columns"].reverse()
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    assert models.refresh() == {}
+    assert models.current(RECOVERY.name).version == good
+    assert errors.value == failed + 2
+
+
+def test_watcher_swaps_new_version_in_background(models_dir):
+    models = ModelRegistry(models_dir, poll_seconds=0.05, warmup=2)
+    assert models.current(RECOVERY.name).version.startswith("legacy-")
+    try:
+        version = registry.publish(models_dir, RECOVERY.name, MODEL, SCALER, version="hot")
+        deadline = time.monotonic() + 10
+        while models.current(RECOVERY.name).version != version and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert models.current(RECOVERY.name).version == version
+    finally:
+        models.stop()
+
+
+def test_cached_predictions_stay_with_their_version(models_dir, tmp_path, monkeypatch):
+    models = ModelRegistry(models_dir, warmup=2)
+    models.on_swap(inference._on_model_swap)
+    monkeypatch.setattr(inference, "MODELS", models)
+    monkeypatch.setattr(inference, "INFERENCE_BATCHING", True)
+
+    legacy = models.current(RECOVERY.name)
+    X = registry.warmup_rows(RECOVERY.name, legacy.scaler, 20, seed=2)
+    columns = dict(zip(RECOVERY.columns, X.T))
+    before = inference.predict_recovery_days(columns)
+
+    registry.publish(models_dir, RECOVERY.name, MODEL, _shifted_scaler(tmp_path), version="v2")
+    assert models.refresh() == {RECOVERY.name: "v2"}
+    # A request that resolved the old version before the swap stores its results late
+    np.testing.assert_array_equal(inference.predict_recovery_days(columns, legacy), before)
+    assert inference.BATCHERS.get(legacy, "predict", None) is None
+
+    after = inference.predict_recovery_days(columns)
+    np.testing.assert_allclose(after, models.current(RECOVERY.name).predictor.predict(X))
+    assert not np.allclose(after, before)
+
+
+def test_swapped_out_version_is_freed(models_dir, tmp_path, monkeypatch):
+    models = ModelRegistry(models_dir, warmup=2)
+    models.on_swap(inference._on_model_swap)
+    monkeypatch.setattr(inference, "MODELS", models)
+    monkeypatch.setattr(inference, "INFERENCE_BATCHING", True)
+
+    legacy = models.current(RECOVERY.name)
+    X = registry.warmup_rows(RECOVERY.name, legacy.scaler, 5, seed=3)
+    inference.predict_recovery_days(dict(zip(RECOVERY.columns, X.T)))
+    predictor = weakref.ref(legacy.predictor)
+    del legacy
+
+    registry.publish(models_dir, RECOVERY.name, MODEL, _shifted_scaler(tmp_path), version="v2")
+    assert models.refresh() == {RECOVERY.name: "v2"}
+    gc.collect()
+    assert predictor() is None
@@ -0,0 +1,65 @@
+"""
+Tests for the /stats rollups (`healthe/sketch.py`, `backend/stats.py`).
+
+Directions:
+- These tests focus on:
+  - Quantile sketches staying within their relative accuracy, also after
+    merging and a JSON round trip.
+  - Rollups bucketing observations by time and merging buckets into windows,
+    with pending deltas kept on top of rows loaded from the summary table.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backend.stats import TOTAL, PredictionStats, Rollup
+from healthe.sketch import QuantileSketch
+
+
+def test_sketch_quantiles_merge_and_round_trip():
+    values = np.random.default_rng(0).lognormal(2.0, 0.7, 20_000)
+    a, b = QuantileSketch(0.01), QuantileSketch(0.01)
+    for v in values[:10_000]:
+        a.add(float(v))
+    for v in values[10_000:]:
+        b.add(float(v))
+    merged = QuantileSketch.from_dict(a.merge(b).to_dict())
+
+    assert merged.count == len(values)
+    assert merged.mean == pytest.approx(values.mean())
+    for q in (0.1, 0.5, 0.9, 0.99):
+        assert merged.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.02)
+    assert QuantileSketch().quantile(0.5) is None
+    with pytest.raises(ValueError):
+        a.merge(QuantileSketch(0.05))
+
+
+def test_rollups_by_bucket_window_and_pending():
+    stats = PredictionStats(bucket_seconds=3600, retention_buckets=48)
+    now = datetime(2026, 1, 2, 12, 30)
+    stats.observe("recovery_days", {"recovery_days": 10.0}, now)
+    stats.observe("recovery_days", {"recovery_days": 20.0}, now - timedelta(hours=3))
+    stats.observe("diet_plan", {"diet_plan_class": 1, "diet_plan_label": "Keto Diet"}, now)
+
+    snap = stats.snapshot(2, now=now)
+    assert snap["total"]["counts"] == {"diet_plan": 1, "recovery_days": 2}
+    assert snap["window"]["counts"] == {"diet_plan": 1, "recovery_days": 1}
+    assert snap["window"]["diet_plan_label"] == {"Keto Diet": 1}
+    assert [b["start"] for b in snap["buckets"]] == ["2026-01-02T12:00:00"]
+    assert stats.snapshot(4, now=now)["window"]["recovery_days"]["mean"] == pytest.approx(15.0)
+
+    # Rows from the table replace memory; deltas not yet written stay on top
+    pending = stats.take_pending()
+    assert set(pending) == {TOTAL, "2026-01-02T12:00:00", "2026-01-02T09:00:00"}
+    stats.observe("recovery_days", {"recovery_days": 30.0}, now)
+    stats.load([(TOTAL, pending[TOTAL].to_json())], replace=True)
+    assert stats.snapshot(1, now=now)["total"]["counts"] == {"diet_plan": 1, "recovery_days": 3}
+
+    rollups = stats.rollups_from_rows([
+        ("recovery_days", None, {"recovery_days": 5.0}, now),
+        ("other", None, {}, now),
+    ])
+    assert rollups[TOTAL].counts == {"recovery_days": 1, "other": 1}
+    assert Rollup.from_json(rollups["2026-01-02T12:00:00"].to_json()).recovery_days.count == 1
@@ -0,0 +1,130 @@
+"""
+Tests for the retraining pipeline (`healthe/train.py`).
+
+Directions:
+- Every test trains into its own models and cache directories under tmp_path
+  with a tiny grid and two folds, so nothing under `models/` is touched and
+  each run takes seconds.
+- These tests focus on:
+  - A run on a process pool publishing a registry version that
+    `ModelRegistry` serves, with stage timings and CV scores in its report.
+  - A published version only becoming current when its CV score is at
+    least as good as the active version's.
+  - The encoded feature cache being reused while the CSV is unchanged and
+    rebuilt when it changes.
+  - Diet plan targets following the order of DIET_PLAN_LABELS, and
+    `--no-publish` style runs only writing the artifacts.
+"""
+
+import json
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from healthe import registry, train
+from healthe.features import DIET, RECOVERY
+from healthe.registry import ModelRegistry
+
+RECOVERY_GRID = {"n_estimators": [20], "num_leaves": [15, 31]}
+
+
+def test_pool_search_publishes_a_served_version(tmp_path):
+    models_dir = str(tmp_path / "models")
+    report = train.train(
+        RECOVERY.name, models_dir=models_dir, cache_dir=str(tmp_path / "cache"),
+        workers=2, n_folds=2, grid=RECOVERY_GRID, activate="always", progress=None,
+    )
+    assert set(report["stages"]) == {"features", "search", "fit", "check", "write"}
+    assert len(report["candidates"]) == 2
+    assert report["best"]["mae"] == min(c["mae"] for c in report["candidates"])
+    assert report["csv"]["rows"] == 10000
+
+    version = report["version"]
+    assert registry.current_version(models_dir, RECOVERY.name) == version
+    served = ModelRegistry(models_dir, warmup=2).current(RECOVERY.name)
+    assert served.version == version
+    assert served.manifest["metadata"]["best"]["params"] == report["best"]["params"]
+
+    X = RECOVERY.encode(pd.read_csv("data/new_health_dataset.csv", nrows=50))
+    model = joblib.load(os.path.join(tmp_path, "cache", "artifacts", RECOVERY.name, "model.joblib"))
+    scaler = joblib.load(os.path.join(tmp_path, "cache", "artifacts", RECOVERY.name, "scaler.joblib"))
+    np.testing.assert_allclose(served.predictor.predict(X), train.predict(RECOVERY.name, model, scaler, X), atol=1e-6)
+
+
+def _set_stored_mae(models_dir, version, mae):
+    path = os.path.join(registry.type_dir(models_dir, RECOVERY.name), version, registry.MANIFEST)
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest["metadata"]["best"]["mae"] = mae
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+
+
+def test_published_version_activated_only_if_at_least_as_good(tmp_path):
+    models_dir, cache_dir = str(tmp_path / "models"), str(tmp_path / "cache")
+
+    def run(num_leaves, **kwargs):
+        # A different model each run, so version names never collide
+        return train.train(RECOVERY.name, models_dir=models_dir, cache_dir=cache_dir, workers=1, n_folds=2,
+                           grid={"n_estimators": [20], "num_leaves": [num_leaves]}, progress=None, **kwargs)
+
+    # Nothing to compare with while the legacy files are served
+    first = run(15)
+    assert not first["activated"]
+    assert registry.current_version(models_dir, RECOVERY.name) is None
+    registry.activate(models_dir, RECOVERY.name, first["version"])
+
+    # Better than what the active version scored: it goes live
+    _set_stored_mae(models_dir, first["version"], 1e9)
+    second = run(16)
+    assert second["activated"] and second["previous"] == {"version": first["version"], "mae": 1e9}
+    assert registry.current_version(models_dir, RECOVERY.name) == second["version"]
+
+    # Worse: published, but the active version stays
+    _set_stored_mae(models_dir, second["version"], 0.0)
+    third = run(17)
+    assert not third["activated"]
+    assert registry.current_version(models_dir, RECOVERY.name) == second["version"]
+    assert third["version"] in registry.list_versions(models_dir, RECOVERY.name)
+
+    _set_stored_mae(models_dir, second["version"], 1e9)
+    assert not run(18, activate="never")["activated"]
+    assert registry.current_version(models_dir, RECOVERY.name) == second["version"]
+
+
+def test_feature_cache_reused_until_csv_changes(tmp_path):
+    csv = tmp_path / "health.csv"
+    shutil.copy("data/new_health_dataset.csv", csv)
+    cache_dir = str(tmp_path / "cache")
+
+    X, y, hit = train.load_features(RECOVERY.name, str(csv), cache_dir)
+    assert not hit
+    assert isinstance(X, np.memmap) and X.shape == (10000, RECOVERY.n_features)
+    np.testing.assert_array_equal(X, RECOVERY.encode(pd.read_csv(csv)))
+    assert train.load_features(RECOVERY.name, str(csv), cache_dir)[2]
+
+    pd.read_csv(csv).head(500).to_csv(csv, index=False)
+    X, y, hit = train.load_features(RECOVERY.name, str(csv), cache_dir)
+    assert not hit
+    assert len(X) == len(y) == 500
+
+
+def test_diet_targets_and_artifacts_without_publishing(tmp_path):
+    df = pd.read_csv("data/diet_dataset.csv", nrows=5)
+    y = train.targets(DIET.name, df)
+    assert [train.DIET_PLAN_LABELS[c] for c in y] == [f"{p} Diet" for p in df["diet_plan"]]
+
+    models_dir, out_dir = str(tmp_path / "models"), str(tmp_path / "out")
+    report = train.train(
+        DIET.name, models_dir=models_dir, cache_dir=str(tmp_path / "cache"), out_dir=out_dir,
+        workers=1, n_folds=2, grid={"C": [1.0]}, publish=False, progress=None,
+    )
+    assert report["version"] is None
+    assert report["best"]["accuracy"] > 0.5
+    assert not os.path.exists(models_dir)
+    assert sorted(os.listdir(out_dir)) == ["model.joblib", "scaler.joblib", "schema.json"]
+    with open(os.path.join(out_dir, "schema.json")) as f:
+        assert json.load(f) == DIET.to_dict()
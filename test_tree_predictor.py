@@ -0,0 +1,76 @@
+"""
+Tests for the pure-NumPy LightGBM predictor (`healthe/tree_predictor.py`).
+
+Directions:
+- These tests focus on:
+  - Parity with `recovery_model.predict(recovery_scaler.transform(X))` on the
+    whole of `data/new_health_dataset.csv`, for a batch and for single rows.
+  - The same parity with missing values and after an `.npz` round trip.
+  - Path contributions summing to the prediction and tracking LightGBM's
+    `pred_contrib`.
+"""
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from healthe import inference
+from healthe.features import RECOVERY
+from healthe.tree_predictor import TreeEnsemblePredictor
+
+
+@pytest.fixture(scope="module")
+def artifacts():
+    model = joblib.load("models/LightGBM_recovery_time.joblib")
+    scaler = joblib.load("models/recovery_scaler_realistic.joblib")
+    return model, scaler
+
+
+@pytest.fixture(scope="module")
+def X():
+    df = pd.read_csv("data/new_health_dataset.csv")
+    return inference.encode_recovery(df)
+
+
+def _reference(artifacts, X):
+    model, scaler = artifacts
+    return model.predict(scaler.transform(RECOVERY.frame(X)))
+
+
+def test_matches_lightgbm_on_dataset(artifacts, X):
+    predictor = TreeEnsemblePredictor.from_model(*artifacts)
+    np.testing.assert_allclose(predictor.predict(X), _reference(artifacts, X), rtol=0, atol=1e-9)
+
+
+def test_single_row(artifacts, X):
+    predictor = TreeEnsemblePredictor.from_model(*artifacts)
+    for i in (0, 123, 9999):
+        assert predictor.predict(X[i]).shape == (1,)
+        assert predictor.predict(X[i])[0] == pytest.approx(_reference(artifacts, X[i:i + 1])[0], abs=1e-9)
+
+
+def test_missing_values_and_npz_round_trip(artifacts, X, tmp_path):
+    X_missing = X[:500].copy()
+    X_missing[::7, 2] = np.nan
+    X_missing[::5, 5] = np.nan
+
+    path = tmp_path / "trees.npz"
+    TreeEnsemblePredictor.from_model(*artifacts).save(path)
+    predictor = TreeEnsemblePredictor.load(path)
+
+    np.testing.assert_allclose(
+        predictor.predict(X_missing), _reference(artifacts, X_missing), rtol=0, atol=1e-9
+    )
+
+
+def test_contributions_sum_to_prediction_and_track_shap(artifacts, X):
+    model, scaler = artifacts
+    predictor = TreeEnsemblePredictor.from_model(model, scaler)
+    pred, contrib = predictor.predict_with_contributions(X)
+    np.testing.assert_allclose(pred, _reference(artifacts, X), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(contrib.sum(axis=1), pred, rtol=0, atol=1e-9)
+
+    shap = model.booster_.predict(scaler.transform(RECOVERY.frame(X[:100])), pred_contrib=True)
+    np.testing.assert_allclose(contrib[0, -1], shap[0, -1], atol=1e-3)
+    assert np.corrcoef(contrib[:100, :-1].ravel(), shap[:, :-1].ravel())[0, 1] > 0.98